@@ -1,29 +1,224 @@
 # app.py
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, current_app, request, jsonify
 import logging
+import threading
 from pathlib import Path
 import sys
 
 # Add project root to path
 sys.path.append(str(Path(__file__).parent))
 
-from config import config
-from layers.whatsapp_handler import WhatsAppHandler
-from layers.basic_handler import BasicMessageHandler
+from config import config, load_environment
 
-# Initialize Flask app
-app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
-# Initialize handlers
-whatsapp_handler = WhatsAppHandler()
-bot_handler = BasicMessageHandler()
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+class _service:
+    """Build a Services attribute on first access (once, even with concurrent requests)"""
+
+    def __init__(self, build):
+        self.build = build
+        self.name = build.__name__
+
+    def __get__(self, services, owner):
+        if services is None:
+            return self
+        with services._lock:
+            if self.name not in services.__dict__:
+                services.__dict__[self.name] = self.build(services)
+        return services.__dict__[self.name]
+
+
+class Services:
+    """The bot's long-lived collaborators, each constructed the first time it is needed
+
+    Nothing here touches the database, starts a thread or imports the heavy
+    layers until a request (or an entry point calling start()) asks for it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._started = False
+        # Set by serve.py in each pre-forked worker so workers never share a durable queue file
+        self.worker_slot = None
+
+    @_service
+    def conversation_store(self):
+        from layers.conversation_store import ConversationStore
+        store = ConversationStore(
+            ttl=config.CONVERSATION_TTL_SECONDS,
+            max_sessions=config.CONVERSATION_CACHE_SIZE,
+            flush_interval=config.CONVERSATION_FLUSH_SECONDS
+        )
+        store.start()
+        return store
+
+    @_service
+    def bot_handler(self):
+        from layers.basic_handler import BasicMessageHandler
+        handler = self.__dict__.pop('_preloaded_handler', None) or BasicMessageHandler()
+        handler.conversations = self.conversation_store
+        handler.catalog.start()  # pick up price changes without a restart
+        return handler
+
+    @_service
+    def customer_activity(self):
+        from layers.customer_activity import CustomerActivity
+        activity = CustomerActivity(flush_interval=config.CUSTOMER_ACTIVITY_FLUSH_SECONDS)
+        activity.start()
+        return activity
+
+    @_service
+    def receipt_processor(self):
+        # Receipt OCR in worker processes; spawned on the first receipt, not here
+        from layers.receipt_fingerprints import ReceiptFingerprints
+        from layers.receipt_processor import ReceiptProcessor, warm_up_ocr
+        from utils.image_utils import save_receipt_image
+        processor = ReceiptProcessor(
+            workers=config.RECEIPT_WORKERS or None,
+            queue_size=config.RECEIPT_QUEUE_SIZE,
+            timeout=config.RECEIPT_TIMEOUT,
+            download_timeout=config.RECEIPT_DOWNLOAD_TIMEOUT,
+            initializer=warm_up_ocr,
+            archive=save_receipt_image if config.RECEIPT_ARCHIVE_ENABLED else None,
+            fingerprints=(ReceiptFingerprints(max_distance=config.RECEIPT_NEAR_DUPLICATE_DISTANCE)
+                          if config.RECEIPT_FINGERPRINTS_ENABLED else None)
+        )
+        processor.start()
+        return processor
+
+    @_service
+    def whatsapp_handler(self):
+        from layers.order_repository import OrderRepository
+        from layers.whatsapp_handler import WhatsAppHandler
+        receipts = self.receipt_processor if config.RECEIPT_PROCESSING_ENABLED else None
+        return WhatsAppHandler(self.bot_handler, customer_activity=self.customer_activity, receipts=receipts,
+                               orders=OrderRepository(catalog=self.bot_handler.catalog))
+
+    @_service
+    def webhook_queue(self):
+        # Webhook ingestion queue - the route only enqueues, workers call the handler
+        from layers.webhook_queue import WebhookQueue
+        queue = WebhookQueue(
+            self.process_webhook,
+            maxsize=config.WEBHOOK_QUEUE_SIZE,
+            workers=config.WEBHOOK_WORKERS,
+            durable_path=self._durable_queue_path()
+        )
+        queue.start()
+        return queue
+
+    @_service
+    def retention(self):
+        # Archive finished orders, prune idle conversations and expired dedup claims in the background
+        from layers.retention import RetentionService
+        service = RetentionService(
+            order_age_days=config.ORDER_ARCHIVE_AFTER_DAYS,
+            conversation_age_days=config.CONVERSATION_RETENTION_DAYS,
+            processed_message_ttl=config.DEDUP_TTL_SECONDS,
+            batch_size=config.RETENTION_BATCH_SIZE,
+            batch_pause=config.RETENTION_BATCH_PAUSE,
+            vacuum_pages=config.RETENTION_VACUUM_PAGES,
+            archive_dir=config.ORDER_ARCHIVE_DIR or None,
+            interval=config.RETENTION_INTERVAL_SECONDS
+        )
+        if config.RETENTION_ENABLED:
+            service.start()
+        return service
+
+    def _durable_queue_path(self):
+        path = config.WEBHOOK_QUEUE_DB
+        if not path or not self.worker_slot:
+            return path or None
+        # Worker n keeps webhook_queue.n.db; a replacement worker in the same slot replays it
+        path = Path(path)
+        return str(path.with_name(f"{path.stem}.{self.worker_slot}{path.suffix}"))
+
+    def process_webhook(self, data):
+        """Run a queued webhook payload through the WhatsApp handler"""
+        result = self.whatsapp_handler.process_webhook(data)
+
+        if result.get('processed'):
+            logger.info(f"✅ Webhook processed: {result.get('message_count')} item(s), "
+                        f"first {result.get('message_type')} from {result.get('sender')}")
+        else:
+            logger.info("ℹ️  Webhook received but no message to process")
+
+        return result
+
+    def start(self):
+        """Bring up the background workers (replays any durable webhook backlog)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.webhook_queue
+        self.retention
+
+    def preload(self):
+        """Build the read-only state workers share, before a pre-fork server forks
+
+        Loads the catalog snapshot, compiles the intent and order matchers and
+        renders the catalog replies once in the master, so every worker starts
+        with them in copy-on-write memory. No threads are started, and the
+        engine's connections are closed so no worker inherits a socket or
+        SQLite file handle.
+        """
+        from layers.basic_handler import BasicMessageHandler
+        from layers.whatsapp_handler import WhatsAppHandler  # noqa: F401 - import requests before fork
+        from models.database_models import get_engine
 
+        handler = BasicMessageHandler()
+        handler.order_parser
+        handler.catalog_renderer.current()
+        self.__dict__['_preloaded_handler'] = handler
+        get_engine().dispose()
+        logger.info(f"📦 Preloaded catalog version {handler.catalog.version}")
 
-@app.route('/webhook', methods=['GET'])
+    def stop(self, timeout=10):
+        """Drain in-flight work and stop the background threads. Returns True if everything drained.
+
+        Queued webhooks are processed first (they produce replies), then
+        receipts being read (their results are replies too), then the replies
+        are sent, then buffered conversation and activity state is flushed to
+        the database.
+        """
+        drained = True
+        queue = self.built('webhook_queue')
+        if queue:
+            drained = queue.stop(timeout) and drained
+        receipts = self.built('receipt_processor')
+        if receipts:
+            drained = receipts.stop(timeout) and drained
+        handler = self.built('whatsapp_handler')
+        if handler:
+            drained = handler.close(timeout) and drained
+        for name in ('conversation_store', 'customer_activity', 'retention'):
+            service = self.built(name)
+            if service:
+                service.stop()
+        if self.built('bot_handler'):
+            self.bot_handler.catalog.stop()
+        logger.info(f"🛑 Services stopped ({'drained' if drained else 'drain timed out'})")
+        return drained
+
+    def built(self, name):
+        return self.__dict__.get(name)
+
+
+bot = Blueprint('bot', __name__)
+
+
+def _services():
+    return current_app.extensions['data_seller']
+
+
+@bot.before_app_request
+def _start_services():
+    _services().start()
+
+
+@bot.route('/webhook', methods=['GET'])
 def verify_webhook():
     """
     Verify webhook for WhatsApp Business API
@@ -50,27 +245,28 @@ def verify_webhook():
         return 'Server error', 500
 
 
-@app.route('/webhook', methods=['POST'])
+@bot.route('/webhook', methods=['POST'])
 def handle_webhook():
     """
     Handle incoming WhatsApp messages
-    This endpoint receives all messages from users
+    The payload is validated and queued; worker threads do the actual processing
+    so WhatsApp gets its acknowledgement straight away
     """
     try:
-        data = request.get_json()
-        logger.info("📨 Received webhook data")
+        data = request.get_json(silent=True)
 
         if not data:
             logger.warning("❌ Empty webhook data received")
             return 'OK', 200
 
-        # Process the webhook data
-        result = whatsapp_handler.process_webhook(data)
+        if not isinstance(data, dict) or not isinstance(data.get('entry', []), list):
+            logger.warning("❌ Malformed webhook payload ignored")
+            return 'OK', 200
 
-        if result.get('processed'):
-            logger.info(f"✅ Webhook processed: {result.get('message_type')} from {result.get('sender')}")
-        else:
-            logger.info("ℹ️  Webhook received but no message to process")
+        if not _services().webhook_queue.enqueue(data):
+            # Queue is full - let WhatsApp retry later instead of dropping the payload
+            logger.warning("⚠️  Webhook queue full, asking WhatsApp to retry")
+            return 'Busy', 503
 
         return 'OK', 200
 
@@ -79,17 +275,27 @@ def handle_webhook():
         return 'OK', 200  # Always return OK to prevent retries
 
 
-@app.route('/health', methods=['GET'])
+@bot.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for monitoring"""
+    services = _services()
+    whatsapp_handler = services.built('whatsapp_handler')
+    metrics = lambda name: services.built(name).metrics() if services.built(name) else None
     return jsonify({
         'status': 'healthy',
         'service': 'WhatsApp Data Seller Bot',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'webhook_queue': metrics('webhook_queue'),
+        'outbound': whatsapp_handler.dispatcher.metrics() if whatsapp_handler and whatsapp_handler.dispatcher else None,
+        'dedup': whatsapp_handler.dedup.metrics() if whatsapp_handler else None,
+        'conversations': metrics('conversation_store'),
+        'customer_activity': metrics('customer_activity'),
+        'retention': metrics('retention'),
+        'receipts': metrics('receipt_processor')
     })
 
 
-@app.route('/')
+@bot.route('/')
 def home():
     """Home page with bot information"""
     return """
@@ -100,4 +306,42 @@ def home():
     <p><strong>Health Check:</strong> <a href="/health">/health</a></p>
     <hr>
     <p>Next: Configure WhatsApp Business API webhook to point to this server.</p>
-    """
\ No newline at end of file
+    """
+
+
+def create_app():
+    """Application factory: routes are registered, everything else is built on demand"""
+    load_environment()
+    config.ensure_directories()
+    logging.basicConfig(level=logging.INFO)
+
+    app = Flask(__name__)
+    app.extensions['data_seller'] = Services()
+    app.register_blueprint(bot)
+    return app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+# Names that used to be module globals, still importable from here
+_SERVICE_NAMES = ('conversation_store', 'bot_handler', 'customer_activity', 'whatsapp_handler',
+                  'webhook_queue', 'retention', 'receipt_processor')
+
+
+def get_app():
+    """The process-wide app used by `from app import app` and WSGI servers pointed at app:app"""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+    return _app
+
+
+def __getattr__(name):
+    if name == 'app':
+        return get_app()
+    if name in _SERVICE_NAMES:
+        return getattr(get_app().extensions['data_seller'], name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,240 @@
+# asgi.py
+"""asyncio webhook server (WEBHOOK_MODE=async)
+
+    uvicorn asgi:application    (or: python serve.py with WEBHOOK_MODE=async)
+
+The same routes as app.py, written directly against ASGI so every request,
+webhook and Graph API call shares one event loop instead of a thread each.
+Services are built on lifespan startup and drained on shutdown (SIGTERM).
+"""
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+from urllib.parse import parse_qs
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent))
+
+from config import config, load_environment
+
+logger = logging.getLogger(__name__)
+
+# Webhook bodies from WhatsApp are a few KB; refuse anything absurd before parsing it
+MAX_BODY_BYTES = 1024 * 1024
+
+HOME_PAGE = """
+    <h1>🤖 Automatic Data Seller Bot</h1>
+    <p>Your WhatsApp bot is running and ready to receive messages!</p>
+    <p><strong>Status:</strong> ✅ Active (asyncio)</p>
+    <p><strong>Webhook:</strong> /webhook</p>
+    <p><strong>Health Check:</strong> <a href="/health">/health</a></p>
+    """
+
+
+class AsyncServices:
+    """The asyncio path's long-lived collaborators, built on lifespan startup"""
+
+    def __init__(self):
+        self.conversation_store = None
+        self.bot_handler = None
+        self.customer_activity = None
+        self.whatsapp_handler = None
+        self.webhook_processor = None
+        self.retention = None
+        self.receipt_processor = None
+
+    def start(self):
+        from layers.async_whatsapp_handler import AsyncWebhookProcessor, AsyncWhatsAppHandler
+        from layers.basic_handler import BasicMessageHandler
+        from layers.conversation_store import ConversationStore
+        from layers.customer_activity import CustomerActivity
+        from layers.order_repository import OrderRepository
+        from layers.receipt_fingerprints import ReceiptFingerprints
+        from layers.receipt_processor import ReceiptProcessor, warm_up_ocr
+        from layers.retention import RetentionService
+        from utils.image_utils import save_receipt_image
+
+        # Write-behind flushes stay on their own threads, off the event loop
+        self.conversation_store = ConversationStore(
+            ttl=config.CONVERSATION_TTL_SECONDS,
+            max_sessions=config.CONVERSATION_CACHE_SIZE,
+            flush_interval=config.CONVERSATION_FLUSH_SECONDS
+        )
+        self.conversation_store.start()
+        self.bot_handler = BasicMessageHandler(conversations=self.conversation_store)
+        self.bot_handler.catalog.start()
+        self.customer_activity = CustomerActivity(flush_interval=config.CUSTOMER_ACTIVITY_FLUSH_SECONDS)
+        self.customer_activity.start()
+        # OCR stays in worker processes; their results come back to the loop as replies
+        if config.RECEIPT_PROCESSING_ENABLED:
+            self.receipt_processor = ReceiptProcessor(
+                workers=config.RECEIPT_WORKERS or None,
+                queue_size=config.RECEIPT_QUEUE_SIZE,
+                timeout=config.RECEIPT_TIMEOUT,
+                download_timeout=config.RECEIPT_DOWNLOAD_TIMEOUT,
+                initializer=warm_up_ocr,
+                archive=save_receipt_image if config.RECEIPT_ARCHIVE_ENABLED else None,
+                fingerprints=(ReceiptFingerprints(max_distance=config.RECEIPT_NEAR_DUPLICATE_DISTANCE)
+                              if config.RECEIPT_FINGERPRINTS_ENABLED else None)
+            )
+            self.receipt_processor.start()
+        self.whatsapp_handler = AsyncWhatsAppHandler(self.bot_handler, customer_activity=self.customer_activity,
+                                                     receipts=self.receipt_processor,
+                                                     orders=OrderRepository(catalog=self.bot_handler.catalog))
+        self.webhook_processor = AsyncWebhookProcessor(self.process_webhook, max_in_flight=config.ASYNC_MAX_IN_FLIGHT)
+        self.retention = RetentionService(
+            order_age_days=config.ORDER_ARCHIVE_AFTER_DAYS,
+            conversation_age_days=config.CONVERSATION_RETENTION_DAYS,
+            processed_message_ttl=config.DEDUP_TTL_SECONDS,
+            batch_size=config.RETENTION_BATCH_SIZE,
+            batch_pause=config.RETENTION_BATCH_PAUSE,
+            vacuum_pages=config.RETENTION_VACUUM_PAGES,
+            archive_dir=config.ORDER_ARCHIVE_DIR or None,
+            interval=config.RETENTION_INTERVAL_SECONDS
+        )
+        if config.RETENTION_ENABLED:
+            self.retention.start()
+
+    async def process_webhook(self, data):
+        """Run an accepted webhook payload through the async WhatsApp handler"""
+        result = await self.whatsapp_handler.process_webhook(data)
+
+        if result.get('processed'):
+            logger.info(f"✅ Webhook processed: {result.get('message_count')} item(s), "
+                        f"first {result.get('message_type')} from {result.get('sender')}")
+        else:
+            logger.info("ℹ️  Webhook received but no message to process")
+
+        return result
+
+    async def stop(self, timeout=10):
+        """Finish accepted webhooks, send their replies, then flush buffered state"""
+        drained = await self.webhook_processor.drain(timeout)
+        if self.receipt_processor:
+            # Blocks on worker processes and needs the loop for media downloads, so off the loop
+            drained = await asyncio.to_thread(self.receipt_processor.stop, timeout) and drained
+        drained = await self.whatsapp_handler.close(timeout) and drained
+        for service in (self.conversation_store, self.customer_activity, self.retention):
+            service.stop()
+        self.bot_handler.catalog.stop()
+        logger.info(f"🛑 Services stopped ({'drained' if drained else 'drain timed out'})")
+        return drained
+
+    def health(self):
+        return {
+            'status': 'healthy',
+            'service': 'WhatsApp Data Seller Bot',
+            'version': '1.0.0',
+            'mode': 'async',
+            'webhook_queue': self.webhook_processor.metrics(),
+            'outbound': self.whatsapp_handler.dispatcher.metrics() if self.whatsapp_handler.dispatcher else None,
+            'dedup': self.whatsapp_handler.dedup.metrics(),
+            'conversations': self.conversation_store.metrics(),
+            'customer_activity': self.customer_activity.metrics(),
+            'retention': self.retention.metrics(),
+            'receipts': self.receipt_processor.metrics() if self.receipt_processor else None
+        }
+
+
+async def _read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_BYTES:
+            return None
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+async def _respond(send, status, body, content_type='text/plain; charset=utf-8'):
+    if not isinstance(body, bytes):
+        body = body.encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class WebhookApplication:
+    """ASGI application for the webhook routes"""
+
+    def __init__(self, services=None):
+        self.services = services or AsyncServices()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    load_environment()
+                    config.ensure_directories()
+                    logging.basicConfig(level=logging.INFO)
+                    self.services.start()
+                except Exception as e:
+                    logger.error(f"❌ Async services failed to start: {e}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.services.stop(timeout=config.WEB_DRAIN_TIMEOUT)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        path, method = scope['path'], scope['method']
+
+        if path == '/webhook' and method == 'GET':
+            await self.verify_webhook(scope, send)
+        elif path == '/webhook' and method == 'POST':
+            await self.handle_webhook(receive, send)
+        elif path == '/health' and method == 'GET':
+            await _respond(send, 200, json.dumps(self.services.health(), default=str), 'application/json')
+        elif path == '/' and method == 'GET':
+            await _respond(send, 200, HOME_PAGE, 'text/html; charset=utf-8')
+        else:
+            await _respond(send, 404, 'Not Found')
+
+    async def verify_webhook(self, scope, send):
+        """Verify webhook for WhatsApp Business API (see app.verify_webhook)"""
+        args = {key: values[0] for key, values in parse_qs(scope['query_string'].decode()).items()}
+        mode = args.get('hub.mode')
+        token = args.get('hub.verify_token')
+        logger.info(f"🔐 Webhook verification attempt: mode={mode}, token={token}")
+
+        if mode == 'subscribe' and token == config.VERIFY_TOKEN:
+            logger.info("✅ Webhook verified successfully!")
+            await _respond(send, 200, args.get('hub.challenge', ''))
+        else:
+            logger.warning("❌ Webhook verification failed - token mismatch")
+            await _respond(send, 403, 'Verification failed')
+
+    async def handle_webhook(self, receive, send):
+        """Acknowledge straight away; the payload is processed as a task on the loop"""
+        try:
+            body = await _read_body(receive)
+            data = json.loads(body) if body else None
+
+            if not data:
+                logger.warning("❌ Empty webhook data received")
+            elif not isinstance(data, dict) or not isinstance(data.get('entry', []), list):
+                logger.warning("❌ Malformed webhook payload ignored")
+            elif not self.services.webhook_processor.enqueue(data):
+                # At capacity - let WhatsApp retry later instead of dropping the payload
+                logger.warning("⚠️  Webhook processing full, asking WhatsApp to retry")
+                await _respond(send, 503, 'Busy')
+                return
+
+        except Exception as e:
+            logger.error(f"❌ Webhook processing error: {e}")
+        await _respond(send, 200, 'OK')  # Always return OK to prevent retries
+
+
+application = WebhookApplication()
@@ -0,0 +1,142 @@
+"""Webhook-to-reply throughput: threaded pipeline vs the asyncio variant
+
+Each webhook carries one text message from a different customer and needs
+one reply through the local Graph API stub, which answers after `latency`
+seconds (the real API, bank APIs and the supplier site are all like this:
+mostly waiting). The threaded path is WebhookQueue -> WhatsAppHandler ->
+OutboundDispatcher with the configured worker counts; the async path is
+AsyncWebhookProcessor -> AsyncWhatsAppHandler -> AsyncOutboundSender on one
+event loop. The global send rate limit is lifted so the pipelines
+themselves are measured, and the stub runs in its own process so its
+threads don't compete with the pipeline for the GIL.
+
+    python benchmarks/bench_async_pipeline.py [webhooks] [latency_seconds]
+"""
+import asyncio
+import logging
+import multiprocessing
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import config
+from layers.async_whatsapp_handler import AsyncWebhookProcessor, AsyncWhatsAppHandler
+from layers.webhook_queue import WebhookQueue
+from layers.whatsapp_handler import WhatsAppHandler
+from tests.graph_api_stub import GraphAPIStub
+
+
+def payloads(count, prefix):
+    return [{'object': 'whatsapp_business_account', 'entry': [{'changes': [{'value': {'messages': [
+        {'from': f"234{n:010d}", 'id': f"wamid.{prefix}{n}", 'type': 'text', 'text': {'body': 'hi'}}
+    ]}}]}]} for n in range(count)]
+
+
+def serve_stub(latency, conn):
+    """Child process: run the stub and answer (replies so far, peak concurrency) until 'stop'"""
+    with GraphAPIStub(latency=latency) as stub:
+        conn.send(stub.url)
+        while True:
+            command = conn.recv()
+            if command == 'stop':
+                return
+            with stub._lock:
+                conn.send((sum(1 for request in stub.requests if 'text' in request['json']), stub.peak_in_flight))
+                if command == 'reset':
+                    stub.peak_in_flight = stub.in_flight
+
+
+class RemoteStub:
+    def __init__(self, latency):
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=serve_stub, args=(latency, child), daemon=True)
+        self._process.start()
+        self.url = self._conn.recv()
+
+    def stats(self, reset=False):
+        self._conn.send('reset' if reset else 'stats')
+        return self._conn.recv()
+
+    def stop(self):
+        self._conn.send('stop')
+        self._process.join(timeout=5)
+
+
+def wait_for_replies(stub, expected, timeout=600):
+    deadline = time.monotonic() + timeout
+    while stub.stats()[0] < expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def run_threaded(stub, webhooks):
+    threads_before = threading.active_count()
+    handler = WhatsAppHandler()
+    queue = WebhookQueue(handler.process_webhook, maxsize=len(webhooks), workers=config.WEBHOOK_WORKERS)
+    queue.start()
+
+    started = time.perf_counter()
+    for payload in webhooks:
+        queue.enqueue(payload)
+    wait_for_replies(stub, len(webhooks))
+    elapsed = time.perf_counter() - started
+
+    threads = threading.active_count() - threads_before
+    queue.stop()
+    handler.close()
+    return elapsed, threads
+
+
+def run_async(webhooks):
+    threads_before = threading.active_count()
+
+    async def scenario():
+        handler = AsyncWhatsAppHandler()
+        processor = AsyncWebhookProcessor(handler.process_webhook, max_in_flight=len(webhooks))
+
+        started = time.perf_counter()
+        for payload in webhooks:
+            processor.enqueue(payload)
+        await processor.drain()
+        await handler.dispatcher.drain()
+        elapsed = time.perf_counter() - started
+
+        threads = threading.active_count() - threads_before
+        await handler.close()
+        return elapsed, processor.metrics()['peak_in_flight'], threads
+
+    return asyncio.run(scenario())
+
+
+def main(count=1000, latency=0.1):
+    config.OUTBOUND_GLOBAL_RATE = config.OUTBOUND_GLOBAL_BURST = 100000
+    config.OUTBOUND_COALESCE_WINDOW = 0.0
+
+    stub = RemoteStub(latency)
+    try:
+        config.WHATSAPP_API_URL = stub.url
+        config.WHATSAPP_TOKEN = 'bench-token'
+        config.WHATSAPP_PHONE_NUMBER_ID = '1234567890'
+
+        print(f"📊 {count} webhooks, one reply each, Graph API latency {latency * 1000:.0f} ms")
+
+        elapsed, threads = run_threaded(stub, payloads(count, 'threaded'))
+        sent, peak = stub.stats(reset=True)
+        print(f"threaded  {elapsed:8.2f} s   {count / elapsed:8.0f} replies/s   "
+              f"peak concurrent Graph API calls {peak:4d}   threads {threads}")
+
+        elapsed, in_flight, threads = run_async(payloads(count, 'async'))
+        total, peak = stub.stats()
+        assert total - sent == count
+        print(f"asyncio   {elapsed:8.2f} s   {count / elapsed:8.0f} replies/s   "
+              f"peak concurrent Graph API calls {peak:4d}   webhooks in flight {in_flight}   handler threads {threads}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 0.1)
@@ -0,0 +1,71 @@
+"""Per-message reply latency: one-off requests.post vs the pooled WhatsAppHandler session
+
+Runs against the local Graph API stub, so the numbers measure client-side
+connection handling only. Over real TLS to graph.facebook.com the gap is
+wider because every fresh connection also pays a TLS handshake.
+
+    python benchmarks/bench_graph_api_client.py [messages]
+"""
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import requests
+
+from config import config
+from layers.whatsapp_handler import WhatsAppHandler
+from tests.graph_api_stub import GraphAPIStub
+
+
+def _report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{label:<28} mean {statistics.mean(samples) * 1000:7.3f} ms   "
+          f"p50 {samples[len(samples) // 2] * 1000:7.3f} ms   p99 {p99 * 1000:7.3f} ms")
+
+
+def bench_unpooled(url, headers, payload, messages):
+    samples = []
+    for _ in range(messages):
+        started = time.perf_counter()
+        requests.post(url, headers=headers, json=payload, timeout=10)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_pooled(handler, messages):
+    samples = []
+    for _ in range(messages):
+        started = time.perf_counter()
+        handler.send_text_message('2348011111111', 'benchmark reply')
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main(messages=500):
+    with GraphAPIStub() as stub:
+        config.WHATSAPP_API_URL = stub.url
+        config.WHATSAPP_TOKEN = 'bench-token'
+        config.WHATSAPP_PHONE_NUMBER_ID = '1234567890'
+
+        handler = WhatsAppHandler()
+        payload = {"messaging_product": "whatsapp", "to": "2348011111111", "text": {"body": "benchmark reply"}}
+
+        print(f"📊 Sending {messages} messages to {stub.url}")
+        unpooled = bench_unpooled(f"{handler.base_url}/messages", handler.headers, payload, messages)
+        connections_before = stub.connections
+        pooled = bench_pooled(handler, messages)
+
+        _report("requests.post (before)", unpooled)
+        _report("pooled session (after)", pooled)
+        print(f"🔌 Connections opened: before={connections_before}, "
+              f"after={stub.connections - connections_before}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,77 @@
+"""Messages/sec: the old substring cascade vs the precompiled IntentEngine
+
+    python benchmarks/bench_intent_engine.py [rounds]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.nlp_engine import IntentEngine
+
+CORPUS = [
+    "hi", "Hello", "hey, good morning", "Good evening sir",
+    "data", "Do you sell data bundles?", "show me all bundles",
+    "mtn", "GLO", "airtel plans pls", "what MTN plans do you have",
+    "how much", "How much is 2GB?", "price list abeg", "what are your prices today",
+    "buy", "I want to buy", "buy mtn 2gb for 08012345678",
+    "Buy GLO 1GB for 07098765432", "I want to buy airtel 5gb for 08123456789",
+    "please order 10GB mtn for +2348031234567", "purchase glo 2.5gb 08051234567",
+    "thank you", "Thanks!!", "ok thanks boss",
+    "I have paid, check the receipt", "which account number should I pay into?",
+    "My data never reach o", "is this thing working", "?",
+    "Send me the details", "Can I pay with transfer", "wetin be the cheapest one",
+    "I need 1gb for my sister 09012345678", "Abeg run am quick",
+]
+
+
+def legacy_classify(message_text):
+    """The cascade BasicMessageHandler.handle_message used before the engine"""
+    message_lower = message_text.lower()
+
+    if any(word in message_lower for word in ['hi', 'hello', 'hey']):
+        return 'greeting'
+    elif any(network in message_lower for network in ['mtn', 'glo', 'airtel']):
+        if 'mtn' in message_lower:
+            return 'network'
+        elif 'glo' in message_lower:
+            return 'network'
+        elif 'airtel' in message_lower:
+            return 'network'
+    elif 'data' in message_lower or 'bundle' in message_lower:
+        return 'catalog'
+    elif 'price' in message_lower or 'how much' in message_lower:
+        return 'pricing'
+    elif 'buy' in message_lower or 'purchase' in message_lower or 'order' in message_lower:
+        return 'purchase'
+    elif 'thank' in message_lower:
+        return 'thanks'
+    return 'help'
+
+
+def _rate(classify, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for message in CORPUS:
+            classify(message)
+    elapsed = time.perf_counter() - started
+    return rounds * len(CORPUS) / elapsed
+
+
+def main(rounds=5000):
+    engine = IntentEngine()
+
+    print(f"📊 Classifying {rounds * len(CORPUS):,} messages ({len(CORPUS)} distinct)")
+    print(f"legacy substring cascade   {_rate(legacy_classify, rounds):>12,.0f} msg/s")
+    print(f"precompiled IntentEngine   {_rate(engine.classify, rounds):>12,.0f} msg/s")
+
+    misfires = [message for message in CORPUS
+                if legacy_classify(message) != engine.classify(message).intent]
+    print(f"\n🔍 {len(misfires)} messages classified differently (legacy → engine):")
+    for message in misfires:
+        print(f"   {message!r}: {legacy_classify(message)} → {engine.classify(message).intent}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,91 @@
+"""Per-image OCR latency: persistent tesserocr engine vs a fresh engine per image vs pytesseract
+
+Every synthetic receipt is preprocessed once, then each backend reads the
+whole receipt (PSM 4) and the cropped amount figure (PSM 7 with the
+digit/currency whitelist). "tesserocr per image" builds a new engine for
+each receipt: the language-data load pytesseract pays on every call, minus
+the process spawn. Backends that can't start here are reported and skipped.
+
+    python benchmarks/bench_ocr_backends.py [receipts] [tessdata_dir]
+"""
+import io
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_receipts import amount_value_box, corpus
+from layers.receipt_processor import parse_receipt_text
+from utils.ocr_utils import create_backend
+
+
+def preprocess(data):
+    import cv2
+    import numpy as np
+    from PIL import Image
+
+    gray = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    _, thresholded = cv2.threshold(cv2.medianBlur(gray, 3), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return Image.fromarray(thresholded)
+
+
+def measure(name, get_backend, images):
+    page_ms, amount_ms, correct = [], [], 0
+    for image, fields in images:
+        started = time.perf_counter()
+        backend = get_backend()
+        text = backend.read_text(image)
+        page_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        amount, _ = backend.read_amount(image.crop(amount_value_box(fields)))
+        amount_ms.append((time.perf_counter() - started) * 1000)
+
+        parsed = parse_receipt_text(text)
+        if (parsed.get('amount'), parsed.get('reference')) == (fields['amount'], fields['reference']) \
+                and amount.replace(',', '').endswith(fields['amount']):
+            correct += 1
+
+    print(f"{name:22s} receipt p50 {statistics.median(page_ms):7.1f} ms  max {max(page_ms):7.1f} ms   "
+          f"amount field p50 {statistics.median(amount_ms):6.1f} ms   "
+          f"read correctly {correct}/{len(images)}")
+
+
+def main(count=10, tessdata=None):
+    images = [(preprocess(data), fields) for data, fields in corpus(count)]
+    print(f"📊 {count} synthetic 1080x1920 receipts, preprocessed once, one thread")
+
+    for name, backend_name, reuse in (
+            ('tesserocr (persistent)', 'tesserocr', True),
+            ('tesserocr per image', 'tesserocr', False),
+            ('pytesseract', 'pytesseract', True)):
+        try:
+            persistent = create_backend(backend_name, tessdata)
+        except RuntimeError as e:
+            print(f"{name:22s} skipped - {e}")
+            continue
+
+        if reuse:
+            measure(name, lambda: persistent, images)
+        else:
+            fresh = []
+
+            def new_backend():
+                if fresh:
+                    fresh.pop().close()
+                fresh.append(create_backend(backend_name, tessdata))
+                return fresh[-1]
+
+            measure(name, new_backend, images)
+            for backend in fresh:
+                backend.close()
+        persistent.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+         sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,84 @@
+"""Orders/sec: the old extract_order_details + extract_phone_number vs OrderParser
+
+    python benchmarks/bench_order_parser.py [rounds]
+"""
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.basic_handler import BasicMessageHandler
+from layers.nlp_engine import OrderParser
+
+CORPUS = [
+    "buy mtn 2gb for 08012345678",
+    "Buy GLO 1GB for 07098765432",
+    "I want to buy airtel 5gb for 08123456789",
+    "please send GLO 2.5GB to +2348051234567",
+    "mtn 10gb x2 2348031234567",
+    "abeg airtel 1 gig for my sister 09012345678 asap",
+    "Buy 2 units MTN 5GB 08031234567",
+    "glo 5gb",
+    "I need data for 08099999999",
+    "hello, how much is mtn 1gb?",
+]
+
+
+def legacy_extract(message):
+    """extract_order_details and extract_phone_number as they were before OrderParser"""
+    message_upper = message.upper()
+
+    network = None
+    if 'MTN' in message_upper:
+        network = 'MTN'
+    elif 'GLO' in message_upper:
+        network = 'GLO'
+    elif 'AIRTEL' in message_upper:
+        network = 'AIRTEL'
+
+    sizes = ['1GB', '2GB', '5GB', '10GB', '2.5GB']
+    size = None
+    for s in sizes:
+        if s in message_upper:
+            size = s
+            break
+
+    import re as inner_re
+    phone_match = inner_re.search(r'(\d{11})', message)
+    phone = phone_match.group(1) if phone_match else None
+
+    for pattern in [r'(\d{11})', r'(\d{10})', r'(\+234\d{10})']:
+        matches = re.findall(pattern, message)
+        if matches:
+            phone = phone or matches[0]
+            break
+
+    return {'network': network, 'size': size, 'phone_number': phone}
+
+
+def _rate(parse, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for message in CORPUS:
+            parse(message)
+    return rounds * len(CORPUS) / (time.perf_counter() - started)
+
+
+def main(rounds=20000):
+    parser = OrderParser(BasicMessageHandler().data_plans)
+
+    print(f"📊 Parsing {rounds * len(CORPUS):,} order messages")
+    print(f"legacy extract_order_details   {_rate(legacy_extract, rounds):>10,.0f} orders/s")
+    print(f"single-pass OrderParser        {_rate(parser.parse, rounds):>10,.0f} orders/s")
+
+    print("\n🔍 Where the results differ:")
+    for message in CORPUS:
+        old, new = legacy_extract(message), parser.parse(message)
+        if (old['network'], old['size'], old['phone_number']) != (new['network'], new['size'], new['phone_number']):
+            print(f"   {message!r}\n      legacy: {old}\n      parser: {new}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
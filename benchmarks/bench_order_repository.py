@@ -0,0 +1,100 @@
+"""Order ingestion and status transitions: ORM row-by-row vs OrderRepository batches
+
+The ORM path adds each order with its own commit and advances each order by
+loading it, changing status and committing - what per-message handling would
+do. The repository inserts with executemany and moves orders with one guarded
+UPDATE ... WHERE id IN (...) per batch.
+
+    python benchmarks/bench_order_repository.py [orders]
+"""
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from layers.catalog_service import CatalogService
+from layers.order_repository import OrderRepository
+from models.database_models import DEFAULT_DATA_PLANS, Base, Order, create_db_engine, seed_catalog
+
+LIFECYCLE = ('paid', 'processing', 'completed')
+
+
+def new_orders(count):
+    plans = [(network, size) for network, sizes in DEFAULT_DATA_PLANS.items() for size in sizes]
+    return [{'customer_id': n % 500 + 1, 'network': plans[n % len(plans)][0], 'size': plans[n % len(plans)][1],
+             'phone_to_recharge': '08012345678', 'transaction_reference': f"REF{n:08d}"}
+            for n in range(count)]
+
+
+def orm_per_row(session_factory, orders):
+    catalog = CatalogService(session_factory)
+    ids = []
+    for fields in orders:
+        fields = dict(fields)
+        plan = catalog.lookup(fields.pop('network'), fields.pop('size'))
+        db = session_factory()
+        order = Order(status='pending', quantity=1, product_id=plan.product_id, amount_paid=plan.price, **fields)
+        db.add(order)
+        db.commit()
+        ids.append(order.id)
+        db.close()
+
+    for status in LIFECYCLE:
+        for order_id in ids:
+            db = session_factory()
+            order = db.get(Order, order_id)
+            order.status = status
+            if status == 'completed':
+                order.completed_at = datetime.utcnow()
+            db.commit()
+            db.close()
+
+
+def repository_batches(session_factory, orders):
+    repository = OrderRepository(session_factory=session_factory, catalog=CatalogService(session_factory))
+    ids = repository.create_orders(orders)
+    for status in LIFECYCLE:
+        repository.transition(ids, status)
+
+
+def measure(label, tmp, runner, orders):
+    engine = create_db_engine(f"sqlite:///{tmp}/{label}.db")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = session_factory()
+    seed_catalog(db)
+    db.close()
+    commits = []
+    event.listen(engine, 'commit', lambda conn: commits.append(1))
+
+    started = time.perf_counter()
+    runner(session_factory, orders)
+    elapsed = time.perf_counter() - started
+
+    db = session_factory()
+    completed = db.query(Order).filter(Order.status == 'completed', Order.completed_at.isnot(None)).count()
+    db.close()
+    engine.dispose()
+    return elapsed, len(commits), completed
+
+
+def main(count=10000):
+    orders = new_orders(count)
+    print(f"📊 {count:,} orders inserted then moved pending → paid → processing → completed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, runner in [("orm_per_row", orm_per_row), ("repository", repository_batches)]:
+            elapsed, commits, completed = measure(label, tmp, runner, orders)
+            print(f"{label:<12} {elapsed:8.2f}s   {count * (1 + len(LIFECYCLE)) / elapsed:>9,.0f} row ops/s   "
+                  f"commits: {commits:>6,}   completed: {completed:,}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:2]]
+    main(*args)
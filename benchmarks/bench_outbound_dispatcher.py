@@ -0,0 +1,63 @@
+"""Simulated peak-hour broadcast through the outbound dispatcher
+
+Sends one message to each of N recipients (plus a burst of follow-ups to a
+few of them) against the local Graph API stub and prints the dispatcher
+metrics, to help pick OUTBOUND_WORKERS and the rate limits.
+
+    python benchmarks/bench_outbound_dispatcher.py [recipients] [workers] [stub_latency_ms]
+"""
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import config
+from layers.outbound_dispatcher import OutboundDispatcher, PRIORITY_LOW
+from layers.whatsapp_handler import WhatsAppHandler
+from tests.graph_api_stub import GraphAPIStub
+
+
+def main(recipients=2000, workers=8, latency_ms=20):
+    with GraphAPIStub(latency=latency_ms / 1000) as stub:
+        config.WHATSAPP_API_URL = stub.url
+        config.WHATSAPP_TOKEN = 'bench-token'
+        config.WHATSAPP_PHONE_NUMBER_ID = '1234567890'
+        config.WHATSAPP_POOL_SIZE = workers
+        config.OUTBOUND_DISPATCH_ENABLED = False
+
+        handler = WhatsAppHandler()
+        dispatcher = OutboundDispatcher(
+            handler.send_text_message,
+            workers=workers,
+            global_rate=config.OUTBOUND_GLOBAL_RATE,
+            global_burst=config.OUTBOUND_GLOBAL_BURST,
+            recipient_rate=config.OUTBOUND_RECIPIENT_RATE,
+            recipient_burst=config.OUTBOUND_RECIPIENT_BURST,
+            coalesce_window=config.OUTBOUND_COALESCE_WINDOW
+        )
+
+        print(f"📊 Broadcasting to {recipients} recipients with {workers} senders "
+              f"(stub latency {latency_ms} ms, global rate {config.OUTBOUND_GLOBAL_RATE}/s)")
+        started = time.perf_counter()
+        for i in range(recipients):
+            dispatcher.submit(f"23480{i:08d}", "🔥 Weekend promo: 10% off all MTN bundles!", priority=PRIORITY_LOW)
+        for i in range(50):
+            for n in range(3):
+                dispatcher.submit(f"23480{i:08d}", f"Follow-up {n}")
+
+        dispatcher.drain()
+        elapsed = time.perf_counter() - started
+        dispatcher.stop()
+
+        print(f"⏱️  {len(stub.requests)} HTTP sends in {elapsed:.2f}s "
+              f"({len(stub.requests) / elapsed:.1f} sends/sec)")
+        print(json.dumps(dispatcher.metrics(), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = [int(arg) for arg in sys.argv[1:4]]
+    main(*args)
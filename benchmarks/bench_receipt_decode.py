@@ -0,0 +1,90 @@
+"""Receipt bytes to OCR text: through files (before) vs decoded in memory (after)
+
+before: write the download to storage, cv2.imread it back in colour, convert
+        to gray, preprocess, wrap in a PIL image and OCR that
+after:  cv2.imdecode the downloaded bytes straight to gray, preprocess, and
+        hand the array's pixels to the OCR engine; the audit copy is written
+        on a background thread, off the critical path
+
+Times are per receipt on the critical path. OCR runs only when an engine is
+available (pass the tessdata directory for tesserocr).
+
+    python benchmarks/bench_receipt_decode.py [receipts] [tessdata_dir]
+"""
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_receipts import corpus
+from layers.receipt_processor import parse_receipt_text
+from utils.image_utils import decode_image, preprocess_image_for_ocr
+from utils.ocr_utils import create_backend
+
+
+def before(data, directory, n, backend):
+    import cv2
+    from PIL import Image
+
+    started = time.perf_counter()
+    path = directory / f"receipt_before_{n}.jpg"
+    with open(path, 'wb') as f:
+        f.write(data)
+    image = cv2.imread(str(path))
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, thresholded = cv2.threshold(cv2.medianBlur(gray, 3), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    ready = Image.fromarray(thresholded)
+    prepared = time.perf_counter()
+    text = backend.read_text(ready) if backend else ''
+    return prepared - started, time.perf_counter() - prepared, text
+
+
+def after(data, directory, n, backend, archiver):
+    started = time.perf_counter()
+    archiver.submit((directory / f"receipt_after_{n}.jpg").write_bytes, data)
+    ready = preprocess_image_for_ocr(decode_image(data))
+    prepared = time.perf_counter()
+    text = backend.read_text(ready) if backend else ''
+    return prepared - started, time.perf_counter() - prepared, text
+
+
+def main(count=20, tessdata=None):
+    receipts = corpus(count)
+    try:
+        backend = create_backend('auto', tessdata)
+    except RuntimeError as e:
+        backend = None
+        print(f"ℹ️  OCR skipped - {e}")
+
+    with tempfile.TemporaryDirectory(prefix='receipts_') as directory, \
+            ThreadPoolExecutor(max_workers=1) as archiver:
+        directory = Path(directory)
+        results = {'before': [], 'after': []}
+        for n, (data, _) in enumerate(receipts):
+            results['before'].append(before(data, directory, n, backend))
+            results['after'].append(after(data, directory, n, backend, archiver))
+
+    print(f"📊 {count} synthetic 1080x1920 JPEG receipts ({sum(len(data) for data, _ in receipts) // count // 1024} KB each), "
+          f"OCR {backend.name if backend else 'off'}")
+    for name, rows in results.items():
+        prepare = statistics.median(row[0] for row in rows) * 1000
+        ocr = statistics.median(row[1] for row in rows) * 1000
+        print(f"{name:7s} bytes->OCR input p50 {prepare:6.2f} ms   OCR p50 {ocr:7.1f} ms   "
+              f"critical path p50 {prepare + ocr:7.1f} ms")
+    if backend:
+        for name, rows in results.items():
+            correct = sum(1 for (_, fields), row in zip(receipts, rows)
+                          if all(parse_receipt_text(row[2]).get(key) == fields[key] for key in ('amount', 'reference')))
+            print(f"{name:7s} amount and reference read correctly on {correct}/{count}")
+        backend.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+         sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,143 @@
+"""Receipt fingerprints: hashing cost, lookalike separation, and lookups at scale
+
+1. Cost per image of the exact (SHA-256) and perceptual (DCT) hashes.
+2. Hamming distance between each receipt and a resent copy of it (shrunk,
+   recompressed, status bar cropped) vs between different receipts from the
+   same bank.
+3. Near-duplicate lookups in NearDuplicateIndex holding `stored` hashes vs a
+   vectorized scan of all of them. Stored hashes are drawn bit by bit with
+   each bank's bit frequencies measured on the rendered receipts, so they
+   cluster by template the way real receipts do.
+4. Exact-repeat lookups through the sha256 index on receipt_fingerprints
+   (SQLite) holding `stored` rows.
+
+    python benchmarks/bench_receipt_fingerprints.py [receipts] [stored]
+"""
+import io
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_receipts import corpus
+from layers.receipt_fingerprints import NearDuplicateIndex, PHASH_BITS, _popcount64, exact_hash, perceptual_hash
+from utils.image_utils import decode_image
+
+
+def resend(data, rng):
+    """What a receipt looks like forwarded again: shrunk, recompressed, edges cropped"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    top, bottom = rng.randint(0, 40), rng.randint(0, 20)
+    image = image.crop((0, top, image.width, image.height - bottom))
+    scale = rng.choice([0.5, 0.75, 1.0])
+    image = image.resize((int(image.width * scale), int(image.height * scale)))
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=rng.choice([50, 70, 90]))
+    return out.getvalue()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def bit_array(phash):
+    import numpy as np
+    return np.array([(phash >> bit) & 1 for bit in range(PHASH_BITS)], dtype=np.float64)
+
+
+def main(count=60, stored=300000):
+    import numpy as np
+
+    rng = random.Random(1)
+    receipts = corpus(count)
+    grays = [decode_image(data) for data, _ in receipts]
+
+    started = time.perf_counter()
+    for data, _ in receipts:
+        exact_hash(data)
+    exact_ms = (time.perf_counter() - started) / count * 1000
+    started = time.perf_counter()
+    hashes = [perceptual_hash(gray) for gray in grays]
+    phash_ms = (time.perf_counter() - started) / count * 1000
+    print(f"📊 {count} synthetic 1080x1920 receipts: sha256 {exact_ms:.3f} ms, perceptual hash {phash_ms:.1f} ms "
+          f"per image (after decode)")
+
+    copies = [perceptual_hash(decode_image(resend(data, rng))) for data, _ in receipts]
+    resent = [(a ^ b).bit_count() for a, b in zip(hashes, copies)]
+    same_bank = [(hashes[i] ^ hashes[j]).bit_count() for i in range(count) for j in range(i)
+                 if receipts[i][1]['bank'] == receipts[j][1]['bank']]
+    print(f"distance  resent copy: max {max(resent)}, p50 {percentile(resent, 0.5)}   "
+          f"other receipt, same bank: min {min(same_bank)}, p1 {percentile(same_bank, 0.01)}, "
+          f"p50 {percentile(same_bank, 0.5)}   (of {PHASH_BITS} bits)")
+
+    # Stored receipts: the per-bank bit frequencies of the rendered ones
+    np_rng = np.random.default_rng(0)
+    banks = sorted({fields['bank'] for _, fields in receipts})
+    frequencies = {bank: np.mean([bit_array(h) for h, (_, f) in zip(hashes, receipts) if f['bank'] == bank], axis=0)
+                   for bank in banks}
+    weights = 1 << np.arange(PHASH_BITS, dtype=object)
+    started = time.perf_counter()
+    simulated = [int((np_rng.random(PHASH_BITS) < frequencies[banks[n % len(banks)]]).astype(object) @ weights)
+                 for n in range(stored)]
+    index = NearDuplicateIndex()
+    index.extend(range(stored), simulated)
+    for key, phash in enumerate(hashes, stored):
+        index.add(key, phash)
+    print(f"index     {len(index)} hashes built in {time.perf_counter() - started:.1f} s, "
+          f"{sum(array.nbytes for band in index._bands for array in band) >> 20} MB")
+
+    scan = np.concatenate([index._bands[0][2], index._pending_hashes[:index._pending]])
+    for name, queries in (('new receipts', [perceptual_hash(decode_image(d)) for d, _ in corpus(count, seed=99)]),
+                          ('resent copies', copies)):
+        timings, scans, found = [], [], 0
+        for phash in queries:
+            began = time.perf_counter()
+            matches = index.query(phash, 6)
+            timings.append(time.perf_counter() - began)
+            found += bool(matches)
+            began = time.perf_counter()
+            bands = np.array(NearDuplicateIndex._split(phash), dtype=np.uint64)
+            np.nonzero(_popcount64(scan ^ bands).sum(axis=1) <= 6)
+            scans.append(time.perf_counter() - began)
+        print(f"near      {name:13s} banded index p50 {percentile(timings, 0.5) * 1e6:6.0f} us  "
+              f"p95 {percentile(timings, 0.95) * 1e6:6.0f} us   full scan p50 {percentile(scans, 0.5) * 1e6:6.0f} us   "
+              f"matched {found}/{len(queries)}")
+
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+    from layers.receipt_fingerprints import ReceiptFingerprints
+    from models.database_models import Base, ReceiptFingerprint
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/fingerprints.db")
+        Base.metadata.create_all(bind=engine, tables=[ReceiptFingerprint.__table__])
+        digests = [f"{n:064x}" for n in range(stored)]
+        with engine.begin() as connection:
+            connection.execute(insert(ReceiptFingerprint), [
+                {'sha256': digest, 'phash': f"{phash:064x}", 'sender': '2348000000000', 'fields': '{}'}
+                for digest, phash in zip(digests, simulated)])
+        fingerprints = ReceiptFingerprints(session_factory=sessionmaker(bind=engine))
+        started = time.perf_counter()
+        fingerprints.load()
+        load_s = time.perf_counter() - started
+        timings = []
+        for digest in rng.sample(digests, 200):
+            began = time.perf_counter()
+            assert fingerprints.lookup(digest) is not None
+            timings.append(time.perf_counter() - began)
+        print(f"exact     sha256 lookup in {stored} rows p50 {percentile(timings, 0.5) * 1e6:6.0f} us  "
+              f"p95 {percentile(timings, 0.95) * 1e6:6.0f} us   index load at startup {load_s:.1f} s")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 60,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 300000)
@@ -0,0 +1,79 @@
+"""Receipt OCR over the whole page (before) vs the layout stage (after)
+
+before: preprocess the full-size receipt and OCR the whole page
+after:  shrink to RECEIPT_OCR_DPI, find the text lines, OCR only the lines
+        the bank's template points at, stop once amount, reference, date and
+        bank are read with RECEIPT_MIN_CONFIDENCE
+
+Prints CPU time per receipt (process_time: this is what a worker process
+pays), p50 of each layout stage, how many of the detected lines were read,
+and how many receipts came back with the right amount and reference. Needs
+an OCR engine (pass the tessdata directory for tesserocr).
+
+    python benchmarks/bench_receipt_layout.py [receipts] [tessdata_dir] [dpi] [min_confidence]
+"""
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_receipts import corpus
+from layers.receipt_layout import LayoutReader
+from layers.receipt_processor import parse_receipt_text
+from utils.image_utils import decode_image, preprocess_image_for_ocr
+from utils.ocr_utils import create_backend
+
+
+def full_page(backend, gray):
+    return parse_receipt_text(backend.read_text(preprocess_image_for_ocr(gray))), {}
+
+
+def layout(reader, gray):
+    result = reader.read(gray)
+    return result['fields'], result
+
+
+def main(count=40, tessdata=None, dpi=200, min_confidence=90):
+    try:
+        backend = create_backend('auto', tessdata)
+    except RuntimeError as e:
+        print(f"❌ No OCR engine - {e}")
+        return
+    reader = LayoutReader(backend, dpi, min_confidence)
+    receipts = [(decode_image(data), fields) for data, fields in corpus(count, seed=7)]
+    print(f"📊 {count} synthetic 1080x1920 receipts, OCR {backend.name}, layout at {dpi} DPI, "
+          f"min confidence {min_confidence}")
+
+    for name, read in (('before', lambda gray: full_page(backend, gray)),
+                       ('after', lambda gray: layout(reader, gray))):
+        read(receipts[0][0])  # first-call allocations out of the way
+        cpu, wall, correct, results = [], [], 0, []
+        for gray, fields in receipts:
+            started, started_cpu = time.perf_counter(), time.process_time()
+            found, result = read(gray)
+            cpu.append(time.process_time() - started_cpu)
+            wall.append(time.perf_counter() - started)
+            correct += all(found.get(key) == fields[key] for key in ('amount', 'reference'))
+            results.append(result)
+
+        print(f"{name:7s} CPU p50 {statistics.median(cpu) * 1000:7.1f} ms  mean {statistics.mean(cpu) * 1000:7.1f} ms   "
+              f"wall p50 {statistics.median(wall) * 1000:7.1f} ms   correct {correct}/{count}")
+        if name == 'after':
+            stages = sorted({stage for result in results for stage in result['timings_ms']})
+            print("        stage p50 " + "  ".join(
+                f"{stage} {statistics.median(r['timings_ms'][stage] for r in results if stage in r['timings_ms']):.1f} ms"
+                for stage in stages))
+            print(f"        lines read {sum(r['lines_read'] for r in results)}/{sum(r['lines_detected'] for r in results)}, "
+                  f"full-page fallback on {sum(r['full_page'] for r in results)}/{count}")
+    backend.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+         sys.argv[2] if len(sys.argv) > 2 else None,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 200,
+         int(sys.argv[4]) if len(sys.argv) > 4 else 90)
@@ -0,0 +1,110 @@
+"""Receipt OCR inline on the webhook thread vs on the ReceiptProcessor pool
+
+Renders a corpus of synthetic receipts, then reads them two ways: one after
+another on the calling thread (what the image branch would do inline), and
+submitted at once to ReceiptProcessor. Prints throughput, submit-to-result
+latency and how long the calling (webhook) thread is blocked per receipt.
+When no OCR engine is available (set TESSDATA_DIR for tesserocr) only the
+decode and OpenCV preprocessing run.
+
+    python benchmarks/bench_receipt_processor.py [receipts] [workers]
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_receipts import corpus
+from layers.receipt_processor import ReceiptProcessor, read_receipt, warm_up_ocr
+
+
+def preprocess_only(image_data):
+    """Stand-in job without an OCR engine: the OpenCV half of read_receipt"""
+    from utils.image_utils import decode_image, preprocess_image_for_ocr
+    preprocess_image_for_ocr(decode_image(image_data))
+    return {'text': '', 'fields': {}}
+
+
+def ocr_available():
+    try:
+        from utils.ocr_utils import get_backend
+        get_backend()
+        return True
+    except RuntimeError:
+        return False
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_inline(read, receipts):
+    latencies = []
+    started = time.perf_counter()
+    for data in receipts:
+        began = time.perf_counter()
+        read(data)
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - started
+    # Receipts arriving together wait for every one ahead of them
+    waited = [sum(latencies[:n + 1]) for n in range(len(latencies))]
+    return elapsed, waited, elapsed / len(receipts)
+
+
+def run_pool(read, receipts, workers):
+    outcomes = []
+    done = threading.Condition()
+
+    def deliver(sender, outcome):
+        with done:
+            outcomes.append(outcome)
+            done.notify_all()
+
+    processor = ReceiptProcessor(read=read, workers=workers, queue_size=len(receipts) + workers, deliver=deliver,
+                                 initializer=warm_up_ocr if read is read_receipt else None)
+    processor.start()
+
+    # Spawn the worker processes and load OpenCV (and the OCR engine) before timing
+    for data in receipts[:workers]:
+        processor.submit('warmup', data)
+    with done:
+        done.wait_for(lambda: len(outcomes) == workers)
+        outcomes.clear()
+
+    started = time.perf_counter()
+    for n, data in enumerate(receipts):
+        processor.submit(f"2348{n:09d}", data)
+    blocked = time.perf_counter() - started
+    with done:
+        done.wait_for(lambda: len(outcomes) == len(receipts))
+    elapsed = time.perf_counter() - started
+
+    processor.stop()
+    return elapsed, [outcome['elapsed_ms'] / 1000 for outcome in outcomes], blocked / len(receipts)
+
+
+def main(count=40, workers=None):
+    workers = workers or os.cpu_count()
+    read = read_receipt if ocr_available() else preprocess_only
+    receipts = [data for data, _ in corpus(count)]
+    print(f"📊 {count} synthetic 1080x1920 receipts, job {read.__name__}, "
+          f"{workers} worker process(es) on {os.cpu_count()} core(s)")
+
+    for name, (elapsed, latencies, blocked) in (
+            ('inline', run_inline(read, receipts)),
+            ('pool', run_pool(read, receipts, workers))):
+        print(f"{name:8s} {count / elapsed:7.1f} receipts/s   "
+              f"latency p50 {percentile(latencies, 0.5) * 1000:7.0f} ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:7.0f} ms   "
+              f"webhook thread blocked {blocked * 1000:8.3f} ms/receipt")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+         int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,151 @@
+"""Sales reporting over a large synthetic orders table
+
+Compares a 30-day revenue report computed with GROUP BY over orders against
+the same report read from the daily_sales rollups, and the peak memory of a
+CSV export that loads every row (.all()) against the streaming export.
+
+    python benchmarks/bench_reporting.py [orders]
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import Integer, func, select, type_coerce
+from sqlalchemy.orm import sessionmaker
+
+from layers.reporting import rebuild_rollups, sales_summary, stream_orders, write_csv
+from models.database_models import Base, Order, Product, create_db_engine, seed_catalog
+
+DAYS = 365
+
+
+def seed(path, count):
+    """Raw executemany: a year of orders spread over the seeded catalog"""
+    rng = random.Random(7)
+    start = datetime(2025, 1, 1)
+    statuses = ['completed'] * 8 + ['failed', 'pending']
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    prices = dict(conn.execute("SELECT id, price FROM products"))
+    product_ids = list(prices)
+
+    def rows():
+        for n in range(count):
+            created = start + timedelta(seconds=n * DAYS * 86400 // count)
+            status = rng.choice(statuses)
+            product_id = rng.choice(product_ids)
+            finished = created + timedelta(minutes=rng.randint(1, 30)) if status != 'pending' else None
+            yield (n % 20000 + 1, product_id, 1, prices[product_id], '08012345678', status,
+                   f"REF{n:09d}", created.isoformat(' ', 'microseconds'),
+                   finished.isoformat(' ', 'microseconds') if finished else None)
+
+    conn.executemany(
+        "INSERT INTO orders (customer_id, product_id, quantity, amount_paid, phone_to_recharge, status, "
+        "transaction_reference, created_at, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows()
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def group_by_report(db, start, end):
+    day = func.date(Order.completed_at)
+    return db.execute(
+        select(day, Product.network, func.count(Order.id), func.sum(type_coerce(Order.amount_paid, Integer)))
+        .join(Product, Product.id == Order.product_id)
+        .where(Order.status == 'completed',
+               Order.completed_at >= datetime.combine(start, datetime.min.time()),
+               Order.completed_at < datetime.combine(end, datetime.min.time()))
+        .group_by(day, Product.network)
+    ).all()
+
+
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def export_all(db, end, out):
+    """The naive export: load every ORM object, then write"""
+    orders = db.execute(
+        select(Order).where(Order.created_at < datetime.combine(end, datetime.min.time())).order_by(Order.created_at)
+    ).scalars().all()
+    return write_csv(({'order_id': order.id, 'created_at': order.created_at, 'completed_at': order.completed_at,
+                       'status': order.status, 'quantity': order.quantity, 'amount': order.amount_paid.naira,
+                       'phone_to_recharge': order.phone_to_recharge,
+                       'transaction_reference': order.transaction_reference} for order in orders), out)
+
+
+class _Discard:
+    """Output sink, so peak memory measures the export and not the written file"""
+
+    def write(self, data):
+        return len(data)
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def main(count=2000000):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/report.db"
+        engine = create_db_engine(url)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        seed_catalog(db)
+        db.close()
+        engine.dispose()
+
+        started = time.perf_counter()
+        seed(f"{tmp}/report.db", count)
+        print(f"📦 Seeded {count:,} orders in {time.perf_counter() - started:.1f}s")
+
+        db = Session()
+        started = time.perf_counter()
+        rebuild_rollups(db)
+        print(f"🔁 Full rollup rebuild: {time.perf_counter() - started:.2f}s "
+              f"(one-off; afterwards rollups are updated as orders finish)")
+
+        end = datetime(2025, 12, 31).date()
+        start = end - timedelta(days=30)
+        adhoc, adhoc_rows = timed(group_by_report, db, start, end)
+        rollup, rollup_rows = timed(sales_summary, db, start, end)
+        assert sorted((str(r[0]), r[1], r[2], r[3]) for r in adhoc_rows) == \
+            sorted((r['day'].isoformat(), r['network'], r['orders'], r['revenue'].kobo) for r in rollup_rows)
+        print(f"📊 30-day revenue report: GROUP BY orders {adhoc * 1000:8.1f} ms   "
+              f"rollups {rollup * 1000:6.2f} ms   ({adhoc / rollup:,.0f}x)")
+
+        limit = min(count, 500000)
+        subset_end = (datetime(2025, 1, 1) + timedelta(seconds=limit * DAYS * 86400 // count)).date()
+        streamed, stream_time, stream_peak = peak_memory(
+            lambda: write_csv(stream_orders(db, end=subset_end), _Discard()))
+        loaded, load_time, load_peak = peak_memory(lambda: export_all(db, subset_end, _Discard()))
+        print(f"📤 CSV export, streamed: {streamed:,} rows {stream_time:6.1f}s  peak {stream_peak:8.1f} MB")
+        print(f"📤 ORM .all() export:    {loaded:,} rows {load_time:6.1f}s  peak {load_peak:8.1f} MB")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:2]]
+    main(*args)
@@ -0,0 +1,75 @@
+"""Concurrent order inserts: default create_engine() vs the tuned SQLite profile
+
+Each thread inserts orders one transaction at a time, like webhook workers
+recording purchases. Reports throughput and "database is locked" failures.
+
+    python benchmarks/bench_sqlite_concurrent_writes.py [threads] [orders_per_thread]
+"""
+import logging
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from models.database_models import Base, Order, create_db_engine
+
+
+def run(engine, threads, per_thread):
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def writer(worker):
+        barrier.wait()
+        for i in range(per_thread):
+            db = Session()
+            try:
+                db.add(Order(customer_id=worker, product_id=1, amount_paid=500.0,
+                             phone_to_recharge='08012345678', status='pending'))
+                db.commit()
+            except OperationalError as e:
+                errors.append(str(e.orig))
+                db.rollback()
+            finally:
+                db.close()
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    with engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    engine.dispose()
+    return elapsed, errors, mode
+
+
+def main(threads=8, per_thread=250):
+    total = threads * per_thread
+    print(f"📊 {threads} threads × {per_thread} orders, one commit per order")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, engine in [
+            ("default create_engine()", create_engine(f"sqlite:///{tmp}/default.db")),
+            ("create_db_engine() profile", create_db_engine(f"sqlite:///{tmp}/tuned.db")),
+        ]:
+            elapsed, errors, mode = run(engine, threads, per_thread)
+            print(f"{label:<28} journal={mode:<7} {(total - len(errors)) / elapsed:>8,.0f} orders/s   "
+                  f"{elapsed:6.2f}s   locked errors: {len(errors)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
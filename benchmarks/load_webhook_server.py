@@ -0,0 +1,199 @@
+"""Webhook replay load test: Flask's development server vs serve.py
+
+Starts each server as a subprocess on a fresh database, with replies going
+to the local Graph API stub, then replays a script of WhatsApp webhook
+deliveries (greetings, plan lookups, orders and status callbacks from many
+senders) from `concurrency` keep-alive clients. Reports requests/sec and
+latency percentiles, then sends SIGTERM and reports how long the server took
+to exit, how many accepted webhooks were left in the durable queue and how
+many replies reached the Graph API stub (the dev server is killed outright,
+so replies still queued behind the per-recipient rate limit are lost).
+
+    python benchmarks/load_webhook_server.py [requests] [concurrency] [servers...]
+
+servers default to: flask gunicorn waitress uvicorn (those not installed are skipped;
+uvicorn serves the asyncio variant in asgi.py)
+"""
+import http.client
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+from tests.graph_api_stub import GraphAPIStub
+
+MESSAGES = ['hi', 'price', 'MTN', 'MTN 1GB', 'GLO 2GB', 'airtel plans', 'help', 'I want 5GB MTN']
+
+# The development server exactly as run_week2.py used to start it
+FLASK_DEV = ("import sys; sys.path.insert(0, '.'); from config import config; from app import create_app; "
+             "app = create_app(); app.extensions['data_seller'].start(); "
+             "app.run(host='127.0.0.1', port=config.PORT, use_reloader=False)")
+
+
+def webhook_script(count):
+    """`count` webhook bodies: mostly text messages, every fifth a delivery status"""
+    bodies = []
+    for n in range(count):
+        sender = f"23480{n % 400:08d}"
+        if n % 5 == 4:
+            value = {'statuses': [{'id': f"wamid.out{n}", 'recipient_id': sender, 'status': 'delivered'}]}
+        else:
+            value = {'messages': [{'id': f"wamid.load{n}", 'from': sender, 'type': 'text',
+                                   'text': {'body': MESSAGES[n % len(MESSAGES)]}}]}
+        bodies.append(json.dumps({'object': 'whatsapp_business_account',
+                                  'entry': [{'changes': [{'value': value}]}]}).encode())
+    return bodies
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, port, workdir, graph_url):
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{workdir / 'load.db'}",
+               WEBHOOK_QUEUE_DB=str(workdir / 'webhook_queue.db'),
+               WHATSAPP_API_URL=graph_url, WHATSAPP_TOKEN='load-token', WHATSAPP_PHONE_NUMBER_ID='1234567890',
+               HOST='127.0.0.1', PORT=str(port), LOG_LEVEL='WARNING', RETENTION_ENABLED='false')
+    subprocess.run([sys.executable, '-c', "import sys; sys.path.insert(0, '.'); "
+                    "from models.database_models import init_db; init_db()"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    if name == 'flask':
+        command = [sys.executable, '-c', FLASK_DEV]
+    else:
+        command = [sys.executable, 'serve.py', '--server', name]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{name} did not start on port {port}")
+
+
+def replay(port, bodies, concurrency):
+    """POST every body from `concurrency` threads; returns (elapsed seconds, latencies, errors)"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    cursor = iter(range(len(bodies)))
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        mine = []
+        while True:
+            with lock:
+                index = next(cursor, None)
+            if index is None:
+                break
+            started = time.perf_counter()
+            try:
+                conn.request('POST', '/webhook', body=bodies[index], headers={'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(type(e).__name__)
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            mine.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, sorted(latencies), errors
+
+
+def percentile(samples, fraction):
+    return samples[max(int(len(samples) * fraction) - 1, 0)]
+
+
+def undrained(workdir):
+    """Accepted webhooks still sitting in any worker's durable queue file"""
+    total = 0
+    for path in workdir.glob('webhook_queue*.db'):
+        conn = sqlite3.connect(path)
+        total += conn.execute("SELECT COUNT(*) FROM webhook_queue").fetchone()[0]
+        conn.close()
+    return total
+
+
+def replies_sent(stub):
+    with stub._lock:
+        return sum(1 for request in stub.requests if 'text' in request['json'])
+
+
+def run(name, bodies, concurrency, stub):
+    sent_before = replies_sent(stub)
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        process = start_server(name, port, Path(workdir), stub.url)
+        try:
+            replay(port, bodies[:200], concurrency)  # warm up
+            elapsed, latencies, errors = replay(port, bodies, concurrency)
+        finally:
+            stopping = time.perf_counter()
+            process.send_signal(signal.SIGTERM)
+            try:
+                exit_code = process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                exit_code = 'killed'
+            shutdown = time.perf_counter() - stopping
+        left = undrained(Path(workdir))
+    sent = replies_sent(stub) - sent_before
+
+    print(f"{name:<10}{len(latencies) / elapsed:>9.0f} req/s   p50 {percentile(latencies, 0.5) * 1000:7.2f} ms   "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.2f} ms   max {latencies[-1] * 1000:7.2f} ms   "
+          f"errors {len(errors)}   shutdown {shutdown:.1f}s (exit {exit_code})   "
+          f"undrained {left}   replies sent {sent}")
+
+
+def main(requests=5000, concurrency=32, servers=('flask', 'gunicorn', 'waitress', 'uvicorn')):
+    bodies = webhook_script(requests)
+    print(f"📊 Replaying {requests} webhooks from {concurrency} clients")
+    with GraphAPIStub() as stub:
+        # Servers exit with keep-alive connections to the stub still open; that is expected here
+        stub._server.handle_error = lambda request, client_address: None
+        for name in servers:
+            if name != 'flask':
+                try:
+                    __import__(name)
+                except ImportError:
+                    print(f"{name:<10}not installed, skipped")
+                    continue
+            run(name, bodies, concurrency, stub)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 5000,
+         int(args[1]) if len(args) > 1 else 32,
+         tuple(args[2:]) or ('flask', 'gunicorn', 'waitress', 'uvicorn'))
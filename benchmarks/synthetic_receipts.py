@@ -0,0 +1,117 @@
+"""Synthetic bank transfer receipts for the receipt benchmarks
+
+Phone-screenshot sized JPEGs (1080x1920 by default) with a bank-coloured
+header, the usual transfer fields and a little sensor noise. Each receipt's
+true fields are returned alongside it so OCR output can be checked.
+
+    python benchmarks/synthetic_receipts.py <output_dir> [count]
+"""
+import io
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Header colour and wording per bank (the BankVerifier list)
+BANKS = {
+    'GTB': ((221, 79, 5), 'GTBank'),
+    'ZENITH': ((228, 0, 43), 'Zenith Bank'),
+    'ACCESS': ((242, 101, 34), 'Access Bank'),
+    'UBA': ((213, 0, 0), 'UBA'),
+    'FIRSTBANK': ((0, 51, 102), 'FirstBank'),
+    'OPAY': ((29, 207, 159), 'OPay'),
+}
+
+
+def receipt_fields(rng):
+    bank = rng.choice(sorted(BANKS))
+    when = datetime(2026, 1, 1) + timedelta(minutes=rng.randrange(60 * 24 * 300))
+    return {
+        'bank': bank,
+        'amount': f"{rng.choice([300, 500, 1000, 1200, 1500, 2000, 2500, 5000])}.00",
+        'reference': f"{rng.randrange(10 ** 11, 10 ** 12)}{when:%y%m%d%H%M}{rng.randrange(10 ** 5):05d}",
+        'date': f"{when:%d/%m/%Y}",
+        'time': f"{when:%H:%M}",
+    }
+
+
+def render_receipt(fields, size=(1080, 1920), rng=None, quality=85):
+    """JPEG bytes of a receipt showing `fields`"""
+    rng = rng or random.Random(0)
+    width, height = size
+    scale = width / 1080
+    colour, title = BANKS[fields['bank']]
+    large = ImageFont.load_default(size=int(64 * scale))
+    medium = ImageFont.load_default(size=int(44 * scale))
+
+    image = Image.new('RGB', size, (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, int(260 * scale)), fill=colour)
+    draw.text((int(60 * scale), int(90 * scale)), title, font=large, fill=(255, 255, 255))
+
+    amount = f"{float(fields['amount']):,.2f}"
+    lines = [
+        ('Transfer Successful', large),
+        (f"Amount: NGN {amount}", large),
+        ('Beneficiary: DATA SELLER ENT', medium),
+        ('Account: 0123456789', medium),
+        (f"Session ID: {fields['reference']}", medium),
+        (f"Date: {fields['date']} {fields['time']}", medium),
+        ('Narration: data purchase', medium),
+    ]
+    y = int(420 * scale)
+    for text, font in lines:
+        draw.text((int(60 * scale), y), text, font=font, fill=(20, 20, 20))
+        y += int((130 if font is large else 100) * scale)
+    draw.text((int(60 * scale), height - int(200 * scale)), 'Thank you for banking with us', font=medium,
+              fill=(120, 120, 120))
+
+    pixels = np.asarray(image, dtype=np.int16)
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, 6, pixels.shape)
+    image = Image.fromarray(np.clip(pixels + noise, 0, 255).astype(np.uint8))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def amount_value_box(fields, size=(1080, 1920)):
+    """(left, top, right, bottom) of the amount figure on a rendered receipt, for field-level OCR"""
+    scale = size[0] / 1080
+    large = ImageFont.load_default(size=int(64 * scale))
+    left = int(60 * scale) + int(large.getlength('Amount: '))
+    top = int((420 + 130) * scale)
+    right = left + int(large.getlength(f"NGN {float(fields['amount']):,.2f}"))
+    return left - int(10 * scale), top - int(10 * scale), right + int(10 * scale), top + int(85 * scale)
+
+
+def corpus(count, seed=42, size=(1080, 1920)):
+    """[(jpeg bytes, fields)] for `count` receipts, the same for the same seed"""
+    rng = random.Random(seed)
+    receipts = []
+    for _ in range(count):
+        fields = receipt_fields(rng)
+        receipts.append((render_receipt(fields, size, rng), fields))
+    return receipts
+
+
+def write_corpus(directory, count, seed=42, size=(1080, 1920)):
+    """Write the corpus as receipt_NNNN.jpg files; returns [(path, fields)]"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    for n, (data, fields) in enumerate(corpus(count, seed, size)):
+        path = directory / f"receipt_{n:04d}.jpg"
+        path.write_bytes(data)
+        written.append((str(path), fields))
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    files = write_corpus(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 50)
+    print(f"🧾 Wrote {len(files)} receipts to {sys.argv[1]}")
@@ -1,11 +1,52 @@
 # config.py
 import os
-import logging
-from dotenv import load_dotenv
+import threading
 from pathlib import Path
 
-# Load environment variables
-load_dotenv()
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def load_environment():
+    """Read .env into os.environ once; real environment variables win"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv(Path(__file__).parent / '.env')
+            _env_loaded = True
+
+
+def as_bool(value):
+    return str(value).lower() == 'true'
+
+
+class Setting:
+    """A Config value read from the environment the first time it is used
+
+    Importing config has no side effects: .env is loaded on the first setting
+    read, and each value is cached on the instance after that (so tests can
+    still monkeypatch it).
+    """
+
+    def __init__(self, default, cast=str):
+        self.default = default
+        self.cast = cast
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        load_environment()
+        value = self.cast(os.getenv(self.name, self.default))
+        instance.__dict__[self.name] = value
+        return value
+
 
 class Config:
     """Configuration management class"""
@@ -14,30 +55,108 @@ class Config:
     BASE_DIR = Path(__file__).parent
 
     # WhatsApp Configuration
-    WHATSAPP_TOKEN = os.getenv('WHATSAPP_TOKEN', '')
-    WHATSAPP_PHONE_NUMBER_ID = os.getenv('WHATSAPP_PHONE_NUMBER_ID', '')
-    VERIFY_TOKEN = os.getenv('VERIFY_TOKEN', '')
+    WHATSAPP_TOKEN = Setting('')
+    WHATSAPP_PHONE_NUMBER_ID = Setting('')
+    VERIFY_TOKEN = Setting('')
+    WHATSAPP_DISPATCH_WORKERS = Setting(8, int)
+    WHATSAPP_API_URL = Setting('https://graph.facebook.com/v17.0')
+    WHATSAPP_POOL_SIZE = Setting(20, int)
+    WHATSAPP_CONNECT_TIMEOUT = Setting(3.05, float)
+    WHATSAPP_READ_TIMEOUT = Setting(10, float)
+    WHATSAPP_MAX_RETRIES = Setting(3, int)
+    WHATSAPP_RETRY_BACKOFF = Setting(0.5, float)
+
+    # Duplicate Delivery Protection
+    DEDUP_TTL_SECONDS = Setting(86400, int)
+    DEDUP_MAX_ENTRIES = Setting(100000, int)
+    DEDUP_PERSISTENT = Setting(False, as_bool)  # share across processes
+
+    # Outbound Message Dispatcher
+    OUTBOUND_DISPATCH_ENABLED = Setting(True, as_bool)
+    OUTBOUND_WORKERS = Setting(4, int)
+    OUTBOUND_GLOBAL_RATE = Setting(80, float)  # messages/sec
+    OUTBOUND_GLOBAL_BURST = Setting(80, int)
+    OUTBOUND_RECIPIENT_RATE = Setting(1, float)
+    OUTBOUND_RECIPIENT_BURST = Setting(3, int)
+    OUTBOUND_COALESCE_WINDOW = Setting(0.25, float)  # seconds
 
     # Database Configuration
-    DATABASE_URL = os.getenv('DATABASE_URL', f'sqlite:///{BASE_DIR}/storage/databases/data_business.db')
+    DATABASE_URL = Setting(f'sqlite:///{BASE_DIR}/storage/databases/data_business.db')
+    DB_POOL_SIZE = Setting(10, int)
+    DB_MAX_OVERFLOW = Setting(20, int)
+    DB_POOL_PRE_PING = Setting(True, as_bool)
+    DB_POOL_RECYCLE = Setting(1800, int)  # seconds
+    SQLITE_BUSY_TIMEOUT_MS = Setting(5000, int)
+    SQLITE_MMAP_SIZE = Setting(268435456, int)  # 256 MB
+    SQLITE_CACHE_SIZE_KB = Setting(65536, int)  # 64 MB
+    CATALOG_REFRESH_SECONDS = Setting(30, int)
+
+    # Conversation State
+    CONVERSATION_TTL_SECONDS = Setting(1800, int)
+    CONVERSATION_CACHE_SIZE = Setting(10000, int)
+    CONVERSATION_FLUSH_SECONDS = Setting(2, float)
+    CUSTOMER_ACTIVITY_FLUSH_SECONDS = Setting(5, float)
+
+    # Retention / Archival
+    RETENTION_ENABLED = Setting(True, as_bool)
+    RETENTION_INTERVAL_SECONDS = Setting(3600, int)
+    ORDER_ARCHIVE_AFTER_DAYS = Setting(90, int)
+    ORDER_ARCHIVE_DIR = Setting('')  # empty = storage/databases/archive
+    CONVERSATION_RETENTION_DAYS = Setting(30, int)
+    RETENTION_BATCH_SIZE = Setting(500, int)
+    RETENTION_BATCH_PAUSE = Setting(0.05, float)  # seconds between batches
+    RETENTION_VACUUM_PAGES = Setting(2000, int)
 
     # Bank API Configuration
-    BANK_API_KEY = os.getenv('BANK_API_KEY', '')
-    BANK_API_SECRET = os.getenv('BANK_API_SECRET', '')
+    BANK_API_KEY = Setting('')
+    BANK_API_SECRET = Setting('')
 
     # Data Purchase Website Configuration
-    DATA_WEBSITE_URL = os.getenv('DATA_WEBSITE_URL', '')
-    DATA_WEBSITE_USERNAME = os.getenv('DATA_WEBSITE_USERNAME', '')
-    DATA_WEBSITE_PIN = os.getenv('DATA_WEBSITE_PIN', '')
+    DATA_WEBSITE_URL = Setting('')
+    DATA_WEBSITE_USERNAME = Setting('')
+    DATA_WEBSITE_PIN = Setting('')
 
     # Image Processing Configuration
-    TESSERACT_PATH = os.getenv('TESSERACT_PATH', '/usr/bin/tesseract')
+    TESSERACT_PATH = Setting('/usr/bin/tesseract')
+    OCR_BACKEND = Setting('auto')  # auto (tesserocr, else pytesseract) | tesserocr | pytesseract
+    OCR_LANG = Setting('eng')
+    TESSDATA_DIR = Setting('')  # language data directory; empty = tesseract's default
+
+    # Receipt Processing (OCR in worker processes, results sent as a follow-up reply)
+    RECEIPT_PROCESSING_ENABLED = Setting(True, as_bool)
+    RECEIPT_WORKERS = Setting(0, int)  # processes; 0 = one per CPU core
+    RECEIPT_QUEUE_SIZE = Setting(64, int)  # receipts waiting for a worker before customers are asked to resend
+    RECEIPT_TIMEOUT = Setting(30.0, float)  # seconds per receipt before its worker is killed and replaced
+    RECEIPT_DOWNLOAD_TIMEOUT = Setting(15.0, float)  # seconds to fetch the image; RECEIPT_TIMEOUT starts after
+    RECEIPT_ARCHIVE_ENABLED = Setting(True, as_bool)  # keep each original image in storage/receipts for audit
+    RECEIPT_OCR_DPI = Setting(200, int)  # receipts are shrunk to this before OCR; 0 = OCR the whole page at full size
+    RECEIPT_MIN_CONFIDENCE = Setting(90, int)  # line confidence (0-100) at which a field counts as read
+    RECEIPT_FINGERPRINTS_ENABLED = Setting(True, as_bool)  # answer repeated images without OCR, flag lookalikes
+    RECEIPT_NEAR_DUPLICATE_DISTANCE = Setting(6, int)  # perceptual hash bits (of 256, at most 7) still "the same image"
 
     # Application Settings
-    DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
-    HOST = os.getenv('HOST', '0.0.0.0')
-    PORT = int(os.getenv('PORT', 5000))
-    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    DEBUG = Setting(False, as_bool)
+    HOST = Setting('0.0.0.0')
+    PORT = Setting(5000, int)
+    LOG_LEVEL = Setting('INFO')
+
+    # Production Server (serve.py)
+    WEB_SERVER = Setting('auto')  # auto | gunicorn | waitress | uvicorn
+    WEB_WORKERS = Setting(2, int)  # processes (gunicorn only)
+    WEB_THREADS = Setting(8, int)  # request threads per process
+    WEB_TIMEOUT = Setting(30, int)  # seconds before a stuck worker is restarted
+    WEB_GRACEFUL_TIMEOUT = Setting(20, int)  # seconds for in-flight requests on SIGTERM
+    WEB_DRAIN_TIMEOUT = Setting(15, int)  # then seconds to drain queued webhooks and replies
+
+    # Asyncio Webhook Path (WEBHOOK_MODE=async, served by uvicorn via asgi.py)
+    WEBHOOK_MODE = Setting('threaded')  # threaded | async
+    ASYNC_MAX_IN_FLIGHT = Setting(5000, int)  # webhooks being processed at once, and message-handling threads
+    ASYNC_HTTP_CONNECTIONS = Setting(200, int)  # concurrent Graph API requests
+
+    # Webhook Ingestion Queue
+    WEBHOOK_QUEUE_SIZE = Setting(1000, int)
+    WEBHOOK_WORKERS = Setting(4, int)
+    WEBHOOK_QUEUE_DB = Setting('')  # empty = in-memory only
 
     # File Storage Paths
     @property
@@ -52,10 +171,11 @@ class Config:
     def DATABASES_DIR(self):
         return self.BASE_DIR / 'storage' / 'databases'
 
-# Create configuration instance
-config = Config()
+    def ensure_directories(self):
+        """Create the storage directories; called by the entry points, not at import"""
+        for directory in (self.RECEIPTS_DIR, self.LOGS_DIR, self.DATABASES_DIR):
+            directory.mkdir(parents=True, exist_ok=True)
 
-# Ensure storage directories exist
-config.RECEIPTS_DIR.mkdir(parents=True, exist_ok=True)
-config.LOGS_DIR.mkdir(parents=True, exist_ok=True)
-config.DATABASES_DIR.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+
+# Create configuration instance
+config = Config()
\ No newline at end of file
@@ -0,0 +1,413 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from config import config
+from layers.outbound_dispatcher import PRIORITY_NORMAL, TokenBucket, _Outbound
+from layers.whatsapp_handler import (RETRY_STATUS_CODES, MessageResponder, extract_events, group_by_sender,
+                                     process_status, summarize_results)
+from utils.dedup_cache import MessageDeduplicator
+
+logger = logging.getLogger(__name__)
+
+# Connections per httpx client; ASYNC_HTTP_CONNECTIONS is spread over as many clients as needed
+CONNECTIONS_PER_CLIENT = 20
+
+
+async def _take(bucket):
+    """Wait on the event loop (not a thread) until the token bucket lets us through"""
+    throttled = False
+    while True:
+        wait = bucket.try_acquire()
+        if not wait:
+            return throttled
+        throttled = True
+        await asyncio.sleep(wait)
+
+
+class AsyncOutboundSender:
+    """asyncio counterpart of OutboundDispatcher
+
+    Each pending message is a task instead of a queue slot for a sender
+    thread, so thousands can wait on the Graph API at once; `max_in_flight`
+    caps concurrent HTTP requests. Coalescing, the global and per-recipient
+    token buckets and in-order delivery per recipient behave as in the
+    threaded dispatcher, except that a message waiting behind an earlier
+    send to the same recipient keeps accepting texts until its turn.
+    Priorities are accepted but not reordered.
+    """
+
+    def __init__(self, send_func, max_in_flight=200, global_rate=80.0, global_burst=80,
+                 recipient_rate=1.0, recipient_burst=3, coalesce_window=0.25):
+        self.send_func = send_func
+        self.coalesce_window = coalesce_window
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.recipient_rate = recipient_rate
+        self.recipient_burst = recipient_burst
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self._open = {}        # recipient -> entry still accepting texts
+        self._recipients = {}  # recipient -> [lock keeping sends in order, token bucket, tasks using it]
+        self._tasks = set()
+
+        # Metrics
+        self.submitted_total = 0
+        self.coalesced_total = 0
+        self.sent_total = 0
+        self.failed_total = 0
+        self.throttle_events = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, to, text, priority=PRIORITY_NORMAL):
+        """Queue a text for `to`, merging it into a pending message when possible. Call from the loop."""
+        self.submitted_total += 1
+        entry = self._open.get(to)
+        if entry is not None and entry.can_join(text):
+            entry.join(text, priority)
+            self.coalesced_total += 1
+            return
+
+        entry = _Outbound(to, text, priority, time.monotonic(), self.coalesce_window)
+        self._open[to] = entry
+        recipient = self._recipients.get(to)
+        if recipient is None:
+            recipient = self._recipients[to] = [asyncio.Lock(), TokenBucket(self.recipient_rate,
+                                                                            self.recipient_burst), 0]
+        recipient[2] += 1
+        # Queue on the recipient's lock now, so sends go out in submission order
+        task = asyncio.ensure_future(self._send(entry, recipient))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, entry, recipient):
+        lock, bucket, _ = recipient
+        try:
+            async with lock:
+                await asyncio.sleep(max(entry.ready_at - time.monotonic(), 0))
+                if self._open.get(entry.to) is entry:
+                    del self._open[entry.to]
+
+                # Recipient first: a global token is only spent right before the send
+                throttled = await _take(bucket)
+                async with self._in_flight:
+                    throttled = await _take(self.global_bucket) or throttled
+                    waited = time.monotonic() - entry.enqueued_at
+                    try:
+                        result = await self.send_func(entry.to, entry.body)
+                    except Exception as e:
+                        logger.error(f"❌ Outbound send to {entry.to} failed: {e}")
+                        result = None
+                self._record_send(waited, throttled, failed=result is None)
+        finally:
+            recipient[2] -= 1
+            if not recipient[2] and self._recipients.get(entry.to) is recipient:
+                del self._recipients[entry.to]
+
+    def _record_send(self, waited, throttled, failed):
+        if failed:
+            self.failed_total += 1
+        else:
+            self.sent_total += 1
+        if throttled:
+            self.throttle_events += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    @property
+    def depth(self):
+        return len(self._tasks)
+
+    async def drain(self, timeout=None):
+        """Wait until every queued message has been sent or failed. Returns True if drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._tasks:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            await asyncio.wait(set(self._tasks), timeout=remaining)
+        return True
+
+    def metrics(self):
+        completed = self.sent_total + self.failed_total
+        return {
+            'depth': self.depth,
+            'max_in_flight': self.max_in_flight,
+            'submitted_total': self.submitted_total,
+            'coalesced_total': self.coalesced_total,
+            'sent_total': self.sent_total,
+            'failed_total': self.failed_total,
+            'throttle_events': self.throttle_events,
+            'avg_wait_ms': round(self._wait_total / completed * 1000, 2) if completed else 0.0,
+            'max_wait_ms': round(self._wait_max * 1000, 2)
+        }
+
+
+class AsyncWhatsAppHandler(MessageResponder):
+    """WhatsAppHandler for the asyncio server: httpx.AsyncClient and AsyncOutboundSender
+
+    Message handling (dedup, customer activity, bot replies) is shared with
+    the threaded handler; only the I/O differs. Its database calls run on a
+    dedicated pool of up to ASYNC_MAX_IN_FLIGHT threads (started as needed),
+    so every webhook the processor admits can be handled at once rather than
+    queueing for the loop's default executor. Events from one sender are
+    handled in order, different senders concurrently.
+    """
+
+    def __init__(self, bot_handler=None, customer_activity=None, client=None, receipts=None, orders=None):
+        self.bot_handler = bot_handler
+        self.customer_activity = customer_activity
+        self.receipts = receipts
+        self.orders = orders
+        # The loop webhooks run on; receipt results come back from other threads through it
+        self._loop = None
+        self.base_url = f"{config.WHATSAPP_API_URL.rstrip('/')}/{config.WHATSAPP_PHONE_NUMBER_ID}"
+        self.headers = {
+            "Authorization": f"Bearer {config.WHATSAPP_TOKEN}",
+            "Content-Type": "application/json"
+        }
+        self.max_retries = config.WHATSAPP_MAX_RETRIES
+        self.retry_backoff = config.WHATSAPP_RETRY_BACKOFF
+        # httpcore rescans every pooled connection for every queued request, which gets
+        # quadratic past a few dozen connections, so the pool is split into small clients
+        shards = max(1, -(-config.ASYNC_HTTP_CONNECTIONS // CONNECTIONS_PER_CLIENT))
+        per_client = -(-config.ASYNC_HTTP_CONNECTIONS // shards)
+        self.clients = [client] if client else [
+            httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(config.WHATSAPP_READ_TIMEOUT, connect=config.WHATSAPP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=per_client, max_keepalive_connections=per_client)
+            )
+            for _ in range(shards)
+        ]
+        self._next_client = 0
+        self.dedup = MessageDeduplicator(
+            ttl=config.DEDUP_TTL_SECONDS,
+            max_entries=config.DEDUP_MAX_ENTRIES,
+            persistent=config.DEDUP_PERSISTENT
+        )
+        self.dispatcher = None
+        if config.OUTBOUND_DISPATCH_ENABLED:
+            self.dispatcher = AsyncOutboundSender(
+                self.send_text_message,
+                max_in_flight=config.ASYNC_HTTP_CONNECTIONS,
+                global_rate=config.OUTBOUND_GLOBAL_RATE,
+                global_burst=config.OUTBOUND_GLOBAL_BURST,
+                recipient_rate=config.OUTBOUND_RECIPIENT_RATE,
+                recipient_burst=config.OUTBOUND_RECIPIENT_BURST,
+                coalesce_window=config.OUTBOUND_COALESCE_WINDOW
+            )
+        self._inline_sends = set()
+        self._respond_pool = ThreadPoolExecutor(max_workers=config.ASYNC_MAX_IN_FLIGHT, thread_name_prefix='respond')
+        logger.info("📱 Async WhatsApp Handler initialized")
+
+    async def _post(self, path, payload):
+        """POST to the Graph API, retrying 429/5xx and connection errors with jittered backoff
+
+        Only failures to connect are retried; after a read timeout the API may
+        already have accepted the message (see WhatsAppHandler._post).
+        """
+        url = f"{self.base_url}/{path}"
+        self._next_client = (self._next_client + 1) % len(self.clients)
+        client = self.clients[self._next_client]
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(url, json=payload)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt == self.max_retries:
+                    raise
+                await self._sleep_before_retry(attempt)
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+
+            logger.warning(f"⚠️  Graph API returned {response.status_code}, retrying ({attempt + 1}/{self.max_retries})")
+            await self._sleep_before_retry(attempt, response.headers.get('Retry-After'))
+
+    async def _sleep_before_retry(self, attempt, retry_after=None):
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = self.retry_backoff * (2 ** attempt)
+        await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+    async def send_text_message(self, to, message):
+        """Send text message via WhatsApp API"""
+        if not config.WHATSAPP_TOKEN or config.WHATSAPP_TOKEN.startswith('your_'):
+            logger.warning("⚠️  Cannot send message - WhatsApp token not configured")
+            return None
+
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "text": {"body": message}
+        }
+
+        try:
+            logger.info(f"📤 Sending message to {to}")
+            response = await self._post("messages", payload)
+
+            if response.status_code == 200:
+                logger.info("✅ Message sent successfully")
+                return response.json()
+            else:
+                logger.error(f"❌ Message send failed: {response.status_code} - {response.text}")
+                return None
+
+        except Exception as e:
+            logger.error(f"❌ Error sending message: {e}")
+            return None
+
+    def reply(self, to, message, priority=PRIORITY_NORMAL):
+        """Queue a reply on the async sender, or send it as its own task when dispatch is disabled"""
+        if self.dispatcher is not None:
+            self.dispatcher.submit(to, message, priority)
+            return
+        task = asyncio.ensure_future(self.send_text_message(to, message))
+        self._inline_sends.add(task)
+        task.add_done_callback(self._inline_sends.discard)
+
+    def reply_threadsafe(self, to, message):
+        """reply() from a receipt processor thread: hand it to the event loop"""
+        self._loop.call_soon_threadsafe(self.reply, to, message)
+
+    async def _download_media(self, media_id):
+        client = self.clients[0]
+        lookup = await client.get(f"{config.WHATSAPP_API_URL.rstrip('/')}/{media_id}")
+        lookup.raise_for_status()
+        response = await client.get(lookup.json()['url'])
+        response.raise_for_status()
+        return response.content
+
+    def download_media(self, media_id):
+        """Fetch an inbound media file; called from receipt processor threads, runs on the loop"""
+        return asyncio.run_coroutine_threadsafe(self._download_media(media_id), self._loop).result()
+
+    async def process_webhook(self, data):
+        """Process incoming webhook from WhatsApp (see WhatsAppHandler.process_webhook)"""
+        self._loop = asyncio.get_running_loop()
+        try:
+            logger.info("🔄 Processing webhook data...")
+
+            events = extract_events(data)
+            if not events:
+                logger.info("ℹ️  Webhook received but no messages found")
+                return {'processed': False, 'results': []}
+
+            results = [None] * len(events)
+
+            async def run_sender(sender_events):
+                for index, (kind, sender, item) in sender_events:
+                    if kind == 'message':
+                        # Dedup claims, conversation loads and bot writes hit the database; keep them off the loop
+                        result, response = await asyncio.get_running_loop().run_in_executor(
+                            self._respond_pool, self.respond, item)
+                        if response is not None:
+                            self.reply(result['sender'], response)
+                        results[index] = result
+                    else:
+                        results[index] = process_status(item)
+                    await asyncio.sleep(0)  # let other senders' events in between
+
+            await asyncio.gather(*(run_sender(sender_events)
+                                   for sender_events in group_by_sender(events).values()))
+            return summarize_results(results)
+
+        except Exception as e:
+            logger.error(f"❌ Webhook processing error: {e}")
+            return {'processed': False, 'error': str(e)}
+
+    async def close(self, timeout=10):
+        """Send queued replies, then close the HTTP client. Returns True if drained."""
+        drained = await self.dispatcher.drain(timeout) if self.dispatcher else True
+        if self._inline_sends:
+            await asyncio.wait(set(self._inline_sends), timeout=timeout)
+        for client in self.clients:
+            await client.aclose()
+        self._respond_pool.shutdown(wait=False)
+        return drained
+
+
+class AsyncWebhookProcessor:
+    """Accepted webhooks processed as tasks on the event loop, at most `max_in_flight` at once
+
+    The asyncio counterpart of WebhookQueue: enqueue() returns straight away
+    and is rejected (so WhatsApp retries) when the limit is reached.
+    """
+
+    def __init__(self, handler, max_in_flight=5000, rate_window=60):
+        self.handler = handler
+        self.max_in_flight = max_in_flight
+        self.rate_window = rate_window
+        self._tasks = set()
+        self._completions = deque()
+
+        # Metrics
+        self.enqueued_total = 0
+        self.processed_total = 0
+        self.failed_total = 0
+        self.rejected_total = 0
+        self.peak_in_flight = 0
+
+    def enqueue(self, payload):
+        """Start processing a payload. Returns False when too many are already in flight."""
+        if len(self._tasks) >= self.max_in_flight:
+            self.rejected_total += 1
+            logger.warning("⚠️  Webhook processing at capacity, payload rejected")
+            return False
+
+        task = asyncio.ensure_future(self._process(payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.enqueued_total += 1
+        self.peak_in_flight = max(self.peak_in_flight, len(self._tasks))
+        return True
+
+    async def _process(self, payload):
+        try:
+            result = await self.handler(payload)
+            if result is not None and result.get('error'):
+                self.failed_total += 1
+            else:
+                self.processed_total += 1
+        except Exception as e:
+            self.failed_total += 1
+            logger.error(f"❌ Webhook worker failed: {e}")
+        now = time.monotonic()
+        self._completions.append(now)
+        self._trim_completions(now)
+
+    def _trim_completions(self, now):
+        cutoff = now - self.rate_window
+        while self._completions and self._completions[0] < cutoff:
+            self._completions.popleft()
+
+    async def drain(self, timeout=None):
+        """Wait for every accepted payload to finish. Returns True if drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._tasks:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            await asyncio.wait(set(self._tasks), timeout=remaining)
+        return True
+
+    def metrics(self):
+        self._trim_completions(time.monotonic())
+        return {
+            'in_flight': len(self._tasks),
+            'peak_in_flight': self.peak_in_flight,
+            'capacity': self.max_in_flight,
+            'enqueued_total': self.enqueued_total,
+            'processed_total': self.processed_total,
+            'failed_total': self.failed_total,
+            'rejected_total': self.rejected_total,
+            'drain_rate_per_sec': round(len(self._completions) / self.rate_window, 2)
+        }
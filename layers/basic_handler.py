@@ -1,51 +1,66 @@
 # layers/basic_handler.py
+from layers.nlp_engine import intent_engine, OrderParser
+from layers.catalog_renderer import CatalogRenderer
+from layers.catalog_service import get_catalog_service
+
+# Steps that wait on something other than the customer's next message; chat doesn't move them on
+HELD_STATES = ('payment_verification',)
+
+
 class BasicMessageHandler:
     """Basic message handler for MTN, GLO, and Airtel data business"""
 
-    def __init__(self):
-        # Define your actual data bundles and prices
-        self.data_plans = {
-            'MTN': {
-                '1GB': {'price': 300, 'validity': '7 days'},
-                '2GB': {'price': 500, 'validity': '30 days'},
-                '5GB': {'price': 1000, 'validity': '30 days'},
-                '10GB': {'price': 2000, 'validity': '30 days'}
-            },
-            'GLO': {
-                '1GB': {'price': 280, 'validity': '7 days'},
-                '2.5GB': {'price': 500, 'validity': '30 days'},
-                '5GB': {'price': 950, 'validity': '30 days'},
-                '10GB': {'price': 1900, 'validity': '30 days'}
-            },
-            'AIRTEL': {
-                '1GB': {'price': 320, 'validity': '7 days'},
-                '2GB': {'price': 550, 'validity': '30 days'},
-                '5GB': {'price': 1100, 'validity': '30 days'},
-                '10GB': {'price': 2100, 'validity': '30 days'}
-            }
-        }
+    def __init__(self, catalog=None, conversations=None):
+        # Data bundles and prices come from the shared product catalog
+        self.catalog = catalog or get_catalog_service()
+        # Optional ConversationStore remembering where each customer is in the flow
+        self.conversations = conversations
+        self.catalog_renderer = CatalogRenderer(lambda: (self.catalog.version, self.catalog.data_plans))
+        self._order_parser = (None, None)
+
+    @property
+    def data_plans(self):
+        return self.catalog.data_plans
+
+    @property
+    def order_parser(self):
+        """Order grammar for the current catalog version, rebuilt when plans change"""
+        version, parser = self._order_parser
+        if version != self.catalog.version:
+            version = self.catalog.version
+            parser = OrderParser(self.catalog.data_plans)
+            self._order_parser = (version, parser)
+        return parser
+
+    def update_plan(self, network, size, price, validity=None):
+        """Add or reprice a plan; cached replies are re-rendered on next use"""
+        self.catalog.upsert_plan(network, size, price, validity)
 
     def handle_message(self, message_text, customer_phone):
         """Handle incoming messages for real data business"""
-        message_lower = message_text.lower()
+        intent, slots = intent_engine.classify(message_text)
+
+        if self.conversations is not None:
+            held = self.conversations.get(customer_phone).state in HELD_STATES
+            self.conversations.update(customer_phone, state=None if held else intent, **slots)
 
         # Basic responses for your actual business
-        if any(word in message_lower for word in ['hi', 'hello', 'hey']):
+        if intent == 'greeting':
             return self._get_welcome_message()
 
-        elif any(network in message_lower for network in ['mtn', 'glo', 'airtel']):
-            return self._get_network_plans(message_lower)
+        elif intent == 'network':
+            return self._get_network_plans(slots['network'])
 
-        elif 'data' in message_lower or 'bundle' in message_lower:
+        elif intent == 'catalog':
             return self._get_all_networks()
 
-        elif 'price' in message_lower or 'how much' in message_lower:
+        elif intent == 'pricing':
             return self._get_pricing_info()
 
-        elif 'buy' in message_lower or 'purchase' in message_lower or 'order' in message_lower:
+        elif intent == 'purchase':
             return self._get_purchase_instructions()
 
-        elif 'thank' in message_lower:
+        elif intent == 'thanks':
             return "You're welcome! 😊 Let me know if you need more data bundles."
 
         else:
@@ -64,56 +79,16 @@ Just tell me which network you need, or type *'data'* to see all bundles!"""
 
     def _get_all_networks(self):
         """Show all available networks and popular bundles"""
-        message = "📊 *AVAILABLE DATA BUNDLES*\n\n"
-
-        for network, plans in self.data_plans.items():
-            message += f"*{network}:*\n"
-            for plan, details in list(plans.items())[:2]:  # Show first 2 plans per network
-                message += f"• {plan} - ₦{details['price']} ({details['validity']})\n"
-            message += "\n"
+        return self.catalog_renderer.current().all_networks
 
-        message += "Type *'MTN'*, *'GLO'*, or *'AIRTEL'* to see full plans!\n"
-        message += "Or type *'buy'* for purchase instructions."
-
-        return message
-
-    def _get_network_plans(self, message):
+    def _get_network_plans(self, network):
         """Show plans for a specific network"""
-        if 'mtn' in message:
-            network = 'MTN'
-        elif 'glo' in message:
-            network = 'GLO'
-        elif 'airtel' in message:
-            network = 'AIRTEL'
-        else:
-            return "Please specify: MTN, GLO, or Airtel?"
-
-        plans = self.data_plans[network]
-
-        message = f"📶 *{network} DATA PLANS*\n\n"
-        for plan, details in plans.items():
-            message += f"• *{plan}* - ₦{details['price']} ({details['validity']})\n"
-
-        message += f"\nTo buy {network} data, send:\n"
-        message += f"'Buy {network} [size] for [phone number]'\n"
-        message += f"Example: 'Buy {network} 2GB for 08012345678'"
-
-        return message
+        reply = self.catalog_renderer.current().network_plans.get(network)
+        return reply or "Please specify: MTN, GLO, or Airtel?"
 
     def _get_pricing_info(self):
         """Provide pricing information"""
-        return """💰 *QUICK PRICE LIST*
-
-*MTN:*
-1GB - ₦300 | 2GB - ₦500 | 5GB - ₦1000 | 10GB - ₦2000
-
-*GLO:*
-1GB - ₦280 | 2.5GB - ₦500 | 5GB - ₦950 | 10GB - ₦1900
-
-*AIRTEL:*
-1GB - ₦320 | 2GB - ₦550 | 5GB - ₦1100 | 10GB - ₦2100
-
-Type the network name (MTN, GLO, AIRTEL) for full details!"""
+        return self.catalog_renderer.current().pricing
 
     def _get_purchase_instructions(self):
         """Instructions for purchasing data"""
@@ -145,37 +120,18 @@ You can ask me about:
 
 What would you like to know? 😊"""
 
-    def extract_order_details(self, message):
-        """Extract network, size, and phone number from order message"""
-        message_upper = message.upper()
-
-        # Detect network
-        network = None
-        if 'MTN' in message_upper:
-            network = 'MTN'
-        elif 'GLO' in message_upper:
-            network = 'GLO'
-        elif 'AIRTEL' in message_upper:
-            network = 'AIRTEL'
-
-        # Detect data size
-        sizes = ['1GB', '2GB', '5GB', '10GB', '2.5GB']
-        size = None
-        for s in sizes:
-            if s in message_upper:
-                size = s
-                break
-
-        # Extract phone number (simple 11-digit pattern)
-        import re
-        phone_match = re.search(r'(\d{11})', message)
-        phone = phone_match.group(1) if phone_match else None
-
-        return {
-            'network': network,
-            'size': size,
-            'phone_number': phone
-        }
+    def extract_order_details(self, message, customer_phone=None):
+        """Extract network, size, quantity and phone number from order message
+
+        When the customer picked a network earlier in the conversation, it is
+        used for orders like "2GB for 08012345678" that don't repeat it.
+        """
+        details = self.order_parser.parse(message)
+
+        if details['network'] is None and customer_phone and self.conversations is not None:
+            details['network'] = self.conversations.get(customer_phone).context.get('network')
+
+        return details
 
     def simulate_conversation(self):
         """Simulate realistic conversations for your business"""
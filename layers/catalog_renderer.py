@@ -0,0 +1,81 @@
+import threading
+from collections import namedtuple
+
+RenderedCatalog = namedtuple('RenderedCatalog', ['version', 'all_networks', 'pricing', 'network_plans'])
+
+
+def _or_list(items):
+    """'A', 'A or B', 'A, B, or C'"""
+    if len(items) <= 2:
+        return " or ".join(items)
+    return ", ".join(items[:-1]) + ", or " + items[-1]
+
+
+def render_all_networks(data_plans, plans_per_network=2):
+    """Show all available networks and popular bundles"""
+    lines = ["📊 *AVAILABLE DATA BUNDLES*\n\n"]
+
+    for network, plans in data_plans.items():
+        lines.append(f"*{network}:*\n")
+        for plan, details in list(plans.items())[:plans_per_network]:
+            lines.append(f"• {plan} - {details['price']} ({details['validity']})\n")
+        lines.append("\n")
+
+    lines.append(f"Type {_or_list([f'*{network!r}*' for network in data_plans])} to see full plans!\n")
+    lines.append("Or type *'buy'* for purchase instructions.")
+    return "".join(lines)
+
+
+def render_network_plans(network, plans):
+    """Show plans for a specific network"""
+    lines = [f"📶 *{network} DATA PLANS*\n\n"]
+    for plan, details in plans.items():
+        lines.append(f"• *{plan}* - {details['price']} ({details['validity']})\n")
+
+    lines.append(f"\nTo buy {network} data, send:\n")
+    lines.append(f"'Buy {network} [size] for [phone number]'\n")
+    lines.append(f"Example: 'Buy {network} 2GB for 08012345678'")
+    return "".join(lines)
+
+
+def render_pricing(data_plans):
+    """Quick price list covering every network"""
+    sections = ["💰 *QUICK PRICE LIST*"]
+    for network, plans in data_plans.items():
+        prices = " | ".join(f"{plan} - {details['price']}" for plan, details in plans.items())
+        sections.append(f"*{network}:*\n{prices}")
+
+    sections.append(f"Type the network name ({', '.join(data_plans)}) for full details!")
+    return "\n\n".join(sections)
+
+
+class CatalogRenderer:
+    """Renders every catalog reply once per catalog version
+
+    `source` returns (version, data_plans). While the version is unchanged
+    catalog replies are plain attribute/dict lookups; when it changes the
+    replies are rebuilt and swapped in as one immutable RenderedCatalog, so
+    readers never see a half-updated menu.
+    """
+
+    def __init__(self, source):
+        self._source = source
+        self._lock = threading.Lock()
+        self._rendered = None
+
+    def current(self):
+        version, data_plans = self._source()
+        rendered = self._rendered
+        if rendered is not None and rendered.version == version:
+            return rendered
+
+        with self._lock:
+            if self._rendered is None or self._rendered.version != version:
+                self._rendered = RenderedCatalog(
+                    version=version,
+                    all_networks=render_all_networks(data_plans),
+                    pricing=render_pricing(data_plans),
+                    network_plans={network: render_network_plans(network, plans)
+                                   for network, plans in data_plans.items()}
+                )
+            return self._rendered
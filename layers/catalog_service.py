@@ -0,0 +1,176 @@
+import logging
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from sqlalchemy import func
+
+from models.database_models import DEFAULT_DATA_PLANS, Product
+from utils.money import Money
+
+logger = logging.getLogger(__name__)
+
+PlanEntry = namedtuple('PlanEntry', ['product_id', 'network', 'size', 'price', 'validity', 'plan_code'])
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalog at one version"""
+
+    __slots__ = ('version', 'fingerprint', 'index', 'data_plans')
+
+    def __init__(self, version, fingerprint, entries):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.index = MappingProxyType({(entry.network, entry.size): entry for entry in entries})
+
+        # Nested {network: {size: {'price', 'validity'}}} view used by the chat replies
+        data_plans = {}
+        for entry in entries:
+            data_plans.setdefault(entry.network, {})[entry.size] = MappingProxyType(
+                {'price': entry.price, 'validity': entry.validity}
+            )
+        self.data_plans = MappingProxyType({network: MappingProxyType(plans) for network, plans in data_plans.items()})
+
+
+class CatalogService:
+    """Product catalog loaded from the products table into an in-memory index
+
+    Lookups by (network, size) read the current snapshot and never touch the
+    database. `refresh()` runs one cheap aggregate query and only reloads the
+    rows when that fingerprint has changed; `start()` does this periodically
+    on a background thread.
+    """
+
+    def __init__(self, session_factory=None, refresh_interval=30):
+        self._session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._snapshot = CatalogSnapshot(0, None, self._default_entries())
+        self.refresh()
+
+    def _session(self):
+        if self._session_factory is None:
+            from models.database_models import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    @staticmethod
+    def _default_entries():
+        return [
+            PlanEntry(None, network, size, Money.from_naira(details['price']), details['validity'],
+                      f"{network}-{size}")
+            for network, plans in DEFAULT_DATA_PLANS.items()
+            for size, details in plans.items()
+        ]
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    @property
+    def data_plans(self):
+        return self._snapshot.data_plans
+
+    def lookup(self, network, size):
+        """Return the PlanEntry for a network/bundle size, or None"""
+        return self._snapshot.index.get((network, size))
+
+    def refresh(self, force=False):
+        """Reload the catalog if the products table changed. Returns True if reloaded."""
+        db = self._session()
+        try:
+            fingerprint = tuple(db.query(
+                func.count(Product.id), func.max(Product.id), func.max(Product.updated_at)
+            ).filter(Product.network.isnot(None), Product.is_available.is_(True)).one())
+
+            if not force and fingerprint == self._snapshot.fingerprint:
+                return False
+
+            rows = (db.query(Product)
+                    .filter(Product.network.isnot(None), Product.is_available.is_(True))
+                    .order_by(Product.id)
+                    .all())
+            entries = [
+                PlanEntry(row.id, row.network, row.data_size, row.price, row.validity_period, row.plan_code)
+                for row in rows
+            ]
+        except Exception as e:
+            logger.warning(f"⚠️  Could not load catalog from database, keeping current plans: {e}")
+            return False
+        finally:
+            db.close()
+
+        if not entries:
+            logger.warning("⚠️  Product catalog is empty, using default data plans")
+            entries = self._default_entries()
+
+        with self._lock:
+            self._snapshot = CatalogSnapshot(self._snapshot.version + 1, fingerprint, entries)
+        logger.info(f"📦 Catalog loaded: {len(entries)} plans (version {self._snapshot.version})")
+        return True
+
+    def upsert_plan(self, network, size, price, validity=None):
+        """Add or reprice a plan (price as Money or Naira) and reload the catalog"""
+        db = self._session()
+        try:
+            product = db.query(Product).filter_by(network=network, data_size=size).first()
+            if product is None:
+                product = Product(
+                    name=f"{network} {size} Data Bundle",
+                    description=f"{network} {size} data valid for {validity or '30 days'}",
+                    data_size=size,
+                    network=network,
+                    plan_code=f"{network}-{size}",
+                    validity_period=validity or '30 days'
+                )
+                db.add(product)
+            product.price = Money.from_naira(price)
+            if validity:
+                product.validity_period = validity
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self.refresh(force=True)
+
+    def start(self):
+        """Poll for catalog changes in the background"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="catalog-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self.refresh_interval):
+            self.refresh()
+
+
+_catalog_service = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog_service():
+    """Process-wide catalog shared by the chat handler and order creation"""
+    global _catalog_service
+    if _catalog_service is None:
+        with _catalog_lock:
+            if _catalog_service is None:
+                from config import config
+                _catalog_service = CatalogService(refresh_interval=config.CATALOG_REFRESH_SECONDS)
+    return _catalog_service
@@ -0,0 +1,227 @@
+import base64
+import json
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+from models.database_models import ConversationState, upsert_insert
+
+logger = logging.getLogger(__name__)
+
+# Context larger than this (in bytes of JSON) is stored zlib-compressed
+COMPRESS_THRESHOLD = 512
+_COMPRESSED_PREFIX = 'z:'
+
+
+def serialize_context(context):
+    """Compact JSON, compressed and base64-encoded once it gets large"""
+    data = json.dumps(context, separators=(',', ':'), ensure_ascii=False, default=str)
+    if len(data) <= COMPRESS_THRESHOLD:
+        return data
+    return _COMPRESSED_PREFIX + base64.b64encode(zlib.compress(data.encode('utf-8'), 6)).decode('ascii')
+
+
+def deserialize_context(data):
+    if not data:
+        return {}
+    if data.startswith(_COMPRESSED_PREFIX):
+        data = zlib.decompress(base64.b64decode(data[len(_COMPRESSED_PREFIX):])).decode('utf-8')
+    return json.loads(data)
+
+
+class ConversationSession:
+    """Live conversation state for one phone number"""
+
+    __slots__ = ('phone_number', 'state', 'context', 'last_updated', 'last_access')
+
+    def __init__(self, phone_number, state=None, context=None, last_updated=None):
+        self.phone_number = phone_number
+        self.state = state
+        self.context = context or {}
+        self.last_updated = last_updated or datetime.utcnow()
+        self.last_access = time.monotonic()
+
+    def as_row(self):
+        return {
+            'phone_number': self.phone_number,
+            'state': self.state,
+            'context_data': serialize_context(self.context),
+            'last_updated': self.last_updated
+        }
+
+
+class ConversationStore:
+    """In-memory LRU of active conversations with write-behind persistence
+
+    Reads and writes during a conversation hit the in-memory session; a
+    database read only happens the first time a phone number is seen (or after
+    its session aged out of memory). Changed sessions are flushed in batches as
+    one multi-row UPSERT, so several updates to the same phone between flushes
+    cost a single row write.
+    """
+
+    def __init__(self, session_factory=None, ttl=1800, max_sessions=10000, flush_interval=2.0):
+        self._session_factory = session_factory
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.flush_interval = flush_interval
+        self._sessions = OrderedDict()
+        self._dirty = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def _db(self):
+        if self._session_factory is None:
+            from models.database_models import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def get(self, phone_number):
+        """Return the ConversationSession for `phone_number`, loading it once if needed"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(phone_number)
+            if session is not None and now - session.last_access <= self.ttl:
+                self._sessions.move_to_end(phone_number)
+                session.last_access = now
+                self.hits += 1
+                return session
+
+            expired = session
+            # Unflushed changes are newer than anything in the database
+            session = self._dirty.get(phone_number)
+
+        if session is None:
+            session = self._load(phone_number)
+
+        with self._lock:
+            self.misses += 1
+            # Another thread may have loaded (and already changed) this phone while we read the row
+            current = self._dirty.get(phone_number) or self._sessions.get(phone_number)
+            if current is not None and current is not expired:
+                session = current
+            session.last_access = now
+            self._sessions[phone_number] = session
+            self._sessions.move_to_end(phone_number)
+            self._evict(now)
+            return session
+
+    def _load(self, phone_number):
+        db = self._db()
+        try:
+            row = db.query(ConversationState).filter_by(phone_number=phone_number).first()
+            if row is None:
+                return ConversationSession(phone_number)
+            return ConversationSession(phone_number, row.state, deserialize_context(row.context_data),
+                                       row.last_updated)
+        except Exception as e:
+            logger.error(f"❌ Could not load conversation for {phone_number}: {e}")
+            return ConversationSession(phone_number)
+        finally:
+            db.close()
+
+    def _evict(self, now):
+        while self._sessions:
+            phone_number, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_access <= self.ttl:
+                break
+            # Dirty sessions stay in self._dirty until the next flush, nothing is lost
+            self._sessions.popitem(last=False)
+
+    def update(self, phone_number, state=None, **context_updates):
+        """Change the state and/or merge keys into the context; persisted on the next flush"""
+        session = self.get(phone_number)
+        with self._lock:
+            if state is not None:
+                session.state = state
+            session.context.update(context_updates)
+            session.last_updated = datetime.utcnow()
+            self._dirty[phone_number] = session
+        return session
+
+    def reset(self, phone_number, state=None):
+        """Start a fresh conversation, dropping any stored context"""
+        session = self.get(phone_number)
+        with self._lock:
+            session.state = state
+            session.context = {}
+            session.last_updated = datetime.utcnow()
+            self._dirty[phone_number] = session
+        return session
+
+    def flush(self):
+        """Write every changed session in one batched UPSERT. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                dirty, self._dirty = self._dirty, {}
+                rows = [session.as_row() for session in dirty.values()]
+
+            db = self._db()
+            try:
+                stmt = upsert_insert(ConversationState.__table__, db.get_bind())
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['phone_number'],
+                    set_={
+                        'state': stmt.excluded.state,
+                        'context_data': stmt.excluded.context_data,
+                        'last_updated': stmt.excluded.last_updated
+                    }
+                )
+                db.execute(stmt, rows)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"❌ Conversation flush failed, will retry: {e}")
+                with self._lock:
+                    for phone_number, session in dirty.items():
+                        self._dirty.setdefault(phone_number, session)
+                return 0
+            finally:
+                db.close()
+
+            with self._lock:
+                self.flushes += 1
+                self.rows_written += len(rows)
+            return len(rows)
+
+    def start(self):
+        """Flush changed sessions every `flush_interval` seconds in the background"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="conversation-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'active_sessions': len(self._sessions),
+                'pending_writes': len(self._dirty),
+                'hits': self.hits,
+                'misses': self.misses,
+                'flushes': self.flushes,
+                'rows_written': self.rows_written
+            }
@@ -0,0 +1,159 @@
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models.database_models import Customer, upsert_insert
+
+logger = logging.getLogger(__name__)
+
+
+class CustomerActivity:
+    """Customer last-seen and purchase counters without read-modify-write
+
+    Inbound messages only touch an in-memory dict; every `flush_interval`
+    seconds all touched customers are written with one multi-row
+    INSERT ... ON CONFLICT(phone_number) DO UPDATE. Purchase counts ride along
+    in the same statement and are added server-side
+    (total_purchases = total_purchases + excluded.total_purchases), so
+    concurrent workers and processes never overwrite each other's increments.
+    """
+
+    def __init__(self, session_factory=None, flush_interval=5.0):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        # phone_number -> [last_interaction, purchases since last flush]
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.touches = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def _db(self):
+        if self._session_factory is None:
+            from models.database_models import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def touch(self, phone_number, when=None):
+        """Record that the customer just messaged us; written on the next flush"""
+        when = when or datetime.utcnow()
+        with self._lock:
+            self.touches += 1
+            pending = self._pending.get(phone_number)
+            if pending is None:
+                self._pending[phone_number] = [when, 0]
+            elif when > pending[0]:
+                pending[0] = when
+
+    def record_purchase(self, phone_number, count=1):
+        """Add to the customer's total_purchases on the next flush"""
+        with self._lock:
+            pending = self._pending.setdefault(phone_number, [datetime.utcnow(), 0])
+            pending[1] += count
+
+    def _upsert_statement(self, bind):
+        stmt = upsert_insert(Customer.__table__, bind)
+        # Another process may have flushed a later touch first; never move last_interaction back.
+        # SQLite's two-argument max() is scalar (and NULL if either side is), PostgreSQL calls it greatest()
+        greatest = func.greatest if bind.dialect.name == 'postgresql' else func.max
+        current = Customer.__table__.c.last_interaction
+        return stmt.on_conflict_do_update(
+            index_elements=['phone_number'],
+            set_={
+                'last_interaction': greatest(func.coalesce(current, stmt.excluded.last_interaction),
+                                             stmt.excluded.last_interaction),
+                'total_purchases': Customer.__table__.c.total_purchases + stmt.excluded.total_purchases
+            }
+        )
+
+    def flush(self):
+        """Write every pending touch/increment in one bulk UPSERT. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                pending, self._pending = self._pending, {}
+
+            rows = [
+                {'phone_number': phone_number, 'last_interaction': when, 'total_purchases': purchases}
+                for phone_number, (when, purchases) in pending.items()
+            ]
+
+            db = self._db()
+            try:
+                db.execute(self._upsert_statement(db.get_bind()), rows)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"❌ Customer activity flush failed, will retry: {e}")
+                with self._lock:
+                    # Merge back so increments made during the failed flush aren't lost
+                    for phone_number, (when, purchases) in pending.items():
+                        current = self._pending.setdefault(phone_number, [when, 0])
+                        current[0] = max(current[0], when)
+                        current[1] += purchases
+                return 0
+            finally:
+                db.close()
+
+            with self._lock:
+                self.flushes += 1
+                self.rows_written += len(rows)
+            return len(rows)
+
+    def customer_id(self, phone_number):
+        """Return the customer's id, creating the row if needed, in one statement"""
+        db = self._db()
+        try:
+            stmt = upsert_insert(Customer.__table__, db.get_bind())
+            # No-op update so RETURNING yields the existing row's id on conflict
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['phone_number'],
+                set_={'phone_number': stmt.excluded.phone_number}
+            ).returning(Customer.__table__.c.id)
+            customer_id = db.execute(stmt, {
+                'phone_number': phone_number,
+                'last_interaction': datetime.utcnow(),
+                'total_purchases': 0
+            }).scalar_one()
+            db.commit()
+            return customer_id
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self):
+        """Flush pending activity every `flush_interval` seconds in the background"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="customer-activity-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'pending_customers': len(self._pending),
+                'touches': self.touches,
+                'flushes': self.flushes,
+                'rows_written': self.rows_written
+            }
@@ -0,0 +1,186 @@
+import re
+from collections import namedtuple
+
+from utils.general_utils import NIGERIAN_MSISDN_PATTERN, normalize_phone_number
+
+IntentMatch = namedtuple('IntentMatch', ['intent', 'slots'])
+
+# What may follow a keyword for it to count
+WHOLE_WORD = r'\b'
+NO_LETTER_AFTER = r'(?![a-z])'  # "mtn2gb" still names MTN
+PREFIX = ''                     # "bundles", "prices", "buying", "thanks"
+
+# Intents in priority order - when a message matches several, the earliest wins.
+# (intent, keywords, boundary, keyword is a slot value reported under the intent name)
+INTENT_KEYWORDS = [
+    ('greeting', ['hi', 'hello', 'hey'], WHOLE_WORD, False),
+    ('network', ['mtn', 'glo', 'airtel'], NO_LETTER_AFTER, True),
+    ('catalog', ['data', 'bundle'], PREFIX, False),
+    ('pricing', ['price', 'how much'], PREFIX, False),
+    ('purchase', ['buy', 'purchas', 'order'], PREFIX, False),
+    ('thanks', ['thank'], PREFIX, False),
+]
+
+FALLBACK_INTENT = 'help'
+
+
+def _keyword_atoms(keyword, boundary):
+    """Split a keyword into regex atoms; spaces match any run of whitespace"""
+    return [r'\s+' if char == ' ' else re.escape(char) for char in keyword] + [boundary]
+
+
+def _render_trie(node):
+    branches = [atom + _render_trie(child) for atom, child in node.items()]
+    # Longer branches first so alternation prefers the longest keyword
+    branches.sort(key=lambda branch: branch == '')
+    if not branches:
+        return ''
+    if len(branches) == 1:
+        return branches[0]
+    return '(?:' + '|'.join(branches) + ')'
+
+
+def compile_keyword_pattern(keywords):
+    """Compile (keyword, boundary) pairs into one prefix-factored regex
+
+    Keywords sharing a prefix share a branch ("hi|hello|hey|how much" becomes
+    "h(?:i|e(?:llo|y)|ow...)"), so the regex engine tests each position of the
+    message against a trie instead of trying every keyword in turn.
+    """
+    trie = {}
+    for keyword, boundary in keywords:
+        node = trie
+        for atom in _keyword_atoms(keyword, boundary):
+            node = node.setdefault(atom, {})
+    return re.compile(r'\b(' + _render_trie(trie) + ')')
+
+
+class IntentEngine:
+    """Classifies a customer message with one precompiled keyword regex
+
+    Every keyword is compiled into a single word-boundary regex when the
+    engine is built, so a message is scanned once to find both the winning
+    intent and its slots (currently the network named in the message).
+    """
+
+    def __init__(self, intent_keywords=INTENT_KEYWORDS):
+        self._keywords = {}
+        boundaries = []
+        for priority, (intent, keywords, boundary, is_slot) in enumerate(intent_keywords):
+            for keyword in keywords:
+                self._keywords[keyword] = (priority, intent, keyword.upper() if is_slot else None)
+                boundaries.append((keyword, boundary))
+
+        self._findall = compile_keyword_pattern(boundaries).findall
+
+    def classify(self, text):
+        """Return IntentMatch(intent, slots) for `text`"""
+        keywords = self._keywords
+        best_priority = len(keywords)
+        best_intent = FALLBACK_INTENT
+        slots = {}
+
+        for keyword in self._findall(text.lower()):
+            hit = keywords.get(keyword)
+            if hit is None:
+                hit = keywords[' '.join(keyword.split())]
+            priority, intent, slot = hit
+
+            if slot is not None and intent not in slots:
+                slots[intent] = slot
+            if priority < best_priority:
+                best_priority, best_intent = priority, intent
+
+        return IntentMatch(best_intent, slots)
+
+
+# Compiled once at import and shared by every handler
+intent_engine = IntentEngine()
+
+
+_SIZE_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*([A-Z]+)$')
+
+# Spellings customers use for each bundle unit
+UNIT_ALIASES = {
+    'GB': ['gb', 'gig', 'gigs', 'g'],
+    'MB': ['mb', 'm'],
+    'TB': ['tb'],
+}
+
+# "3x", "2 units", "4 pcs" (digit first) and "x2" (letter first)
+QUANTITY_SUFFIX_PATTERN = r'(?<![\d.])(?P<quantity>\d{1,2})\s*(?:x|pcs|pieces|units?|times)\b'
+QUANTITY_PREFIX_PATTERN = r'\bx\s*(?P<quantity_x>\d{1,2})\b'
+
+
+class OrderParser:
+    """Extracts network, bundle size, quantity and phone number in one scan
+
+    The grammar is a single regex built from the plan catalog: networks and
+    bundle sizes come from the catalog keys, so new plans are recognised
+    without code changes. Longer sizes are tried first, so "2.5GB" is never
+    read as "2GB" or "5GB".
+    """
+
+    def __init__(self, data_plans):
+        self.networks = {network.lower(): network for network in data_plans}
+        self.sizes = {}
+        for plans in data_plans.values():
+            for size in plans:
+                match = _SIZE_RE.match(size.upper())
+                if match:
+                    amount, unit = match.groups()
+                    self.sizes[(self._normalize_amount(amount), unit)] = size
+
+        # (amount, unit as typed) -> catalog size, e.g. ('2.5', 'gig') -> '2.5GB'
+        self._size_lookup = {
+            (amount, alias): size
+            for (amount, unit), size in self.sizes.items()
+            for alias in UNIT_ALIASES.get(unit, [unit.lower()])
+        }
+        amounts = sorted({amount for amount, _ in self.sizes}, key=len, reverse=True)
+        units = sorted({alias for _, alias in self._size_lookup}, key=len, reverse=True)
+
+        # Alternatives are grouped by their first character, so at each position
+        # of the message the regex engine only tries the branches that can match
+        digit_led = [
+            rf'(?P<phone>{NIGERIAN_MSISDN_PATTERN})',
+            r'(?<![\d.])(?P<amount>' + '|'.join(re.escape(amount) for amount in amounts)
+            + r')(?:\.0+)?\s*(?P<unit>' + '|'.join(units) + r')\b',
+            QUANTITY_SUFFIX_PATTERN,
+        ]
+        letter_led = [
+            r'\b(?P<network>' + '|'.join(re.escape(network) for network in self.networks) + r')(?![a-z])',
+            QUANTITY_PREFIX_PATTERN,
+        ]
+        self._finditer = re.compile(
+            r'(?=[\d+])(?:' + '|'.join(digit_led) + r')|(?=[a-z])(?:' + '|'.join(letter_led) + ')'
+        ).finditer
+
+    @staticmethod
+    def _normalize_amount(amount):
+        return amount.rstrip('0').rstrip('.') if '.' in amount else amount
+
+    def parse(self, message):
+        """Return {'network', 'size', 'quantity', 'phone_number'} for an order message"""
+        network = size = phone = quantity = None
+
+        for match in self._finditer(message.lower()):
+            kind = match.lastgroup
+            if kind == 'unit':
+                if size is None:
+                    size = self._size_lookup.get(match.group('amount', 'unit'))
+            elif kind == 'network':
+                if network is None:
+                    network = self.networks[match.group(kind)]
+            elif kind == 'phone':
+                if phone is None:
+                    phone = normalize_phone_number(match.group(kind))
+            elif quantity is None:
+                quantity = int(match.group(kind))
+
+        return {
+            'network': network,
+            'size': size,
+            'quantity': quantity or 1,
+            'phone_number': phone
+        }
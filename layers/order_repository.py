@@ -0,0 +1,251 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import exists, insert, select, update
+
+from layers.reporting import FINISHED_STATUSES, rollup_finished_orders
+from models.database_models import Order, Transaction
+from utils.money import Money
+
+logger = logging.getLogger(__name__)
+
+# Order lifecycle: which statuses each status may move to
+ORDER_TRANSITIONS = {
+    'pending': ('paid', 'failed'),
+    'paid': ('processing', 'failed'),
+    'processing': ('completed', 'failed'),
+    'completed': (),
+    'failed': ()
+}
+
+# Orders in these statuses were paid for with their transaction_reference
+SETTLED_STATUSES = ('paid', 'processing', 'completed')
+
+# Keeps each IN (...) list well below SQLite's bound-parameter limit
+BATCH_SIZE = 500
+
+
+def _allowed_sources(status):
+    if status not in ORDER_TRANSITIONS:
+        raise ValueError(f"Unknown order status: {status}")
+    return tuple(source for source, targets in ORDER_TRANSITIONS.items() if status in targets)
+
+
+def _chunks(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _order_rows(orders, catalog):
+    """Insert parameters for new orders; executemany needs the same columns in every row
+
+    Each order names its plan with 'network' and 'size'. The product and the
+    amount (catalog price x quantity) come from the catalog, not the caller.
+    A plan without a products row (the catalog's built-in fallback) or a
+    quantity that isn't a positive integer raises ValueError.
+    """
+    now = datetime.utcnow()
+    rows = []
+    for order in orders:
+        order = dict(order)
+        network, size = order.pop('network', None), order.pop('size', None)
+        plan = catalog.lookup(network, size)
+        if plan is None:
+            raise ValueError(f"Unknown plan: {network} {size}")
+        if plan.product_id is None:
+            raise ValueError(f"Plan {network} {size} has no product in the catalog")
+        row = {'status': 'pending', 'quantity': 1, 'created_at': now, **order}
+        quantity = row['quantity']
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise ValueError(f"Quantity must be a positive whole number, got {quantity!r}")
+        row['product_id'] = plan.product_id
+        row['amount_paid'] = plan.price * row['quantity']
+        rows.append(row)
+    columns = set().union(*rows)
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def _insert_orders():
+    return insert(Order).returning(Order.id, sort_by_parameter_order=True)
+
+
+def _transition_plan(order_ids, status, expected=None):
+    """(source statuses, SET values, de-duplicated ids) for a guarded status change"""
+    sources = _allowed_sources(status)
+    if expected is not None:
+        expected = (expected,) if isinstance(expected, str) else tuple(expected)
+        sources = tuple(source for source in sources if source in expected)
+
+    values = {'status': status}
+    if status in FINISHED_STATUSES:
+        values['completed_at'] = datetime.utcnow()
+    return sources, values, list(dict.fromkeys(order_ids))
+
+
+def _update_orders(chunk, sources, values):
+    return (update(Order)
+            .where(Order.id.in_(chunk), Order.status.in_(sources))
+            .values(**values)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False))
+
+
+def _log_unmoved(order_ids, moved, status, sources):
+    if len(moved) != len(order_ids):
+        logger.info(f"ℹ️  {len(order_ids) - len(moved)} order(s) not moved to {status}: "
+                    f"missing or no longer in {', '.join(sources)}")
+
+
+def _pending_with_amount(amount, limit):
+    return (select(Order)
+            .where(Order.status == 'pending', Order.amount_paid == Money.from_naira(amount))
+            .order_by(Order.created_at)
+            .limit(limit))
+
+
+class OrderRepository:
+    """Set-based order writes: one statement per batch instead of one commit per row
+
+    Status changes are guarded by the lifecycle in ORDER_TRANSITIONS: the
+    UPDATE only matches rows still in a valid source status, so two workers
+    racing to advance the same order can't both succeed, and the ids that
+    actually moved are returned to the caller.
+    """
+
+    def __init__(self, session_factory=None, catalog=None):
+        self._session_factory = session_factory
+        self._catalog = catalog
+
+    def _db(self):
+        if self._session_factory is None:
+            from models.database_models import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    @property
+    def catalog(self):
+        if self._catalog is None:
+            from layers.catalog_service import get_catalog_service
+            self._catalog = get_catalog_service()
+        return self._catalog
+
+    def create_orders(self, orders):
+        """Insert many orders in one transaction. Returns their ids in order.
+
+        Each order is a dict with the plan's 'network' and 'size' plus Order
+        columns (quantity, customer_id, phone_to_recharge, ...). product_id
+        and amount_paid are looked up in the catalog; an order for a plan the
+        catalog doesn't have raises ValueError and nothing is inserted.
+        """
+        if not orders:
+            return []
+        rows = _order_rows(orders, self.catalog)
+
+        db = self._db()
+        try:
+            ids = []
+            stmt = _insert_orders()
+            for chunk in _chunks(rows):
+                ids.extend(db.execute(stmt, chunk).scalars())
+            db.commit()
+            return ids
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def create_order(self, **fields):
+        return self.create_orders([fields])[0]
+
+    def transition(self, order_ids, status, expected=None):
+        """Move orders to `status` if they are currently in a valid source status
+
+        `expected` narrows the allowed source statuses (e.g. only 'pending').
+        Orders finishing ('completed' or 'failed') get completed_at stamped in
+        the same statement and are added to the daily sales rollups in the
+        same transaction. Returns the ids that were updated; the rest were
+        either missing or already moved on.
+        """
+        sources, values, order_ids = _transition_plan(order_ids, status, expected)
+        if not sources or not order_ids:
+            return []
+
+        db = self._db()
+        try:
+            moved = []
+            for chunk in _chunks(order_ids):
+                moved.extend(db.execute(_update_orders(chunk, sources, values)).scalars())
+            rollup_finished_orders(db, moved, status)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        _log_unmoved(order_ids, moved, status, sources)
+        return moved
+
+    def mark_paid(self, order_ids):
+        return self.transition(order_ids, 'paid')
+
+    def mark_processing(self, order_ids):
+        return self.transition(order_ids, 'processing')
+
+    def mark_completed(self, order_ids):
+        return self.transition(order_ids, 'completed')
+
+    def mark_failed(self, order_ids):
+        return self.transition(order_ids, 'failed')
+
+    def get(self, order_id):
+        db = self._db()
+        try:
+            return db.get(Order, order_id)
+        finally:
+            db.close()
+
+    def find_by_reference(self, transaction_reference):
+        db = self._db()
+        try:
+            return db.execute(
+                select(Order).where(Order.transaction_reference == transaction_reference)
+            ).scalar_one_or_none()
+        finally:
+            db.close()
+
+    def reference_settled(self, reference):
+        """True if a bank reference already paid for an order (served by the unique reference indexes)"""
+        db = self._db()
+        try:
+            return db.execute(select(
+                exists().where(Transaction.bank_reference == reference) |
+                exists().where(Order.transaction_reference == reference, Order.status.in_(SETTLED_STATUSES))
+            )).scalar()
+        finally:
+            db.close()
+
+    def pending_with_amount(self, amount, limit=20):
+        """Pending orders for exactly `amount`, oldest first - candidates for a received payment
+
+        An equality lookup on integer kobo, served by ix_orders_status_amount_paid_created_at.
+        """
+        db = self._db()
+        try:
+            return db.execute(_pending_with_amount(amount, limit)).scalars().all()
+        finally:
+            db.close()
+
+    def pending_before(self, cutoff, limit=100):
+        """Oldest orders still pending before `cutoff` (served by ix_orders_status_created_at)"""
+        db = self._db()
+        try:
+            return db.execute(
+                select(Order)
+                .where(Order.status == 'pending', Order.created_at < cutoff)
+                .order_by(Order.created_at)
+                .limit(limit)
+            ).scalars().all()
+        finally:
+            db.close()
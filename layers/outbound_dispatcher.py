@@ -0,0 +1,305 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Lower number = sent first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10  # broadcasts and reminders
+
+# WhatsApp rejects text bodies longer than this
+MAX_TEXT_LENGTH = 4096
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token if one is available. Returns seconds to wait otherwise (0 = acquired)."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available. Returns True if the caller had to wait."""
+        waited = False
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return waited
+            waited = True
+            time.sleep(wait)
+
+    @property
+    def idle(self):
+        """True once the bucket has refilled completely"""
+        with self._lock:
+            return self._tokens + (time.monotonic() - self._updated) * self.rate >= self.capacity
+
+
+class _Outbound:
+    """Pending send for one recipient; more texts can join it until it is promoted"""
+
+    __slots__ = ('to', 'texts', 'length', 'priority', 'enqueued_at', 'ready_at', 'throttled')
+
+    def __init__(self, to, text, priority, now, window):
+        self.to = to
+        self.texts = [text]
+        self.length = len(text)
+        self.priority = priority
+        self.enqueued_at = now
+        self.ready_at = now + window
+        self.throttled = False
+
+    def can_join(self, text):
+        return self.length + len(text) + 2 <= MAX_TEXT_LENGTH
+
+    def join(self, text, priority):
+        self.texts.append(text)
+        self.length += len(text) + 2
+        self.priority = min(self.priority, priority)
+
+    @property
+    def body(self):
+        return "\n\n".join(self.texts)
+
+
+class OutboundDispatcher:
+    """Queues outbound WhatsApp texts and sends them from a pool of sender threads
+
+    Texts to the same recipient submitted within `coalesce_window` seconds are
+    merged into one message, sends are throttled by a global and a per-recipient
+    token bucket, and messages to one recipient always go out in order. A
+    message is only handed to a sender thread once its recipient has a token
+    (until then it waits in a heap, not in a thread), and the global token is
+    taken right before the send, so a throttled recipient never holds up others.
+    """
+
+    def __init__(self, send_func, workers=4, global_rate=80.0, global_burst=80,
+                 recipient_rate=1.0, recipient_burst=3, coalesce_window=0.25, rate_window=60):
+        self.send_func = send_func
+        self.workers = workers
+        self.coalesce_window = coalesce_window
+        self.rate_window = rate_window
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.recipient_rate = recipient_rate
+        self.recipient_burst = recipient_burst
+        self._recipient_buckets = {}
+
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+        self._open = {}        # recipient -> entry still accepting texts
+        self._delayed = []     # heap of (ready_at, seq, entry) waiting out the coalesce window
+        self._blocked = {}     # recipient -> deque of entries waiting for an earlier send
+        self._throttled = []   # heap of (ready_at, seq, entry) waiting for a recipient token
+        self._ready = []       # heap of (priority, seq, entry) ready to send
+        self._active = set()   # recipients with an entry ready or in flight
+        self._threads = []
+        self._stopping = False
+
+        # Metrics
+        self._sent_times = deque()
+        self.submitted_total = 0
+        self.coalesced_total = 0
+        self.sent_total = 0
+        self.failed_total = 0
+        self.throttle_events = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"outbound-sender-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        logger.info(f"📮 Outbound dispatcher started with {self.workers} senders")
+
+    def submit(self, to, text, priority=PRIORITY_NORMAL):
+        """Queue a text for `to`, merging it into a pending message when possible"""
+        if not self._threads:
+            self.start()
+
+        with self._cond:
+            self.submitted_total += 1
+            entry = self._open.get(to)
+
+            if entry is not None and entry.can_join(text):
+                entry.join(text, priority)
+                self.coalesced_total += 1
+                return
+
+            entry = _Outbound(to, text, priority, time.monotonic(), self.coalesce_window)
+            self._open[to] = entry
+            heapq.heappush(self._delayed, (entry.ready_at, next(self._sequence), entry))
+            self._cond.notify()
+
+    def _promote(self, now):
+        """Move entries whose coalesce window or recipient throttle has passed into the ready heap"""
+        while self._throttled and self._throttled[0][0] <= now:
+            _, _, entry = heapq.heappop(self._throttled)
+            heapq.heappush(self._ready, (entry.priority, next(self._sequence), entry))
+
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, entry = heapq.heappop(self._delayed)
+            if self._open.get(entry.to) is entry:
+                del self._open[entry.to]
+
+            if entry.to in self._active:
+                self._blocked.setdefault(entry.to, deque()).append(entry)
+            else:
+                self._active.add(entry.to)
+                heapq.heappush(self._ready, (entry.priority, next(self._sequence), entry))
+
+    def _next_entry(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._promote(now)
+
+                while self._ready:
+                    entry = heapq.heappop(self._ready)[2]
+                    wait = self._recipient_bucket(entry.to).try_acquire()
+                    if not wait:
+                        return entry
+                    # Still the recipient's active entry, so later texts to them keep waiting behind it
+                    entry.throttled = True
+                    heapq.heappush(self._throttled, (now + wait, next(self._sequence), entry))
+
+                if self._stopping and not self._delayed and not self._blocked and not self._active:
+                    return None
+
+                timeout = min([heap[0][0] - now for heap in (self._delayed, self._throttled) if heap] or [0.5])
+                self._cond.wait(max(timeout, 0.001))
+
+    def _finish(self, to):
+        with self._cond:
+            waiting = self._blocked.get(to)
+            if waiting:
+                entry = waiting.popleft()
+                if not waiting:
+                    del self._blocked[to]
+                heapq.heappush(self._ready, (entry.priority, next(self._sequence), entry))
+            else:
+                self._active.discard(to)
+            self._cond.notify_all()
+
+    def _recipient_bucket(self, to):
+        with self._cond:
+            bucket = self._recipient_buckets.get(to)
+            if bucket is None:
+                if len(self._recipient_buckets) >= 10000:
+                    self._recipient_buckets = {
+                        key: value for key, value in self._recipient_buckets.items() if not value.idle
+                    }
+                bucket = TokenBucket(self.recipient_rate, self.recipient_burst)
+                self._recipient_buckets[to] = bucket
+            return bucket
+
+    def _worker(self):
+        while True:
+            entry = self._next_entry()
+            if entry is None:
+                return
+
+            try:
+                # The recipient token was taken in _next_entry
+                throttled = self.global_bucket.acquire() or entry.throttled
+
+                waited = time.monotonic() - entry.enqueued_at
+                result = self.send_func(entry.to, entry.body)
+                self._record_send(waited, throttled, failed=result is None)
+            except Exception as e:
+                logger.error(f"❌ Outbound send to {entry.to} failed: {e}")
+                self._record_send(0.0, False, failed=True)
+            finally:
+                self._finish(entry.to)
+
+    def _record_send(self, waited, throttled, failed):
+        now = time.monotonic()
+        with self._cond:
+            if failed:
+                self.failed_total += 1
+            else:
+                self.sent_total += 1
+                self._sent_times.append(now)
+            if throttled:
+                self.throttle_events += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._trim_sent_times(now)
+
+    def _trim_sent_times(self, now):
+        cutoff = now - self.rate_window
+        while self._sent_times and self._sent_times[0] < cutoff:
+            self._sent_times.popleft()
+
+    @property
+    def depth(self):
+        with self._cond:
+            return (len(self._delayed) + len(self._ready) + len(self._throttled)
+                    + sum(len(waiting) for waiting in self._blocked.values()))
+
+    def drain(self, timeout=None):
+        """Wait until nothing is queued or in flight. Returns True if drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._delayed or self._ready or self._blocked or self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(0.05 if remaining is None else min(remaining, 0.05))
+        return True
+
+    def stop(self, timeout=10):
+        """Send whatever is still queued, then stop the sender threads"""
+        drained = self.drain(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+        return drained
+
+    def metrics(self):
+        """Throughput, queue wait and throttling figures for sizing the sender pool"""
+        depth = self.depth
+        with self._cond:
+            self._trim_sent_times(time.monotonic())
+            completed = self.sent_total + self.failed_total
+            return {
+                'depth': depth,
+                'workers': self.workers,
+                'submitted_total': self.submitted_total,
+                'coalesced_total': self.coalesced_total,
+                'sent_total': self.sent_total,
+                'failed_total': self.failed_total,
+                'throttle_events': self.throttle_events,
+                'sends_per_sec': round(len(self._sent_times) / self.rate_window, 3),
+                'queue_wait_avg_ms': round(self._wait_total / completed * 1000, 3) if completed else 0.0,
+                'queue_wait_max_ms': round(self._wait_max * 1000, 3)
+            }
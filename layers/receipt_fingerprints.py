@@ -0,0 +1,307 @@
+# layers/receipt_fingerprints.py
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# Hashes are taken at a fixed resolution so stored ones stay comparable whatever RECEIPT_OCR_DPI is
+FINGERPRINT_DPI = 200
+# The text region is resampled to this (width, height) before the DCT...
+_HASH_SIZE = (256, 64)
+# ...and the lowest 16x16 frequencies give the 256 bits
+_HASH_BLOCK = 16
+PHASH_BITS = _HASH_BLOCK * _HASH_BLOCK
+
+# The index splits hashes into 4 bands of 64 bits and probes each band within 1 bit:
+# two hashes at most 7 bits apart always agree that closely on one band
+_BANDS = 4
+_BAND_BITS = PHASH_BITS // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+MAX_NEAR_DISTANCE = 2 * _BANDS - 1
+
+_dct_matrices = {}
+
+
+def exact_hash(image_data):
+    """SHA-256 hex digest of the image bytes exactly as downloaded"""
+    return hashlib.sha256(memoryview(image_data)).hexdigest()
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II matrix: D @ x is the DCT of x"""
+    import numpy as np
+
+    if n not in _dct_matrices:
+        k = np.arange(n)[:, None]
+        x = np.arange(n)[None, :]
+        matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+        matrix[0] /= np.sqrt(2)
+        _dct_matrices[n] = matrix.astype(np.float32)
+    return _dct_matrices[n]
+
+
+def perceptual_hash(gray):
+    """256-bit DCT hash (as an int) of a receipt's text, robust to rescaling, recompression and cropping
+
+    The receipt is shrunk to FINGERPRINT_DPI and cut down to the box around
+    its detected text lines, so status bars and screenshot margins don't
+    count. That region is resampled to 256x64, transformed with a 2-D DCT
+    (two matrix products), and each of the 16x16 lowest frequencies gives
+    one bit: above or below their median.
+    """
+    import cv2
+    import numpy as np
+    from layers.receipt_layout import detect_text_lines, downscale_to_dpi
+
+    image, _ = downscale_to_dpi(gray, FINGERPRINT_DPI)
+    boxes = detect_text_lines(image)
+    if boxes:
+        left = min(x for x, _, _, _ in boxes)
+        top = min(y for _, y, _, _ in boxes)
+        right = max(x + w for x, _, w, _ in boxes)
+        bottom = max(y + h for _, y, _, h in boxes)
+        image = image[top:bottom, left:right]
+
+    width, height = _HASH_SIZE
+    pixels = cv2.resize(image, _HASH_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+    block = (_dct_matrix(height) @ pixels @ _dct_matrix(width).T)[:_HASH_BLOCK, :_HASH_BLOCK].ravel()
+    bits = block > np.median(block[1:])  # the DC term is brightness, not content
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def _popcount64(words):
+    """Set bits in each element of a uint64 array (SWAR; NumPy < 2 has no bitwise_count)"""
+    import numpy as np
+
+    words = words - ((words >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    words = (words & np.uint64(0x3333333333333333)) + ((words >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    words = (words + (words >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (words * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+class NearDuplicateIndex:
+    """Banded Hamming-distance index over perceptual hashes, in NumPy arrays
+
+    Each hash is split into 4 64-bit bands, and for each band the keys and
+    hashes are kept sorted by that band. A query binary-searches every band
+    for its own value and its 64 one-bit variants, which finds every stored
+    hash within MAX_NEAR_DISTANCE bits, then measures the full distance of
+    just those candidates (contiguous slices) in one vectorized pass. The
+    cost follows how many stored hashes share a band with the query, not
+    how many are stored; memory is about 200 bytes per hash. New hashes wait
+    in a small pending block (scanned directly) and are merged into the
+    sorted arrays every `merge_every` additions.
+    """
+
+    def __init__(self, merge_every=1024):
+        import numpy as np
+
+        self.merge_every = merge_every
+        empty = (np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64), np.empty((0, _BANDS), dtype=np.uint64))
+        self._bands = [empty] * _BANDS  # (sorted band values, keys, hashes) per band
+        self._pending_keys = np.empty(merge_every, dtype=np.int64)
+        self._pending_hashes = np.empty((merge_every, _BANDS), dtype=np.uint64)
+        self._pending = 0
+        self._flips = np.array([0] + [1 << bit for bit in range(_BAND_BITS)], dtype=np.uint64)
+
+    def __len__(self):
+        return len(self._bands[0][1]) + self._pending
+
+    def add(self, key, phash):
+        self._pending_keys[self._pending] = key
+        self._pending_hashes[self._pending] = self._split(phash)
+        self._pending += 1
+        if self._pending == self.merge_every:
+            self._merge()
+
+    def extend(self, keys, phashes):
+        """Add many hashes with a single re-sort (loading the index at startup)"""
+        import numpy as np
+
+        self._merge(np.array(keys, dtype=np.int64).reshape(-1),
+                    np.array([self._split(phash) for phash in phashes], dtype=np.uint64).reshape(-1, _BANDS))
+
+    def query(self, phash, max_distance):
+        """[(distance, key)] for stored hashes within `max_distance` bits, closest first"""
+        import numpy as np
+
+        if max_distance > MAX_NEAR_DISTANCE:
+            raise ValueError(f"max_distance {max_distance} is above what the index finds ({MAX_NEAR_DISTANCE})")
+        bands = np.array(self._split(phash), dtype=np.uint64)
+
+        keys, hashes = [self._pending_keys[:self._pending]], [self._pending_hashes[:self._pending]]
+        for (values, band_keys, band_hashes), probes in zip(self._bands, bands[:, None] ^ self._flips):
+            probes.sort()  # ascending needles let each binary search start where the last one ended
+            starts = values.searchsorted(probes, 'left')
+            ends = values.searchsorted(probes, 'right')
+            hit = ends > starts
+            for start, end in zip(starts[hit].tolist(), ends[hit].tolist()):
+                keys.append(band_keys[start:end])
+                hashes.append(band_hashes[start:end])
+
+        # A hash near on several bands is measured more than once; the dict keeps one
+        keys, hashes = np.concatenate(keys), np.concatenate(hashes)
+        distances = _popcount64(hashes ^ bands).sum(axis=1)
+        close = distances <= max_distance
+        found = dict(zip(keys[close].tolist(), distances[close].tolist()))
+        return sorted((distance, key) for key, distance in found.items())
+
+    def _merge(self, keys=None, hashes=None):
+        """Move the pending hashes, and `hashes`, into the sorted band arrays"""
+        import numpy as np
+
+        _, all_keys, all_hashes = self._bands[0]
+        all_keys = np.concatenate([all_keys, self._pending_keys[:self._pending]] + ([keys] if keys is not None else []))
+        all_hashes = np.concatenate([all_hashes, self._pending_hashes[:self._pending]] +
+                                    ([hashes] if hashes is not None else []))
+        self._pending = 0
+        bands = []
+        for i in range(_BANDS):
+            order = np.argsort(all_hashes[:, i], kind='stable')
+            bands.append((all_hashes[order, i], all_keys[order], all_hashes[order]))
+        self._bands = bands
+
+    @staticmethod
+    def _split(phash):
+        return [(phash >> (_BAND_BITS * i)) & _BAND_MASK for i in range(_BANDS)]
+
+
+class ReceiptFingerprints:
+    """Remembers every receipt image read, by exact and perceptual hash
+
+    lookup() finds an exact repeat through the unique sha256 index on
+    `receipt_fingerprints`, so the stored OCR result is reused instead of
+    reading the image again. record() stores a newly read receipt and returns
+    the stored receipts that look the same (a perceptual hash within
+    `max_distance` bits), found in an in-memory NearDuplicateIndex that is
+    loaded from the table and picks up rows written by other processes.
+    """
+
+    def __init__(self, session_factory=None, max_distance=6, max_matches=10):
+        if max_distance > MAX_NEAR_DISTANCE:
+            raise ValueError(f"max_distance can be at most {MAX_NEAR_DISTANCE}")
+        self.max_distance = max_distance
+        self.max_matches = max_matches
+        self._session_factory = session_factory
+        self._index = NearDuplicateIndex()
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.recorded_total = 0
+        self._query_seconds = 0.0
+        self._queries = 0
+
+    def _session(self):
+        if self._session_factory is None:
+            from models.database_models import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def lookup(self, sha256):
+        """The stored receipt with these exact bytes ({'id', 'sender', 'fields', 'created_at'}), or None"""
+        from models.database_models import ReceiptFingerprint
+
+        db = self._session()
+        try:
+            row = db.query(ReceiptFingerprint).filter(ReceiptFingerprint.sha256 == sha256).first()
+            if row is None:
+                return None
+            with self._lock:
+                self.exact_hits += 1
+            return self._as_dict(row)
+        finally:
+            db.close()
+
+    def record(self, sha256, phash, sender, fields):
+        """Store a receipt just read; returns the stored receipts that look like it, closest first
+
+        Each match is {'id', 'sender', 'fields', 'created_at', 'distance'}; at most `max_matches`.
+        """
+        from models.database_models import ReceiptFingerprint
+
+        phash_value = int(phash, 16)
+        db = self._session()
+        try:
+            self._catch_up(db)
+            started = time.perf_counter()
+            with self._lock:
+                near = self._index.query(phash_value, self.max_distance)
+                self._query_seconds += time.perf_counter() - started
+                self._queries += 1
+
+            matches = []
+            if near:
+                distances = {key: distance for distance, key in near[:self.max_matches]}
+                rows = db.query(ReceiptFingerprint).filter(ReceiptFingerprint.id.in_(distances)).all()
+                matches = sorted(({**self._as_dict(row), 'distance': distances[row.id]} for row in rows),
+                                 key=lambda match: match['distance'])
+
+            row = ReceiptFingerprint(sha256=sha256, phash=phash, sender=sender,
+                                     fields=json.dumps(fields, separators=(',', ':')))
+            db.add(row)
+            try:
+                db.commit()
+            except IntegrityError:
+                # The same bytes were recorded by another worker meanwhile
+                db.rollback()
+                return matches
+            self._catch_up(db)
+            with self._lock:
+                self.recorded_total += 1
+                self.near_hits += bool(matches)
+            return matches
+        finally:
+            db.close()
+
+    def load(self):
+        """Fill the near-duplicate index from the table. Returns how many receipts it holds."""
+        db = self._session()
+        try:
+            self._catch_up(db)
+        finally:
+            db.close()
+        logger.info(f"🧾 Receipt fingerprints loaded: {len(self._index)}")
+        return len(self._index)
+
+    def _catch_up(self, db):
+        """Index rows added since the last look (by this or another process)"""
+        from models.database_models import ReceiptFingerprint
+
+        rows = (db.query(ReceiptFingerprint.id, ReceiptFingerprint.phash)
+                .filter(ReceiptFingerprint.id > self._last_id)
+                .order_by(ReceiptFingerprint.id)
+                .yield_per(10000))
+        rows = [(row_id, int(phash, 16)) for row_id, phash in rows]
+        with self._lock:
+            # Two threads can catch up on the same rows
+            rows = [(row_id, phash) for row_id, phash in rows if row_id > self._last_id]
+            if not rows:
+                return
+            if len(rows) > self._index.merge_every:
+                self._index.extend(*zip(*rows))
+            else:
+                for row_id, phash in rows:
+                    self._index.add(row_id, phash)
+            self._last_id = rows[-1][0]
+
+    @staticmethod
+    def _as_dict(row):
+        return {'id': row.id, 'sender': row.sender, 'fields': json.loads(row.fields or '{}'),
+                'created_at': row.created_at}
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'indexed': len(self._index),
+                'recorded_total': self.recorded_total,
+                'exact_hits': self.exact_hits,
+                'near_hits': self.near_hits,
+                'near_query_avg_us': round(self._query_seconds / self._queries * 1e6, 1) if self._queries else 0.0
+            }
@@ -0,0 +1,199 @@
+# layers/receipt_layout.py
+import time
+from collections import namedtuple
+
+from layers.receipt_processor import REQUIRED_FIELDS, parse_receipt_text
+
+# Everything payment matching and bank verification need off a receipt
+LAYOUT_FIELDS = ('amount', 'reference', 'date', 'bank')
+
+# Phone screenshots span about 2.7 inches of screen, whatever their pixel width
+RECEIPT_WIDTH_INCHES = 2.7
+
+# Where each field usually sits, as (top, bottom) fractions of the receipt height.
+# Lines outside every band are only read when the bands didn't yield all fields.
+ReceiptTemplate = namedtuple('ReceiptTemplate', ['bank', 'bands'])
+
+DEFAULT_TEMPLATE = ReceiptTemplate(None, {
+    'bank': (0.0, 0.2),
+    'amount': (0.1, 0.55),
+    'reference': (0.25, 0.85),
+    'date': (0.25, 0.85),
+})
+
+# One per bank in BankVerifier.supported_banks
+BANK_TEMPLATES = {
+    # Logo band, amount under "Transfer Successful", Session ID then date in the details table
+    'GTB': ReceiptTemplate('GTB', {'bank': (0.0, 0.15), 'amount': (0.15, 0.4),
+                                   'reference': (0.35, 0.7), 'date': (0.4, 0.75)}),
+    'ZENITH': ReceiptTemplate('ZENITH', {'bank': (0.0, 0.15), 'amount': (0.15, 0.45),
+                                         'reference': (0.35, 0.75), 'date': (0.35, 0.75)}),
+    'ACCESS': ReceiptTemplate('ACCESS', {'bank': (0.0, 0.15), 'amount': (0.15, 0.45),
+                                         'reference': (0.35, 0.8), 'date': (0.35, 0.8)}),
+    'UBA': ReceiptTemplate('UBA', {'bank': (0.0, 0.15), 'amount': (0.15, 0.45),
+                                   'reference': (0.35, 0.8), 'date': (0.35, 0.8)}),
+    'FIRSTBANK': ReceiptTemplate('FIRSTBANK', {'bank': (0.0, 0.15), 'amount': (0.15, 0.45),
+                                               'reference': (0.35, 0.8), 'date': (0.35, 0.8)}),
+    # Large amount near the top, Transaction No. lower down in the details
+    'OPAY': ReceiptTemplate('OPAY', {'bank': (0.0, 0.15), 'amount': (0.1, 0.4),
+                                     'reference': (0.35, 0.85), 'date': (0.3, 0.85)}),
+}
+
+
+def downscale_to_dpi(gray, dpi):
+    """Shrink a receipt so it is `dpi` dots per inch across; never enlarges. Returns (image, scale)."""
+    import cv2
+
+    height, width = gray.shape[:2]
+    target = int(dpi * RECEIPT_WIDTH_INCHES)
+    if width <= target:
+        return gray, 1.0
+    scale = target / width
+    # Area averaging also smooths JPEG noise, so no separate denoising pass is needed
+    return cv2.resize(gray, (target, max(1, round(height * scale))), interpolation=cv2.INTER_AREA), scale
+
+
+def detect_text_lines(gray):
+    """Boxes (x, y, w, h) around each line of text, top to bottom
+
+    Uses the morphological gradient, so dark text on a light background and
+    light text on a coloured header band are found alike; horizontal closing
+    joins the characters of a line into one component.
+    """
+    import cv2
+
+    height, width = gray.shape[:2]
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, width // 30), 1)))
+    _, _, stats, _ = cv2.connectedComponentsWithStats(closed, connectivity=8)
+
+    boxes = [(int(x), int(y), int(w), int(h)) for x, y, w, h, _ in stats[1:]
+             # drop specks, rules/borders and whole-panel blobs
+             if 6 <= h <= height // 8 and w >= 10]
+    return sorted(boxes, key=lambda box: (box[1], box[0]))
+
+
+def binarize_line(gray, box, pad=4):
+    """The box cut out and thresholded on its own, as dark text on white"""
+    import cv2
+
+    x, y, w, h = box
+    crop = gray[max(0, y - pad):y + h + pad, max(0, x - pad):x + w + pad]
+    _, line = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if (line < 128).mean() > 0.5:
+        line = 255 - line  # light text on a dark or coloured band
+    return line
+
+
+def _in_band(box, image_height, band):
+    centre = (box[1] + box[3] / 2) / image_height
+    return band[0] <= centre <= band[1]
+
+
+class LayoutReader:
+    """Reads the payment fields off a receipt one candidate line at a time
+
+    The receipt is shrunk to `dpi`, its text lines are located, and lines are
+    OCRed in template order: the header band first (which picks the bank
+    template), then the lines where that bank prints amount (read by the
+    backend's digit/currency engine), reference and date. Reading stops as
+    soon as every field in LAYOUT_FIELDS has been read with at least
+    `min_confidence`. A field read with less is re-read once from the
+    full-resolution line; lines outside the bands, and then the whole page,
+    are only read for fields still missing.
+    """
+
+    def __init__(self, backend, dpi=200, min_confidence=90):
+        self.backend = backend
+        self.dpi = dpi
+        self.min_confidence = min_confidence
+
+    def read(self, gray):
+        """{'fields', 'confidence', 'bank_template', 'lines_detected', 'lines_read', 'full_page', 'timings_ms'}"""
+        timings = {}
+        started = time.perf_counter()
+
+        image, scale = downscale_to_dpi(gray, self.dpi)
+        started = self._lap(timings, 'downscale', started)
+
+        boxes = detect_text_lines(image)
+        started = self._lap(timings, 'detect', started)
+
+        height = image.shape[0]
+        # source: field -> (line index, engine) it was read from; read: (line index, engine) pairs OCRed
+        fields, confidence, source, read = {}, {}, {}, set()
+        engines = {'line': (self.backend.read_line, LAYOUT_FIELDS), 'amount': (self.backend.read_amount, ('amount',))}
+
+        def unsure():
+            return [field for field in LAYOUT_FIELDS if confidence.get(field, -1) < self.min_confidence]
+
+        def missing():
+            return [field for field in LAYOUT_FIELDS if field not in fields]
+
+        def ocr(line, dpi, index, engine):
+            read_engine, wanted = engines[engine]
+            text, line_confidence = read_engine(line, dpi)
+            for field, value in parse_receipt_text(text).items():
+                if field in wanted and line_confidence > confidence.get(field, -1):
+                    fields[field], confidence[field], source[field] = value, line_confidence, (index, engine)
+
+        def read_lines(candidates, until, engine='line'):
+            for index in candidates:
+                if not until() or not unsure():
+                    return
+                if (index, engine) not in read:
+                    read.add((index, engine))
+                    ocr(binarize_line(image, boxes[index]), self.dpi, index, engine)
+
+        def in_band(field, template):
+            top, bottom = template.bands[field]
+            middle = (top + bottom) / 2 * height
+            candidates = [i for i, box in enumerate(boxes) if _in_band(box, height, (top, bottom))]
+            return sorted(candidates, key=lambda i: abs(boxes[i][1] + boxes[i][3] / 2 - middle))
+
+        # Header first: the bank decides where to look for everything else
+        read_lines(in_band('bank', DEFAULT_TEMPLATE), until=lambda: 'bank' not in fields)
+        template = BANK_TEMPLATES.get(fields.get('bank'), DEFAULT_TEMPLATE)
+        for field in ('amount', 'reference', 'date', 'bank'):
+            # Amount lines go to the digit/currency engine, which can't misread them as letters
+            read_lines(in_band(field, template), until=lambda: field not in fields,
+                       engine='amount' if field == 'amount' else 'line')
+        started = self._lap(timings, 'ocr_lines', started)
+
+        # Long digit runs (session ids) lose confidence when shrunk: one more look at full size
+        retry = [field for field in unsure() if field in source and scale < 1.0]
+        for index, engine in {source[field] for field in retry}:
+            x, y, w, h = (round(v / scale) for v in boxes[index])
+            ocr(binarize_line(gray, (x, y, w, h), pad=round(4 / scale)), round(self.dpi / scale), index, engine)
+        if retry:
+            started = self._lap(timings, 'ocr_full_size', started)
+
+        if missing():
+            read_lines(range(len(boxes)), until=missing)
+            started = self._lap(timings, 'ocr_other_lines', started)
+
+        full_page = any(field not in fields for field in REQUIRED_FIELDS)
+        if full_page:
+            # Text the line detector missed or split badly: one pass over the whole page
+            import cv2
+            _, page = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            for field, value in parse_receipt_text(self.backend.read_text(page, self.dpi)).items():
+                fields.setdefault(field, value)
+            self._lap(timings, 'full_page', started)
+
+        return {
+            'fields': fields,
+            'confidence': confidence,
+            'bank_template': template.bank,
+            'lines_detected': len(boxes),
+            'lines_read': len({index for index, _ in read}),
+            'full_page': full_page,
+            'timings_ms': timings,
+        }
+
+    @staticmethod
+    def _lap(timings, stage, started):
+        now = time.perf_counter()
+        timings[stage] = round((now - started) * 1000, 2)
+        return now
@@ -0,0 +1,537 @@
+# layers/receipt_processor.py
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# A receipt is only useful for payment matching once these have been read
+REQUIRED_FIELDS = ('amount', 'reference')
+
+# How often a supervisor looks up from a running job to check for cancel/timeout
+POLL_INTERVAL = 0.05
+
+# Names printed on receipts for each bank BankVerifier knows
+BANK_NAMES = {
+    'GTB': ('GTBANK', 'GTCO', 'GUARANTY TRUST', 'GTB'),
+    'ZENITH': ('ZENITH',),
+    'ACCESS': ('ACCESS',),
+    'UBA': ('UNITED BANK FOR AFRICA', 'UBA'),
+    'FIRSTBANK': ('FIRST BANK', 'FIRSTBANK', 'FBN'),
+    'OPAY': ('OPAY',),
+}
+
+_NUMBER = r'([0-9]{1,3}(?:,[0-9]{3})+(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?)'
+_AMOUNT_LABEL_RE = re.compile(r'amount[^0-9\n]{0,12}' + _NUMBER, re.IGNORECASE)
+_AMOUNT_CURRENCY_RE = re.compile(r'(?:₦|NGN|\bN)\s?' + _NUMBER)
+_REFERENCE_RE = re.compile(
+    r'\b(?:session\s*[i|l1\[]d|transaction\s*(?:id|no\b|ref(?:erence)?)|ref(?:erence)?)\s*(?:no\.?|number)?\s*[:#.]*\s*'
+    r'([A-Z0-9][A-Z0-9/-]*(?: \d+)*)', re.IGNORECASE)
+_DATE_RE = re.compile(
+    r'(\d{4}-\d{2}-\d{2}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]{3,9},?\s+\d{4}'
+    r'|[A-Za-z]{3,9}\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})')
+_BANK_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(name) for names in BANK_NAMES.values() for name in names) + r')\b', re.IGNORECASE)
+_BANK_BY_NAME = {name: bank for bank, names in BANK_NAMES.items() for name in names}
+
+
+def parse_receipt_text(text):
+    """Pull amount, reference, date and bank out of OCR text. Missing fields are left out."""
+    fields = {}
+
+    match = _AMOUNT_LABEL_RE.search(text) or _AMOUNT_CURRENCY_RE.search(text)
+    if match:
+        fields['amount'] = match.group(1).replace(',', '')
+
+    # OCR often splits long session ids into digit groups
+    match = _REFERENCE_RE.search(text)
+    if match and len(match.group(1).replace(' ', '')) >= 6:
+        fields['reference'] = match.group(1).replace(' ', '').upper()
+
+    match = _DATE_RE.search(text)
+    if match:
+        fields['date'] = match.group(1)
+
+    match = _BANK_RE.search(text)
+    if match:
+        fields['bank'] = _BANK_BY_NAME[' '.join(match.group(1).upper().split())]
+
+    return fields
+
+
+def read_receipt(image_data):
+    """Worker-side job: OCR one receipt (downloaded image bytes) and pull out the payment fields
+
+    The bytes are decoded in memory; nothing is read from disk. With
+    RECEIPT_OCR_DPI set, the layout stage (layers/receipt_layout.py) reads
+    only the lines holding fields; otherwise the whole page is OCRed. The
+    result carries how long each stage took in 'timings_ms'. With
+    RECEIPT_FINGERPRINTS_ENABLED it also carries the image's perceptual
+    hash ('phash', hex) for near-duplicate detection.
+    """
+    from config import config
+    from utils.image_utils import decode_image, preprocess_image_for_ocr
+    from utils.ocr_utils import get_backend
+
+    backend = get_backend()
+    started = time.perf_counter()
+    gray = decode_image(image_data)
+    timings = {'decode': round((time.perf_counter() - started) * 1000, 2)}
+
+    fingerprint = {}
+    if config.RECEIPT_FINGERPRINTS_ENABLED:
+        from layers.receipt_fingerprints import PHASH_BITS, perceptual_hash
+
+        started = time.perf_counter()
+        fingerprint['phash'] = f"{perceptual_hash(gray):0{PHASH_BITS // 4}x}"
+        timings['fingerprint'] = round((time.perf_counter() - started) * 1000, 2)
+
+    if config.RECEIPT_OCR_DPI:
+        from layers.receipt_layout import LayoutReader
+
+        layout = LayoutReader(backend, config.RECEIPT_OCR_DPI, config.RECEIPT_MIN_CONFIDENCE).read(gray)
+        layout['timings_ms'] = {**timings, **layout['timings_ms']}
+        return {**layout, **fingerprint, 'ocr_backend': backend.name}
+
+    started = time.perf_counter()
+    text = backend.read_text(preprocess_image_for_ocr(gray)).strip()
+    timings['full_page'] = round((time.perf_counter() - started) * 1000, 2)
+    return {'text': text, 'fields': parse_receipt_text(text), **fingerprint, 'ocr_backend': backend.name,
+            'timings_ms': timings}
+
+
+def warm_up_ocr():
+    """Worker initializer: load OpenCV and the OCR engine before the first receipt arrives"""
+    import cv2  # noqa: F401
+    from utils.ocr_utils import get_backend
+    get_backend()
+
+
+def receipt_read(outcome):
+    """True when the job finished with every REQUIRED_FIELDS read off the receipt"""
+    fields = outcome.get('fields') or {}
+    return outcome['status'] == 'done' and all(field in fields for field in REQUIRED_FIELDS)
+
+
+def reused_receipt(outcome, pending=None, settled=False):
+    """True when the receipt was sent in before and has already been used
+
+    Decided from what is on record, not from where the chat is: another
+    customer's receipt is always reused, and so is one whose reference
+    already paid for an order (`settled`, see OrderRepository.reference_settled).
+    The customer's own receipt still waiting on verification (`pending`,
+    the conversation's stored 'receipt') is never reused, so resending it is
+    answered as a fresh receipt.
+    """
+    duplicate = outcome.get('duplicate_of')
+    if duplicate is not None and duplicate['sender'] != outcome['sender']:
+        return True
+    reference = (outcome.get('fields') or {}).get('reference')
+    if pending and reference and pending.get('reference') == reference:
+        return False
+    return settled
+
+
+def receipt_reply(outcome, pending=None, settled=False):
+    """What to tell the customer once their receipt job has finished (`pending`, `settled` as for reused_receipt)"""
+    from utils.money import Money
+
+    if reused_receipt(outcome, pending, settled):
+        return ("⚠️ This receipt has already been submitted for another order. "
+                "Please send the receipt for your own transfer.")
+    if receipt_read(outcome):
+        fields = outcome['fields']
+        bank = f" from {fields['bank']}" if 'bank' in fields else ''
+        return (f"🧾 Receipt received: {Money.from_naira(fields['amount']).format()}{bank}, "
+                f"reference {fields['reference']}.\nVerifying your payment now ⏳")
+    if outcome['status'] == 'timeout':
+        return "⏳ Your receipt is taking too long to read. Please send a clearer screenshot of the transfer."
+    return ("😕 I couldn't read the amount and reference on that receipt. "
+            "Please send a clear screenshot of the transfer confirmation.")
+
+
+def _worker_main(conn, read, initializer):
+    """Worker process loop: run `read` on each job received until told to stop"""
+    if initializer is not None:
+        try:
+            initializer()
+        except Exception as e:
+            # Jobs still run; whatever failed here fails them with its own error
+            logger.error(f"❌ Receipt worker initializer failed: {e}")
+    while True:
+        try:
+            source = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if source is None:
+            return
+        try:
+            conn.send(('ok', read(source)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, context, read, initializer):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, read, initializer),
+                                       name='receipt-worker', daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ReceiptJob:
+    """One receipt on its way through the processor"""
+
+    def __init__(self, job_id, sender, source, deliver):
+        self.id = job_id
+        self.sender = sender
+        self.source = source
+        self.deliver = deliver
+        self.state = 'queued'  # queued, running, done, failed, timeout, cancelled
+        self.submitted_at = time.monotonic()
+
+
+class ReceiptProcessor:
+    """Runs receipt OCR in a pool of worker processes, off the webhook threads
+
+    Jobs wait in a bounded queue; submit() returns None when it is full so the
+    customer can be asked to resend instead of the backlog growing without
+    limit. Each worker process has a supervisor thread that resolves the job's
+    source (image bytes, or a callable such as a media download that returns
+    them within `download_timeout`), hands it to the process and waits. Image
+    bytes are also passed to `archive(image_data, sender)` on a background
+    thread, so the audit copy is written while OCR runs instead of in front of
+    it. A job whose OCR runs past `timeout`, or that is cancelled while
+    running, has its process killed and replaced - OCR can't be interrupted
+    any other way. A job that can't be loaded or handed to a worker fails and
+    is delivered like any other. Finished jobs are passed to `deliver(sender,
+    outcome)` on the supervisor thread. `initializer` runs once in each new
+    worker process, before its first job (e.g. warm_up_ocr to load the OCR
+    engine that the process then keeps).
+
+    With `fingerprints` (a ReceiptFingerprints), image bytes seen before are
+    answered from the stored result without OCR, and each receipt read is
+    recorded; outcomes then carry 'duplicate_of' (an exact repeat, or a
+    lookalike with the same reference) and 'near_duplicates' (lookalikes).
+    """
+
+    def __init__(self, read=read_receipt, workers=None, queue_size=64, timeout=30.0, deliver=None,
+                 initializer=None, archive=None, start_method=None, latency_window=1000, fingerprints=None,
+                 download_timeout=15.0):
+        self.read = read
+        self.fingerprints = fingerprints
+        self.initializer = initializer
+        self.archive = archive
+        self._archiver = ThreadPoolExecutor(max_workers=1, thread_name_prefix='receipt-archive') if archive else None
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.download_timeout = download_timeout
+        self._downloads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='receipt-download')
+        self.deliver = deliver
+        # The webhook process is full of threads; forking it would copy their held locks
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._context = multiprocessing.get_context(start_method)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+        # Metrics
+        self._latencies = deque(maxlen=latency_window)
+        self._stage_ms = {}  # stage -> recent durations reported by the read job (timings_ms)
+        self._latency_window = latency_window
+        self.submitted_total = 0
+        self.completed_total = 0
+        self.failed_total = 0
+        self.timeout_total = 0
+        self.cancelled_total = 0
+        self.rejected_total = 0
+        self.workers_replaced = 0
+        self.duplicate_total = 0
+
+        logger.info(f"🧾 Receipt processor initialized (workers={self.workers}, queue={queue_size}, "
+                    f"timeout={timeout}s, start={start_method})")
+
+    @property
+    def running(self):
+        return bool(self._threads) and not self._stop_event.is_set()
+
+    def start(self):
+        """Start the supervisor threads; worker processes are spawned when the first receipts arrive"""
+        if self.fingerprints is not None:
+            self._fingerprint(self.fingerprints.load)
+        with self._lock:
+            if self.running:
+                return
+            self._stop_event.clear()
+            self._threads = [
+                threading.Thread(target=self._supervise, name=f"receipt-supervisor-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, sender, source, deliver=None):
+        """Queue a receipt for OCR. Returns the job id, or None when the queue is full."""
+        with self._lock:
+            job = ReceiptJob(next(self._ids), sender, source, deliver)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.rejected_total += 1
+                return None
+            self._jobs[job.id] = job
+            self.submitted_total += 1
+        return job.id
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; its outcome is never delivered. Returns False if it already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in ('queued', 'running'):
+                return False
+            queued = job.state == 'queued'
+            job.state = 'cancelled'
+            if queued:
+                # Its supervisor skips it; a running job is counted once its worker is killed
+                del self._jobs[job_id]
+                self.cancelled_total += 1
+        return True
+
+    def _supervise(self):
+        worker = None
+        while not self._stop_event.is_set():
+            try:
+                job = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                if job.state != 'cancelled':
+                    worker = self._run(worker, job)
+            except Exception as e:
+                logger.error(f"❌ Receipt supervisor error: {e}")
+            finally:
+                self._queue.task_done()
+        if worker is not None:
+            worker.close()
+
+    def _run(self, worker, job):
+        """Run one job on `worker` (None: start one); returns the worker to use next (a fresh one if it was killed)"""
+        with self._lock:
+            if job.state == 'cancelled':
+                return worker
+            job.state = 'running'
+
+        digest = None
+        try:
+            source = self._resolve(job)
+            if self.fingerprints is not None and isinstance(source, bytes):
+                from layers.receipt_fingerprints import exact_hash
+
+                digest = exact_hash(source)
+                known = self._fingerprint(self.fingerprints.lookup, digest)
+                if known is not None:
+                    # Same bytes as a receipt already read: its result, no OCR and no second archive copy
+                    self._finish(job, 'done', {'fields': known['fields'],
+                                               'duplicate_of': self._duplicate(known, 'exact')})
+                    return worker
+            if worker is None:
+                worker = _Worker(self._context, self.read, self.initializer)
+            worker.conn.send(source)
+            if self._archiver is not None and isinstance(source, bytes):
+                self._archiver.submit(self._archive, source, job.sender)
+        except Exception as e:
+            logger.error(f"❌ Could not load receipt for {job.sender}: {e}")
+            self._finish(job, 'failed', {'error': str(e) or type(e).__name__})
+            if worker is not None and not worker.process.is_alive():
+                worker.kill()
+                return self._replace()
+            return worker
+
+        # The timeout is for OCR alone; the download had its own
+        deadline = time.monotonic() + self.timeout
+        while not worker.conn.poll(POLL_INTERVAL):
+            if job.state == 'cancelled' or time.monotonic() >= deadline:
+                worker.kill()
+                self._finish(job, 'cancelled' if job.state == 'cancelled' else 'timeout')
+                return self._replace()
+
+        try:
+            status, value = worker.conn.recv()
+        except (EOFError, OSError):
+            # The process died under the job (e.g. OOM-killed)
+            worker.kill()
+            self._finish(job, 'failed', {'error': 'worker process exited'})
+            return self._replace()
+
+        if status == 'ok':
+            if digest is not None and 'phash' in value:
+                self._check_near_duplicates(job, digest, value)
+            self._finish(job, 'done', value)
+        else:
+            logger.error(f"❌ Receipt OCR failed for {job.sender}: {value}")
+            self._finish(job, 'failed', {'error': value})
+        return worker
+
+    def _resolve(self, job):
+        """The job's image bytes: its source, or what calling it (a media download) returns within download_timeout"""
+        if not callable(job.source):
+            return job.source
+        try:
+            return self._downloads.submit(job.source).result(timeout=self.download_timeout)
+        except FutureTimeoutError:
+            # The download thread is left to its own HTTP timeouts; the job doesn't wait for it
+            raise TimeoutError(f"receipt download took over {self.download_timeout}s") from None
+
+    def _check_near_duplicates(self, job, digest, result):
+        """Record a receipt just read and note the stored receipts it looks like"""
+        matches = self._fingerprint(self.fingerprints.record, digest, result['phash'], job.sender,
+                                    result.get('fields') or {}) or []
+        result['near_duplicates'] = [self._duplicate(match, 'near') for match in matches]
+        reference = (result.get('fields') or {}).get('reference')
+        # Looking alike is common (one bank, one template); the same reference on top means the same receipt
+        same = next((match for match in matches if reference and match['fields'].get('reference') == reference), None)
+        if same is not None:
+            result['duplicate_of'] = self._duplicate(same, 'near')
+
+    def _fingerprint(self, operation, *args):
+        try:
+            return operation(*args)
+        except Exception as e:
+            # Fail open: the receipt is still read, just not checked against earlier ones
+            logger.error(f"❌ Receipt fingerprint store error: {e}")
+            return None
+
+    @staticmethod
+    def _duplicate(stored, match):
+        return {'receipt_id': stored['id'], 'sender': stored['sender'], 'fields': stored['fields'], 'match': match,
+                'distance': stored.get('distance', 0),
+                'received_at': stored['created_at'].isoformat() if stored['created_at'] else None}
+
+    def _archive(self, image_data, sender):
+        try:
+            self.archive(image_data, sender)
+        except Exception as e:
+            logger.error(f"❌ Could not archive receipt from {sender}: {e}")
+
+    def _replace(self):
+        if self._stop_event.is_set():
+            return None
+        with self._lock:
+            self.workers_replaced += 1
+        try:
+            return _Worker(self._context, self.read, self.initializer)
+        except Exception as e:
+            # The next job tries again, and fails on its own if it can't start one either
+            logger.error(f"❌ Could not start a receipt worker: {e}")
+            return None
+
+    def _finish(self, job, state, result=None):
+        elapsed = time.monotonic() - job.submitted_at
+        with self._lock:
+            if job.state == 'cancelled':
+                state = 'cancelled'
+            job.state = state
+            self._jobs.pop(job.id, None)
+            if state == 'done':
+                self.completed_total += 1
+                self.duplicate_total += bool((result or {}).get('duplicate_of'))
+                self._latencies.append(elapsed)
+                for stage, ms in ((result or {}).get('timings_ms') or {}).items():
+                    self._stage_ms.setdefault(stage, deque(maxlen=self._latency_window)).append(ms)
+            elif state == 'failed':
+                self.failed_total += 1
+            elif state == 'timeout':
+                self.timeout_total += 1
+            else:
+                self.cancelled_total += 1
+                return
+
+        outcome = {'job_id': job.id, 'sender': job.sender, 'status': state,
+                   'elapsed_ms': round(elapsed * 1000, 1), **(result or {})}
+        deliver = job.deliver or self.deliver
+        if deliver is None:
+            return
+        try:
+            deliver(job.sender, outcome)
+        except Exception as e:
+            logger.error(f"❌ Receipt result delivery failed for {job.sender}: {e}")
+
+    def drain(self, timeout=None):
+        """Wait until every queued receipt has finished. Returns True if drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout=10):
+        """Finish queued receipts, then shut the worker processes down. Returns True if drained."""
+        drained = self.drain(timeout) if self.running else True
+        with self._lock:
+            # Anything still queued after the drain window is dropped; running jobs finish
+            for job_id, job in list(self._jobs.items()):
+                if job.state == 'queued':
+                    job.state = 'cancelled'
+                    del self._jobs[job_id]
+                    self.cancelled_total += 1
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=self.timeout + 5)
+        self._threads = []
+        self._downloads.shutdown(wait=False)
+        if self._archiver is not None:
+            self._archiver.shutdown(wait=True)
+        return drained
+
+    def metrics(self):
+        """Queue depth, outcomes and OCR latency (submit to result) for the health endpoint"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'workers': self.workers,
+                'running': self.running,
+                'depth': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'in_progress': sum(1 for job in self._jobs.values() if job.state == 'running'),
+                'submitted_total': self.submitted_total,
+                'completed_total': self.completed_total,
+                'failed_total': self.failed_total,
+                'timeout_total': self.timeout_total,
+                'cancelled_total': self.cancelled_total,
+                'rejected_total': self.rejected_total,
+                'workers_replaced': self.workers_replaced,
+                'duplicate_total': self.duplicate_total,
+                'latency_p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else 0.0,
+                'latency_p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else 0.0,
+                'stage_avg_ms': {stage: round(sum(times) / len(times), 1) for stage, times in self._stage_ms.items()},
+                'fingerprints': self.fingerprints.metrics() if self.fingerprints is not None else None
+            }
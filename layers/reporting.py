@@ -0,0 +1,172 @@
+import csv
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import Date, DateTime, Integer, String, delete, func, literal, select, type_coerce
+
+from models.database_models import Customer, DailySales, Order, Product, upsert_insert
+from utils.money import Money
+
+# Orders are rolled up once, when they reach one of these
+FINISHED_STATUSES = ('completed', 'failed')
+
+EXPORT_COLUMNS = ['order_id', 'created_at', 'completed_at', 'status', 'network', 'data_size', 'quantity',
+                  'amount', 'customer_phone', 'phone_to_recharge', 'transaction_reference']
+
+# Keeps each IN (...) list well below SQLite's bound-parameter limit
+BATCH_SIZE = 500
+
+
+def _rollup_source(*criteria, status=None):
+    """SELECT of finished orders grouped into daily_sales rows"""
+    day = func.date(Order.completed_at, type_=Date)
+    network = func.coalesce(Product.network, '')
+    product_id = func.coalesce(Order.product_id, 0)
+    groups = [day, network, product_id]
+    if status:
+        status = literal(status, String)
+    else:
+        status = Order.status
+        groups.append(status)
+    return (select(day, network, product_id, status, func.count(Order.id),
+                   func.coalesce(func.sum(type_coerce(Order.amount_paid, Integer)), 0),
+                   literal(datetime.utcnow(), DateTime))
+            .select_from(Order)
+            .outerjoin(Product, Product.id == Order.product_id)
+            .where(*criteria)
+            .group_by(*groups))
+
+
+def _insert_rollups(db, source, accumulate=True):
+    table = DailySales.__table__
+    stmt = upsert_insert(table, db.get_bind()).from_select(
+        ['day', 'network', 'product_id', 'status', 'order_count', 'revenue', 'updated_at'], source
+    )
+    set_ = {'updated_at': stmt.excluded.updated_at}
+    if accumulate:
+        set_.update(order_count=table.c.order_count + stmt.excluded.order_count,
+                    revenue=table.c.revenue + stmt.excluded.revenue)
+    else:
+        set_.update(order_count=stmt.excluded.order_count, revenue=stmt.excluded.revenue)
+    stmt = stmt.on_conflict_do_update(index_elements=['day', 'network', 'product_id', 'status'], set_=set_)
+    db.execute(stmt)
+
+
+def rollup_finished_orders(db, order_ids, status):
+    """Add orders that just reached `status` to the daily rollups
+
+    Called by the order repository inside the transaction that moved the
+    orders, so the rollup can never disagree with the orders table. One
+    INSERT ... SELECT ... GROUP BY ... ON CONFLICT DO UPDATE per batch.
+    """
+    if status not in FINISHED_STATUSES or not order_ids:
+        return
+    for start in range(0, len(order_ids), BATCH_SIZE):
+        chunk = order_ids[start:start + BATCH_SIZE]
+        _insert_rollups(db, _rollup_source(Order.id.in_(chunk), status=status))
+
+
+def rebuild_rollups(db, start=None, end=None, keep_before=None):
+    """Recompute daily_sales from the orders table for [start, end) (dates); everything if omitted
+
+    Days before `keep_before` (RetentionService.archived_until()) may have
+    had orders archived out of the orders table, so their rollups are kept
+    as they are. Returns the (start, end) actually rebuilt, or None if the
+    whole range was kept.
+    """
+    if keep_before is not None and (start is None or start < keep_before):
+        start = keep_before
+    if start is not None and end is not None and start >= end:
+        return None
+
+    criteria = [Order.status.in_(FINISHED_STATUSES), Order.completed_at.isnot(None)]
+    cleanup = delete(DailySales)
+    if start is not None:
+        criteria.append(Order.completed_at >= datetime.combine(start, datetime.min.time()))
+        cleanup = cleanup.where(DailySales.day >= start)
+    if end is not None:
+        criteria.append(Order.completed_at < datetime.combine(end, datetime.min.time()))
+        cleanup = cleanup.where(DailySales.day < end)
+
+    db.execute(cleanup)
+    _insert_rollups(db, _rollup_source(*criteria), accumulate=False)
+    db.commit()
+    return start, end
+
+
+def sales_summary(db, start, end, network=None, status='completed'):
+    """Per-day, per-network totals for [start, end) read from the rollups"""
+    stmt = (select(DailySales.day, DailySales.network,
+                   func.sum(DailySales.order_count).label('orders'),
+                   func.sum(type_coerce(DailySales.revenue, Integer)).label('revenue'))
+            .where(DailySales.day >= start, DailySales.day < end, DailySales.status == status)
+            .group_by(DailySales.day, DailySales.network)
+            .order_by(DailySales.day, DailySales.network))
+    if network:
+        stmt = stmt.where(DailySales.network == network)
+    return [
+        {'day': day, 'network': network, 'orders': orders, 'revenue': Money(int(revenue or 0))}
+        for day, network, orders, revenue in db.execute(stmt)
+    ]
+
+
+def _format_kobo(kobo):
+    if kobo is None:
+        return None
+    naira, kobo = divmod(kobo, 100)
+    return f"{naira}.{kobo:02d}"
+
+
+def stream_orders(db, start=None, end=None, status=None, batch_size=1000):
+    """Yield one dict per order without loading the result set into memory
+
+    Uses a server-side cursor (stream_results) fetched in `batch_size` chunks,
+    and plain columns rather than ORM objects, so memory stays flat no matter
+    how many orders match.
+    """
+    stmt = (select(Order.id, Order.created_at, Order.completed_at, Order.status, Product.network,
+                   Product.data_size, Order.quantity, type_coerce(Order.amount_paid, Integer),
+                   Customer.phone_number, Order.phone_to_recharge, Order.transaction_reference)
+            .select_from(Order)
+            .outerjoin(Product, Product.id == Order.product_id)
+            .outerjoin(Customer, Customer.id == Order.customer_id)
+            .order_by(Order.created_at))
+    if start is not None:
+        stmt = stmt.where(Order.created_at >= datetime.combine(start, datetime.min.time()))
+    if end is not None:
+        stmt = stmt.where(Order.created_at < datetime.combine(end, datetime.min.time()))
+    if status:
+        stmt = stmt.where(Order.status == status)
+
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+    for row in result:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record['amount'] = _format_kobo(record['amount'])
+        yield record
+
+
+def write_csv(records, out):
+    writer = csv.DictWriter(out, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    return count
+
+
+def write_jsonl(records, out):
+    count = 0
+    for record in records:
+        out.write(json.dumps(record, default=str, ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
+
+
+EXPORT_FORMATS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+def default_range(days=30):
+    today = datetime.utcnow().date()
+    return today - timedelta(days=days), today + timedelta(days=1)
@@ -0,0 +1,285 @@
+import logging
+import threading
+import time
+import re
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import Column, MetaData, Table, delete, insert, inspect, select
+
+from config import config
+from models.database_models import ConversationState, Order, ProcessedMessage, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Orders in these statuses never change again and can leave the hot database
+ARCHIVABLE_STATUSES = ('completed', 'failed')
+# Monthly archive names: orders_YYYY_MM.db files (SQLite) or orders_archive_YYYY_MM tables
+_ARCHIVE_MONTH = re.compile(r'^orders_(?:archive_)?(\d{4})_(\d{2})(?:\.db)?$')
+
+
+def _archive_table(table, metadata, name=None, schema=None):
+    """Bare copy of `table` (columns and primary key only) for the archive"""
+    columns = [Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns]
+    return Table(name or table.name, metadata, *columns, schema=schema)
+
+
+class RetentionService:
+    """Keeps the hot database small by archiving and pruning old rows
+
+    - Finished orders older than `order_age_days` (with their transactions)
+      move to one archive per month of completion: a separate SQLite file
+      (archive_dir/orders_YYYY_MM.db, attached while copying) or, on server
+      databases, orders_archive_YYYY_MM / transactions_archive_YYYY_MM tables.
+    - Conversation states idle for `conversation_age_days` are deleted.
+    - Dedup claims in processed_messages older than `processed_message_ttl`
+      seconds (the dedup TTL) are deleted.
+    - Freed pages are returned with PRAGMA incremental_vacuum.
+
+    Everything runs in batches of `batch_size` rows, each in its own short
+    transaction with a pause in between, so webhook workers never wait long
+    for the write lock. Per-batch lock time is recorded in metrics().
+    """
+
+    def __init__(self, engine=None, order_age_days=90, conversation_age_days=30, processed_message_ttl=86400,
+                 batch_size=500, batch_pause=0.05, vacuum_pages=2000, archive_dir=None, interval=3600):
+        self._engine = engine
+        self.order_age_days = order_age_days
+        self.conversation_age_days = conversation_age_days
+        self.processed_message_ttl = processed_message_ttl
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+        self.archive_dir = Path(archive_dir) if archive_dir else config.DATABASES_DIR / 'archive'
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.runs = 0
+        self.batches = 0
+        self.orders_archived = 0
+        self.transactions_archived = 0
+        self.conversations_deleted = 0
+        self.processed_messages_deleted = 0
+        self.pages_vacuumed = 0
+        self.lock_ms_total = 0.0
+        self.lock_ms_max = 0.0
+        self.last_run = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from models.database_models import get_engine
+            self._engine = get_engine()
+        return self._engine
+
+    @property
+    def is_sqlite(self):
+        return self.engine.dialect.name == 'sqlite'
+
+    def _record_batch(self, elapsed_ms, orders=0, transactions=0, conversations=0, processed_messages=0):
+        with self._lock:
+            self.batches += 1
+            self.orders_archived += orders
+            self.transactions_archived += transactions
+            self.conversations_deleted += conversations
+            self.processed_messages_deleted += processed_messages
+            self.lock_ms_total += elapsed_ms
+            self.lock_ms_max = max(self.lock_ms_max, elapsed_ms)
+
+    def _pause(self):
+        # Between batches: give waiting writers the lock, and stop promptly on shutdown
+        return self._stop_event.wait(self.batch_pause)
+
+    def archive_orders(self, now=None):
+        """Move finished orders older than the retention age to monthly archives. Returns orders moved."""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.order_age_days)
+        # created_at <= completed_at, so the created_at bound lets ix_orders_status_created_at do the work
+        candidates = (select(Order.id, Order.completed_at)
+                      .where(Order.status.in_(ARCHIVABLE_STATUSES),
+                             Order.created_at < cutoff,
+                             Order.completed_at < cutoff)
+                      .order_by(Order.created_at)
+                      .limit(self.batch_size))
+        moved = 0
+        while True:
+            with self.engine.connect() as conn:
+                rows = conn.execute(candidates).all()
+                conn.rollback()
+            if not rows:
+                return moved
+
+            months = {}
+            for order_id, completed_at in rows:
+                months.setdefault(completed_at.strftime('%Y_%m'), []).append(order_id)
+            for month, order_ids in sorted(months.items()):
+                moved += self._move_orders(month, order_ids)
+
+            if len(rows) < self.batch_size or self._pause():
+                return moved
+
+    def _move_orders(self, month, order_ids):
+        orders = Order.__table__
+        transactions = Transaction.__table__
+        metadata = MetaData()
+
+        with self.engine.connect() as conn:
+            if self.is_sqlite:
+                self.archive_dir.mkdir(parents=True, exist_ok=True)
+                conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (str(self.archive_dir / f"orders_{month}.db"),))
+                archived_orders = _archive_table(orders, metadata, schema='archive')
+                archived_transactions = _archive_table(transactions, metadata, schema='archive')
+            else:
+                archived_orders = _archive_table(orders, metadata, name=f"orders_archive_{month}")
+                archived_transactions = _archive_table(transactions, metadata, name=f"transactions_archive_{month}")
+            try:
+                metadata.create_all(conn, checkfirst=True)
+                conn.commit()
+
+                started = time.perf_counter()
+                copy_orders = insert(archived_orders).from_select(
+                    [column.name for column in orders.columns], select(orders).where(orders.c.id.in_(order_ids)))
+                copy_transactions = insert(archived_transactions).from_select(
+                    [column.name for column in transactions.columns],
+                    select(transactions).where(transactions.c.order_id.in_(order_ids)))
+                if self.is_sqlite:
+                    # The archive file commits separately; a retry after a crash just overwrites the copy
+                    copy_orders = copy_orders.prefix_with('OR REPLACE')
+                    copy_transactions = copy_transactions.prefix_with('OR REPLACE')
+
+                conn.execute(copy_orders)
+                transaction_count = conn.execute(copy_transactions).rowcount
+                conn.execute(delete(transactions).where(transactions.c.order_id.in_(order_ids)))
+                order_count = conn.execute(delete(orders).where(orders.c.id.in_(order_ids))).rowcount
+                conn.commit()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            finally:
+                if self.is_sqlite:
+                    conn.rollback()
+                    conn.exec_driver_sql("DETACH DATABASE archive")
+
+        self._record_batch(elapsed_ms, orders=order_count, transactions=transaction_count)
+        logger.info(f"🗄️  Archived {order_count} orders ({transaction_count} transactions) to {month} "
+                    f"in {elapsed_ms:.1f} ms")
+        return order_count
+
+    def _delete_expired(self, key, condition, counter):
+        """Delete rows matching `condition`, `batch_size` keys per transaction. Returns rows deleted."""
+        expired = select(key).where(condition).limit(self.batch_size).scalar_subquery()
+        deleted = 0
+        while True:
+            with self.engine.connect() as conn:
+                started = time.perf_counter()
+                count = conn.execute(delete(key.class_).where(key.in_(expired))).rowcount
+                conn.commit()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            if count:
+                self._record_batch(elapsed_ms, **{counter: count})
+            deleted += count
+            if count < self.batch_size or self._pause():
+                return deleted
+
+    def archived_until(self):
+        """First day after the latest archived month, or None if nothing was archived
+
+        Orders finished before it may no longer be in the orders table, so
+        their daily_sales rollups can't be rebuilt from it (see rebuild_rollups).
+        """
+        if self.is_sqlite:
+            names = [path.name for path in self.archive_dir.glob('orders_*.db')]
+        else:
+            names = inspect(self.engine).get_table_names()
+        months = [tuple(map(int, match.groups())) for match in map(_ARCHIVE_MONTH.match, names) if match]
+        if not months:
+            return None
+        year, month = max(months)
+        return date(year + month // 12, month % 12 + 1, 1)
+
+    def prune_conversations(self, now=None):
+        """Delete conversation states idle past the retention age. Returns rows deleted."""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.conversation_age_days)
+        return self._delete_expired(ConversationState.id, ConversationState.last_updated < cutoff, 'conversations')
+
+    def prune_processed_messages(self, now=None):
+        """Delete dedup claims older than the dedup TTL (served by the processed_at index). Returns rows deleted."""
+        cutoff = (now or datetime.utcnow()) - timedelta(seconds=self.processed_message_ttl)
+        return self._delete_expired(ProcessedMessage.message_id, ProcessedMessage.processed_at < cutoff,
+                                    'processed_messages')
+
+    def incremental_vacuum(self):
+        """Return free pages to the filesystem, a slice at a time. Returns pages freed."""
+        if not self.is_sqlite:
+            return 0
+        with self.engine.connect() as conn:
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                # Only databases created with auto_vacuum=INCREMENTAL (or VACUUMed after setting it) support this
+                logger.warning("⚠️  auto_vacuum is not INCREMENTAL; run enable_incremental_vacuum() once")
+                return 0
+            before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            started = time.perf_counter()
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})")
+            conn.commit()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            freed = before - conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        with self._lock:
+            self.pages_vacuumed += freed
+            self.lock_ms_max = max(self.lock_ms_max, elapsed_ms)
+        return freed
+
+    def enable_incremental_vacuum(self):
+        """One-off switch of an existing SQLite file to incremental auto-vacuum (runs a full VACUUM)"""
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.commit()
+            conn.exec_driver_sql("VACUUM")
+
+    def run_once(self, now=None):
+        with self._run_lock:
+            result = {
+                'orders_archived': self.archive_orders(now),
+                'conversations_deleted': self.prune_conversations(now),
+                'processed_messages_deleted': self.prune_processed_messages(now),
+                'pages_vacuumed': self.incremental_vacuum()
+            }
+            with self._lock:
+                self.runs += 1
+                self.last_run = datetime.utcnow()
+            return result
+
+    def start(self):
+        """Run retention every `interval` seconds in the background"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Retention run failed: {e}")
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'batches': self.batches,
+                'orders_archived': self.orders_archived,
+                'transactions_archived': self.transactions_archived,
+                'conversations_deleted': self.conversations_deleted,
+                'processed_messages_deleted': self.processed_messages_deleted,
+                'pages_vacuumed': self.pages_vacuumed,
+                'lock_ms_avg': round(self.lock_ms_total / self.batches, 2) if self.batches else 0.0,
+                'lock_ms_max': round(self.lock_ms_max, 2),
+                'last_run': self.last_run.isoformat() if self.last_run else None
+            }
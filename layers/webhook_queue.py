@@ -0,0 +1,224 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class _SQLiteQueueStore:
+    """Durable backing for the webhook queue so accepted payloads survive a restart"""
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS webhook_queue ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "payload TEXT NOT NULL, "
+            "enqueued_at REAL NOT NULL)"
+        )
+
+    def add(self, payload, enqueued_at):
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO webhook_queue (payload, enqueued_at) VALUES (?, ?)",
+                (json.dumps(payload, separators=(',', ':')), enqueued_at)
+            )
+            return cursor.lastrowid
+
+    def remove(self, row_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM webhook_queue WHERE id = ?", (row_id,))
+
+    def pending(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, enqueued_at FROM webhook_queue ORDER BY id"
+            ).fetchall()
+        return [(row_id, json.loads(payload), enqueued_at) for row_id, payload, enqueued_at in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WebhookQueue:
+    """Bounded in-process queue that decouples webhook acknowledgement from processing"""
+
+    def __init__(self, handler, maxsize=1000, workers=4, durable_path=None, rate_window=60):
+        self.handler = handler
+        self.workers = workers
+        self.rate_window = rate_window
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._store = _SQLiteQueueStore(durable_path) if durable_path else None
+        self._threads = []
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._live_workers = 0
+        self._close_store = False  # stop() left the store for the last worker still running to close
+
+        # Metrics
+        self._metrics_lock = threading.Lock()
+        self._completions = deque()
+        self.enqueued_total = 0
+        self.processed_total = 0
+        self.failed_total = 0
+        self.rejected_total = 0
+        self._enqueue_time_total = 0.0
+        self._enqueue_time_max = 0.0
+
+        logger.info(f"📥 Webhook queue initialized (size={maxsize}, workers={workers}, "
+                    f"durable={'yes' if self._store else 'no'})")
+
+    @property
+    def running(self):
+        return bool(self._threads) and not self._stop_event.is_set()
+
+    def start(self):
+        """Start the worker pool, replaying any payloads left over in the durable store"""
+        with self._start_lock:
+            if self.running:
+                return
+
+            self._stop_event.clear()
+            self._close_store = False
+
+            if self._store:
+                for row_id, payload, enqueued_at in self._store.pending():
+                    try:
+                        self._queue.put_nowait((row_id, payload, enqueued_at))
+                    except queue.Full:
+                        logger.warning("⚠️  Webhook queue full while replaying durable backlog")
+                        break
+
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"webhook-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            self._live_workers += len(self._threads)
+            for thread in self._threads:
+                thread.start()
+
+    def enqueue(self, payload):
+        """Enqueue a raw webhook payload. Returns False when the queue is full."""
+        started = time.perf_counter()
+        enqueued_at = time.time()
+
+        if self._queue.full():
+            with self._metrics_lock:
+                self.rejected_total += 1
+            return False
+
+        row_id = self._store.add(payload, enqueued_at) if self._store else None
+
+        try:
+            self._queue.put_nowait((row_id, payload, enqueued_at))
+        except queue.Full:
+            if row_id is not None:
+                self._store.remove(row_id)
+            with self._metrics_lock:
+                self.rejected_total += 1
+            return False
+
+        elapsed = time.perf_counter() - started
+        with self._metrics_lock:
+            self.enqueued_total += 1
+            self._enqueue_time_total += elapsed
+            self._enqueue_time_max = max(self._enqueue_time_max, elapsed)
+        return True
+
+    def _worker(self):
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    row_id, payload, enqueued_at = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+                failed = False
+                try:
+                    self.handler(payload)
+                except Exception as e:
+                    failed = True
+                    logger.error(f"❌ Queued webhook processing error: {e}")
+                finally:
+                    if row_id is not None:
+                        self._store.remove(row_id)
+                    self._record_completion(failed)
+                    self._queue.task_done()
+        finally:
+            with self._start_lock:
+                self._live_workers -= 1
+                if not self._live_workers and self._close_store:
+                    self._shut_store()
+
+    def _shut_store(self):
+        self._store.close()
+        self._store = None
+        self._close_store = False
+
+    def _record_completion(self, failed):
+        now = time.monotonic()
+        with self._metrics_lock:
+            self.processed_total += 1
+            if failed:
+                self.failed_total += 1
+            self._completions.append(now)
+            self._trim_completions(now)
+
+    def _trim_completions(self, now):
+        cutoff = now - self.rate_window
+        while self._completions and self._completions[0] < cutoff:
+            self._completions.popleft()
+
+    def drain(self, timeout=None):
+        """Wait until every queued payload has been processed. Returns True if drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout=10):
+        """Drain outstanding work and stop the worker pool"""
+        drained = self.drain(timeout) if self.running else True
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+        with self._start_lock:
+            if self._store and self._live_workers:
+                # Workers still inside the handler remove their row when they finish
+                logger.warning(f"⚠️  {self._live_workers} webhook worker(s) still busy; "
+                               f"durable store closes when they finish")
+                self._close_store = True
+            elif self._store:
+                self._shut_store()
+        return drained
+
+    def metrics(self):
+        """Queue depth, enqueue latency and drain rate for the health endpoint"""
+        with self._metrics_lock:
+            self._trim_completions(time.monotonic())
+            enqueued = self.enqueued_total
+            return {
+                'depth': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'workers': self.workers,
+                'running': self.running,
+                'durable': self._store is not None,
+                'enqueued_total': enqueued,
+                'processed_total': self.processed_total,
+                'failed_total': self.failed_total,
+                'rejected_total': self.rejected_total,
+                'enqueue_latency_avg_ms': round(self._enqueue_time_total / enqueued * 1000, 4) if enqueued else 0.0,
+                'enqueue_latency_max_ms': round(self._enqueue_time_max * 1000, 4),
+                'drain_rate_per_sec': round(len(self._completions) / self.rate_window, 3)
+            }
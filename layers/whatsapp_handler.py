@@ -2,20 +2,254 @@
 import requests
 import json
 import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from config import config
+from layers.outbound_dispatcher import OutboundDispatcher, PRIORITY_NORMAL
+from utils.dedup_cache import MessageDeduplicator
 
 logger = logging.getLogger(__name__)
 
+# Graph API responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
-class WhatsAppHandler:
-    def __init__(self):
-        self.base_url = f"https://graph.facebook.com/v17.0/{config.WHATSAPP_PHONE_NUMBER_ID}"
+
+def extract_events(data):
+    """Flatten a webhook payload into (kind, sender, item) tuples in delivery order"""
+    events = []
+    for entry in data.get('entry') or []:
+        for change in entry.get('changes') or []:
+            value = change.get('value') or {}
+            for message in value.get('messages') or []:
+                events.append(('message', message.get('from'), message))
+            for status in value.get('statuses') or []:
+                events.append(('status', status.get('recipient_id'), status))
+    return events
+
+
+def group_by_sender(events):
+    """{sender: [(index, event), ...]} keeping each sender's events in delivery order"""
+    by_sender = {}
+    for index, event in enumerate(events):
+        by_sender.setdefault(event[1], []).append((index, event))
+    return by_sender
+
+
+def process_status(status):
+    """Log a delivery/read status callback for a message we sent"""
+    logger.info(f"📬 Message {status.get('id')} to {status.get('recipient_id')} is {status.get('status')}")
+    return {
+        'processed': True,
+        'message_type': 'status',
+        'sender': status.get('recipient_id'),
+        'message_id': status.get('id'),
+        'status': status.get('status')
+    }
+
+
+def summarize_results(results):
+    """The process_webhook() result for a list of per-event results"""
+    processed = [result for result in results if result.get('processed')]
+    first = processed[0] if processed else results[0]
+    return {
+        'processed': bool(processed),
+        'message_type': first.get('message_type'),
+        'sender': first.get('sender'),
+        'message_count': len(results),
+        'results': results
+    }
+
+
+class MessageResponder:
+    """Decides what to do with one inbound message; shared by the threaded and asyncio handlers
+
+    Expects `dedup`, `customer_activity` and `bot_handler` attributes, and
+    `reply()` / `download_media()` for receipts.
+    """
+
+    # ReceiptProcessor reading image messages as payment receipts, None to skip OCR
+    receipts = None
+    # OrderRepository telling whether a receipt's reference already paid for an order
+    orders = None
+
+    def respond(self, message):
+        """Returns (result, reply text or None) for a webhook message"""
+        try:
+            message_type = message.get('type')
+            sender = message.get('from')
+            message_id = message.get('id')
+
+            # WhatsApp redelivers webhooks, never answer the same message twice
+            if message_id and self.dedup.is_duplicate(message_id):
+                logger.info(f"♻️  Duplicate delivery of {message_id} from {sender} ignored")
+                return {
+                    'processed': False,
+                    'duplicate': True,
+                    'message_type': message_type,
+                    'sender': sender
+                }, None
+
+            logger.info(f"💬 Received {message_type} message from {sender}")
+
+            if self.customer_activity is not None and sender:
+                self.customer_activity.touch(sender)
+
+            if message_type == 'text':
+                text = message['text']['body']
+                logger.info(f"📝 Message content: {text}")
+
+                if self.bot_handler is not None:
+                    response = self.bot_handler.handle_message(text, sender)
+                else:
+                    response = f"Thanks for your message: '{text}'. Bot logic integration coming in Step 2.3!"
+
+                return {
+                    'processed': True,
+                    'message_type': 'text',
+                    'sender': sender,
+                    'content': text
+                }, response
+
+            elif message_type == 'image':
+                logger.info("🖼️ Image message received")
+                # Handle image messages (receipts)
+                result = {
+                    'processed': True,
+                    'message_type': 'image',
+                    'sender': sender
+                }
+                if self.receipts is None:
+                    return result, "I received your image! Receipt processing coming soon."
+
+                # Download and OCR happen on the receipt processor; the result arrives as a second reply
+                media_id = (message.get('image') or {}).get('id')
+                job_id = self.receipts.submit(sender, lambda: self.download_media(media_id),
+                                              deliver=self.deliver_receipt)
+                if job_id is None:
+                    logger.warning(f"⚠️  Receipt queue full, asked {sender} to resend")
+                    return result, "We're checking a lot of receipts right now 🙏 Please send yours again in a few minutes."
+                result['receipt_job'] = job_id
+                return result, "🧾 Got your receipt! Checking it now, I'll message you in a moment."
+
+            else:
+                logger.info(f"ℹ️  Unhandled message type: {message_type}")
+                return {
+                    'processed': True,
+                    'message_type': message_type,
+                    'sender': sender
+                }, f"I received your {message_type} message. Currently I only process text and images."
+
+        except Exception as e:
+            logger.error(f"❌ Message processing error: {e}")
+            return {'processed': False, 'error': str(e)}, None
+
+    def deliver_receipt(self, sender, outcome):
+        """ReceiptProcessor callback: keep the fields read with the conversation and tell the customer"""
+        from layers.receipt_processor import receipt_read, receipt_reply, reused_receipt
+
+        logger.info(f"🧾 Receipt job {outcome['job_id']} for {sender}: {outcome['status']} "
+                    f"in {outcome['elapsed_ms']} ms")
+        conversations = getattr(self.bot_handler, 'conversations', None)
+        # The customer's own receipt on record, whatever they have said since, is not reuse
+        pending = conversations.get(sender).context.get('receipt') if conversations is not None else None
+        reference = (outcome.get('fields') or {}).get('reference')
+        settled = bool(self.orders is not None and reference and self.orders.reference_settled(reference))
+        reused = reused_receipt(outcome, pending, settled)
+        if reused and outcome.get('duplicate_of'):
+            duplicate = outcome['duplicate_of']
+            logger.warning(f"⚠️  {sender} sent receipt #{duplicate['receipt_id']} already sent by "
+                           f"{duplicate['sender']} ({duplicate['match']} match)")
+        elif reused:
+            logger.warning(f"⚠️  {sender} sent a receipt for reference {reference}, which already paid for an order")
+        # Only a complete read moves the order on; the reply asks for a clearer receipt otherwise
+        if conversations is not None and receipt_read(outcome) and not reused:
+            conversations.update(sender, state='payment_verification', receipt=outcome['fields'])
+        self.reply_threadsafe(sender, receipt_reply(outcome, pending, settled))
+
+    def reply_threadsafe(self, to, message):
+        """reply() from a thread that isn't handling a webhook"""
+        self.reply(to, message)
+
+
+class WhatsAppHandler(MessageResponder):
+    def __init__(self, bot_handler=None, customer_activity=None, receipts=None, orders=None):
+        self.bot_handler = bot_handler
+        # Optional CustomerActivity recording when each customer was last seen
+        self.customer_activity = customer_activity
+        self.receipts = receipts
+        self.orders = orders
+        self.base_url = f"{config.WHATSAPP_API_URL.rstrip('/')}/{config.WHATSAPP_PHONE_NUMBER_ID}"
         self.headers = {
             "Authorization": f"Bearer {config.WHATSAPP_TOKEN}",
             "Content-Type": "application/json"
         }
+        self.timeout = (config.WHATSAPP_CONNECT_TIMEOUT, config.WHATSAPP_READ_TIMEOUT)
+        self.max_retries = config.WHATSAPP_MAX_RETRIES
+        self.retry_backoff = config.WHATSAPP_RETRY_BACKOFF
+        self.session = self._create_session(config.WHATSAPP_POOL_SIZE)
+        self.dedup = MessageDeduplicator(
+            ttl=config.DEDUP_TTL_SECONDS,
+            max_entries=config.DEDUP_MAX_ENTRIES,
+            persistent=config.DEDUP_PERSISTENT
+        )
+        self.dispatcher = None
+        if config.OUTBOUND_DISPATCH_ENABLED:
+            self.dispatcher = OutboundDispatcher(
+                lambda to, message: self.send_text_message(to, message),
+                workers=config.OUTBOUND_WORKERS,
+                global_rate=config.OUTBOUND_GLOBAL_RATE,
+                global_burst=config.OUTBOUND_GLOBAL_BURST,
+                recipient_rate=config.OUTBOUND_RECIPIENT_RATE,
+                recipient_burst=config.OUTBOUND_RECIPIENT_BURST,
+                coalesce_window=config.OUTBOUND_COALESCE_WINDOW
+            )
+        self._dispatch_pool = ThreadPoolExecutor(
+            max_workers=config.WHATSAPP_DISPATCH_WORKERS,
+            thread_name_prefix="whatsapp-dispatch"
+        )
         logger.info("📱 WhatsApp Handler initialized")
 
+    def _create_session(self, pool_size):
+        """Shared keep-alive session so replies reuse open connections to the Graph API"""
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _post(self, path, payload):
+        """POST to the Graph API, retrying 429/5xx and connection errors with jittered backoff
+
+        A read timeout is not retried: the API may already have accepted the
+        message, and sending it again would reach the customer twice.
+        """
+        url = f"{self.base_url}/{path}"
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+            except (requests.ConnectTimeout, requests.ConnectionError):
+                if attempt == self.max_retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+
+            logger.warning(f"⚠️  Graph API returned {response.status_code}, retrying ({attempt + 1}/{self.max_retries})")
+            self._sleep_before_retry(attempt, response.headers.get('Retry-After'))
+
+    def _sleep_before_retry(self, attempt, retry_after=None):
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = self.retry_backoff * (2 ** attempt)
+        time.sleep(delay * random.uniform(0.5, 1.5))
+
     def send_text_message(self, to, message):
         """Send text message via WhatsApp API"""
         if not config.WHATSAPP_TOKEN or config.WHATSAPP_TOKEN.startswith('your_'):
@@ -30,12 +264,7 @@ class WhatsAppHandler:
 
         try:
             logger.info(f"📤 Sending message to {to}")
-            response = requests.post(
-                f"{self.base_url}/messages",
-                headers=self.headers,
-                json=payload,
-                timeout=10
-            )
+            response = self._post("messages", payload)
 
             if response.status_code == 200:
                 logger.info("✅ Message sent successfully")
@@ -48,76 +277,74 @@ class WhatsAppHandler:
             logger.error(f"❌ Error sending message: {e}")
             return None
 
+    def reply(self, to, message, priority=PRIORITY_NORMAL):
+        """Queue a reply on the outbound dispatcher, or send it inline when dispatch is disabled"""
+        if self.dispatcher is None:
+            return self.send_text_message(to, message)
+        self.dispatcher.submit(to, message, priority)
+        return None
+
     def process_webhook(self, data):
-        """Process incoming webhook from WhatsApp"""
+        """Process incoming webhook from WhatsApp
+
+        WhatsApp can batch several entries, changes, messages and status
+        callbacks into one delivery, so every item is dispatched. Items from
+        the same sender are handled in order; different senders run in parallel.
+        """
         try:
             logger.info("🔄 Processing webhook data...")
 
-            # Extract the important parts from webhook data
-            entry = data.get('entry', [])[0] if data.get('entry') else {}
-            changes = entry.get('changes', [])[0] if entry.get('changes') else {}
-            value = changes.get('value', {})
-
-            # Check if this is a message
-            if 'messages' in value:
-                message = value['messages'][0]
-                return self._process_message(message)
-            else:
+            events = extract_events(data)
+            if not events:
                 logger.info("ℹ️  Webhook received but no messages found")
-                return {'processed': False}
+                return {'processed': False, 'results': []}
+
+            return summarize_results(self._dispatch_events(events))
 
         except Exception as e:
             logger.error(f"❌ Webhook processing error: {e}")
             return {'processed': False, 'error': str(e)}
 
-    def _process_message(self, message):
-        """Process individual message from webhook"""
-        try:
-            message_type = message.get('type')
-            sender = message.get('from')
-            message_id = message.get('id')
+    def _dispatch_events(self, events):
+        """Run events sequentially per sender and in parallel across senders"""
+        by_sender = group_by_sender(events)
+        results = [None] * len(events)
 
-            logger.info(f"💬 Received {message_type} message from {sender}")
+        def run_sender(sender_events):
+            for index, (kind, _, item) in sender_events:
+                if kind == 'message':
+                    results[index] = self._process_message(item)
+                else:
+                    results[index] = self._process_status(item)
 
-            if message_type == 'text':
-                text = message['text']['body']
-                logger.info(f"📝 Message content: {text}")
+        if len(by_sender) == 1:
+            run_sender(next(iter(by_sender.values())))
+        else:
+            futures = [self._dispatch_pool.submit(run_sender, sender_events)
+                       for sender_events in by_sender.values()]
+            for future in futures:
+                future.result()
 
-                # Here we'll integrate with the bot logic later
-                # For now, just acknowledge receipt
-                response = f"Thanks for your message: '{text}'. Bot logic integration coming in Step 2.3!"
-                self.send_text_message(sender, response)
+        return results
 
-                return {
-                    'processed': True,
-                    'message_type': 'text',
-                    'sender': sender,
-                    'content': text
-                }
-
-            elif message_type == 'image':
-                logger.info("🖼️ Image message received")
-                # Handle image messages (receipts)
-                self.send_text_message(sender, "I received your image! Receipt processing coming soon.")
-                return {
-                    'processed': True,
-                    'message_type': 'image',
-                    'sender': sender
-                }
+    def _process_status(self, status):
+        """Process a delivery/read status callback for a message we sent"""
+        return process_status(status)
 
-            else:
-                logger.info(f"ℹ️  Unhandled message type: {message_type}")
-                self.send_text_message(sender,
-                                       f"I received your {message_type} message. Currently I only process text and images.")
-                return {
-                    'processed': True,
-                    'message_type': message_type,
-                    'sender': sender
-                }
+    def _process_message(self, message):
+        """Process individual message from webhook"""
+        result, response = self.respond(message)
+        if response is not None:
+            self.reply(result['sender'], response)
+        return result
 
-        except Exception as e:
-            logger.error(f"❌ Message processing error: {e}")
-            return {'processed': False, 'error': str(e)}
+    def download_media(self, media_id):
+        """Fetch an inbound media file: look up its temporary URL, then download the bytes"""
+        lookup = self.session.get(f"{config.WHATSAPP_API_URL.rstrip('/')}/{media_id}", timeout=self.timeout)
+        lookup.raise_for_status()
+        response = self.session.get(lookup.json()['url'], timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
 
     def mark_message_as_read(self, message_id):
         """Mark message as read in WhatsApp"""
@@ -128,12 +355,15 @@ class WhatsAppHandler:
         }
 
         try:
-            response = requests.post(
-                f"{self.base_url}/messages",
-                headers=self.headers,
-                json=payload
-            )
+            response = self._post("messages", payload)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Error marking message as read: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def close(self, timeout=10):
+        """Send queued replies, then release the worker pool and HTTP connections. Returns True if drained."""
+        drained = self.dispatcher.stop(timeout) if self.dispatcher else True
+        self._dispatch_pool.shutdown(wait=True)
+        self.session.close()
+        return drained
@@ -0,0 +1,50 @@
+# migrations/env.py
+import sys
+from pathlib import Path
+
+from alembic import context
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import config
+from models.database_models import Base, create_db_engine
+
+target_metadata = Base.metadata
+
+
+def _database_url():
+    # Tests and tools can pass a URL explicitly: Config(...).set_main_option('sqlalchemy.url', ...)
+    return context.config.get_main_option('sqlalchemy.url') or config.DATABASE_URL
+
+
+def run_migrations_offline():
+    """Emit SQL to stdout instead of running it (alembic upgrade head --sql)"""
+    url = _database_url()
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=url.startswith('sqlite')
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = create_db_engine(_database_url())
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most constraints, so batch mode rebuilds the table
+            render_as_batch=connection.dialect.name == 'sqlite'
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
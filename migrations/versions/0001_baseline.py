@@ -0,0 +1,95 @@
+"""Baseline schema as created by the original init_db()
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Databases created before migrations existed already have these tables; mark
+them with `alembic stamp 0001` and then run `alembic upgrade head`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'customers',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('phone_number', sa.String(20)),
+        sa.Column('name', sa.String(100), nullable=True),
+        sa.Column('last_interaction', sa.DateTime()),
+        sa.Column('is_active', sa.Boolean()),
+        sa.Column('total_purchases', sa.Integer()),
+        sa.Column('created_at', sa.DateTime()),
+    )
+    op.create_index('ix_customers_id', 'customers', ['id'])
+    op.create_index('ix_customers_phone_number', 'customers', ['phone_number'], unique=True)
+
+    op.create_table(
+        'products',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(100)),
+        sa.Column('description', sa.Text()),
+        sa.Column('price', sa.Float()),
+        sa.Column('is_available', sa.Boolean()),
+        sa.Column('stock_quantity', sa.Integer()),
+        sa.Column('data_size', sa.String(20)),
+        sa.Column('validity_period', sa.String(50)),
+        sa.Column('created_at', sa.DateTime()),
+    )
+    op.create_index('ix_products_id', 'products', ['id'])
+
+    op.create_table(
+        'orders',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('customer_id', sa.Integer(), sa.ForeignKey('customers.id')),
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id')),
+        sa.Column('quantity', sa.Integer()),
+        sa.Column('amount_paid', sa.Float()),
+        sa.Column('phone_to_recharge', sa.String(20)),
+        sa.Column('status', sa.String(50)),
+        sa.Column('transaction_reference', sa.String(100), nullable=True),
+        sa.Column('receipt_image_path', sa.String(255), nullable=True),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_orders_id', 'orders', ['id'])
+
+    op.create_table(
+        'transactions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('order_id', sa.Integer(), sa.ForeignKey('orders.id')),
+        sa.Column('bank_reference', sa.String(100)),
+        sa.Column('amount', sa.Float()),
+        sa.Column('transaction_date', sa.DateTime()),
+        sa.Column('is_verified', sa.Boolean()),
+        sa.Column('verification_method', sa.String(50)),
+        sa.Column('bank_name', sa.String(100)),
+        sa.Column('created_at', sa.DateTime()),
+    )
+    op.create_index('ix_transactions_id', 'transactions', ['id'])
+
+    op.create_table(
+        'conversation_states',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('phone_number', sa.String(20)),
+        sa.Column('state', sa.String(100)),
+        sa.Column('context_data', sa.Text()),
+        sa.Column('last_updated', sa.DateTime()),
+    )
+    op.create_index('ix_conversation_states_id', 'conversation_states', ['id'])
+    op.create_index('ix_conversation_states_phone_number', 'conversation_states', ['phone_number'])
+
+
+def downgrade():
+    op.drop_table('conversation_states')
+    op.drop_table('transactions')
+    op.drop_table('orders')
+    op.drop_table('products')
+    op.drop_table('customers')
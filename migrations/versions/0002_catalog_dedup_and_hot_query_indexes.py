@@ -0,0 +1,66 @@
+"""Catalog columns, processed messages and indexes for the hot queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Product catalog lives in the products table, keyed by network + bundle size
+    with op.batch_alter_table('products') as batch:
+        batch.add_column(sa.Column('network', sa.String(20), nullable=True))
+        batch.add_column(sa.Column('plan_code', sa.String(50), nullable=True))
+        batch.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_products_network_data_size', 'products', ['network', 'data_size'], unique=True)
+
+    op.create_table(
+        'processed_messages',
+        sa.Column('message_id', sa.String(128), primary_key=True),
+        sa.Column('processed_at', sa.DateTime()),
+    )
+    op.create_index('ix_processed_messages_processed_at', 'processed_messages', ['processed_at'])
+
+    # One conversation row per phone: keep the newest row before enforcing it
+    op.execute(
+        "DELETE FROM conversation_states WHERE id NOT IN "
+        "(SELECT MAX(id) FROM conversation_states GROUP BY phone_number)"
+    )
+    op.drop_index('ix_conversation_states_phone_number', table_name='conversation_states')
+    op.create_index('ix_conversation_states_phone_number', 'conversation_states', ['phone_number'], unique=True)
+
+    op.create_index('ix_orders_status_created_at', 'orders', ['status', 'created_at'])
+    op.create_index('ix_orders_customer_id_created_at', 'orders', ['customer_id', 'created_at'])
+    op.create_index('ix_orders_created_at', 'orders', ['created_at'])
+    op.create_index('ix_orders_transaction_reference', 'orders', ['transaction_reference'], unique=True)
+    op.create_index('ix_transactions_bank_reference', 'transactions', ['bank_reference'], unique=True)
+    op.create_index('ix_transactions_order_id', 'transactions', ['order_id'])
+
+
+def downgrade():
+    op.drop_index('ix_transactions_order_id', table_name='transactions')
+    op.drop_index('ix_transactions_bank_reference', table_name='transactions')
+    op.drop_index('ix_orders_transaction_reference', table_name='orders')
+    op.drop_index('ix_orders_created_at', table_name='orders')
+    op.drop_index('ix_orders_customer_id_created_at', table_name='orders')
+    op.drop_index('ix_orders_status_created_at', table_name='orders')
+
+    op.drop_index('ix_conversation_states_phone_number', table_name='conversation_states')
+    op.create_index('ix_conversation_states_phone_number', 'conversation_states', ['phone_number'])
+
+    op.drop_index('ix_processed_messages_processed_at', table_name='processed_messages')
+    op.drop_table('processed_messages')
+
+    op.drop_index('ix_products_network_data_size', table_name='products')
+    with op.batch_alter_table('products') as batch:
+        batch.drop_column('updated_at')
+        batch.drop_column('plan_code')
+        batch.drop_column('network')
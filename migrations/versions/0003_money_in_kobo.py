@@ -0,0 +1,40 @@
+"""Store money as integer kobo and index amounts for reconciliation
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+MONEY_COLUMNS = [
+    ('products', 'price'),
+    ('orders', 'amount_paid'),
+    ('transactions', 'amount'),
+]
+
+
+def upgrade():
+    for table, column in MONEY_COLUMNS:
+        op.execute(f"UPDATE {table} SET {column} = ROUND({column} * 100) WHERE {column} IS NOT NULL")
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, existing_type=sa.Float(), type_=sa.Integer())
+
+    op.create_index('ix_orders_status_amount_paid_created_at', 'orders', ['status', 'amount_paid', 'created_at'])
+    op.create_index('ix_transactions_amount_transaction_date', 'transactions', ['amount', 'transaction_date'])
+
+
+def downgrade():
+    op.drop_index('ix_transactions_amount_transaction_date', table_name='transactions')
+    op.drop_index('ix_orders_status_amount_paid_created_at', table_name='orders')
+
+    for table, column in MONEY_COLUMNS:
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, existing_type=sa.Integer(), type_=sa.Float())
+        op.execute(f"UPDATE {table} SET {column} = {column} / 100.0 WHERE {column} IS NOT NULL")
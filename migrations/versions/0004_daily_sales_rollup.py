@@ -0,0 +1,38 @@
+"""Daily sales rollup table for reporting
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Existing finished orders are not rolled up here; run `python report.py rebuild`
+once after upgrading.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'daily_sales',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('network', sa.String(20), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(50), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime()),
+    )
+    op.create_index('ix_daily_sales_day_network_product_status', 'daily_sales',
+                    ['day', 'network', 'product_id', 'status'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_daily_sales_day_network_product_status', table_name='daily_sales')
+    op.drop_table('daily_sales')
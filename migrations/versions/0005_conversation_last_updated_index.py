@@ -0,0 +1,21 @@
+"""Index conversation_states.last_updated for retention pruning
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_conversation_states_last_updated', 'conversation_states', ['last_updated'])
+
+
+def downgrade():
+    op.drop_index('ix_conversation_states_last_updated', table_name='conversation_states')
@@ -0,0 +1,32 @@
+"""Receipt fingerprints: exact and perceptual hashes of receipt images read
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'receipt_fingerprints',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('sha256', sa.String(64), nullable=False),
+        sa.Column('phash', sa.String(64), nullable=False),
+        sa.Column('sender', sa.String(20)),
+        sa.Column('fields', sa.Text()),
+        sa.Column('created_at', sa.DateTime()),
+    )
+    op.create_index('ix_receipt_fingerprints_sha256', 'receipt_fingerprints', ['sha256'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_receipt_fingerprints_sha256', table_name='receipt_fingerprints')
+    op.drop_table('receipt_fingerprints')
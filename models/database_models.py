@@ -1,14 +1,140 @@
 # models/database_models.py
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey
+from sqlalchemy import create_engine, event, Column, Integer, String, Date, DateTime, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship  # ← UPDATED IMPORT
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+from pathlib import Path
+import threading
 from config import config
+from utils.money import Money
+
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Per-connection SQLite tuning for concurrent webhook workers"""
+    cursor = dbapi_connection.cursor()
+    # Only takes effect on a new, empty file; lets retention hand freed pages back in slices
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    # WAL lets readers run alongside the single writer (persistent, but cheap to re-assert)
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # Safe with WAL: only the last commits can be lost on power failure, never corrupted
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}")  # negative = KiB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def create_db_engine(url=None):
+    """Create the SQLAlchemy engine with the production profile for its backend
+
+    SQLite gets WAL mode, relaxed fsync, a busy timeout (instead of failing
+    straight away with "database is locked") and a larger page cache/mmap.
+    Server databases get a sized connection pool with pre-ping and recycling.
+    """
+    url = url or config.DATABASE_URL
+
+    if url.startswith('sqlite'):
+        in_memory = url in ('sqlite://', 'sqlite:///:memory:')
+        if not in_memory:
+            Path(url.split(':///', 1)[1]).parent.mkdir(parents=True, exist_ok=True)
+        engine = create_engine(
+            url,
+            connect_args={'check_same_thread': False, 'timeout': config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+            **({} if in_memory else {'pool_size': config.DB_POOL_SIZE, 'max_overflow': config.DB_MAX_OVERFLOW})
+        )
+        if not in_memory:
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
+        return engine
+
+    return create_engine(
+        url,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+        pool_recycle=config.DB_POOL_RECYCLE
+    )
+
+
+class MoneyType(TypeDecorator):
+    """Integer kobo in the database, Money in Python
+
+    Plain numbers assigned to a money column are taken as Naira, so
+    `amount_paid=500` stores 50000 kobo.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return Money.from_naira(value).kobo
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return Money(int(value))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The application engine, created on first use rather than at import"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_db_engine()
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+class _LazySessionFactory(sessionmaker):
+    """sessionmaker that binds to get_engine() the first time a session is opened"""
+
+    def __call__(self, **local_kw):
+        if self.kw.get('bind') is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+def __getattr__(name):
+    # `from models.database_models import engine` keeps working, without building it at import
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Create engine and session
-engine = create_engine(config.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = _LazySessionFactory(autocommit=False, autoflush=False)
 Base = declarative_base()
 
+# Catalog seeded into the products table on first run
+DEFAULT_DATA_PLANS = {
+    'MTN': {
+        '1GB': {'price': 300, 'validity': '7 days'},
+        '2GB': {'price': 500, 'validity': '30 days'},
+        '5GB': {'price': 1000, 'validity': '30 days'},
+        '10GB': {'price': 2000, 'validity': '30 days'}
+    },
+    'GLO': {
+        '1GB': {'price': 280, 'validity': '7 days'},
+        '2.5GB': {'price': 500, 'validity': '30 days'},
+        '5GB': {'price': 950, 'validity': '30 days'},
+        '10GB': {'price': 1900, 'validity': '30 days'}
+    },
+    'AIRTEL': {
+        '1GB': {'price': 320, 'validity': '7 days'},
+        '2GB': {'price': 550, 'validity': '30 days'},
+        '5GB': {'price': 1100, 'validity': '30 days'},
+        '10GB': {'price': 2100, 'validity': '30 days'}
+    }
+}
+
 
 class Customer(Base):
     __tablename__ = "customers"
@@ -31,16 +157,23 @@ class Product(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100))
     description = Column(Text)
-    price = Column(Float)
+    price = Column(MoneyType)
     is_available = Column(Boolean, default=True)
     stock_quantity = Column(Integer, default=0)
     data_size = Column(String(20))  # e.g., "1GB", "2GB", "5GB"
     validity_period = Column(String(50))  # e.g., "7 days", "30 days"
+    network = Column(String(20), nullable=True)  # MTN, GLO, AIRTEL
+    plan_code = Column(String(50), nullable=True)  # supplier's code for the plan, e.g. "MTN-2GB"
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     orders = relationship("Order", back_populates="product")
 
+    __table_args__ = (
+        Index('ix_products_network_data_size', 'network', 'data_size', unique=True),
+    )
+
 
 class Order(Base):
     __tablename__ = "orders"
@@ -49,7 +182,7 @@ class Order(Base):
     customer_id = Column(Integer, ForeignKey("customers.id"))
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, default=1)
-    amount_paid = Column(Float)
+    amount_paid = Column(MoneyType)
     phone_to_recharge = Column(String(20))
     status = Column(String(50), default="pending")  # pending, paid, processing, completed, failed
     transaction_reference = Column(String(100), nullable=True)
@@ -62,6 +195,19 @@ class Order(Base):
     product = relationship("Product", back_populates="orders")
     transactions = relationship("Transaction", back_populates="order")
 
+    __table_args__ = (
+        # Pending-order sweeps: WHERE status = ? AND created_at < ? ORDER BY created_at
+        Index('ix_orders_status_created_at', 'status', 'created_at'),
+        # Customer order history: WHERE customer_id = ? ORDER BY created_at DESC
+        Index('ix_orders_customer_id_created_at', 'customer_id', 'created_at'),
+        # Date-range reporting across every status
+        Index('ix_orders_created_at', 'created_at'),
+        # Payment reconciliation: pending order for exactly this amount
+        Index('ix_orders_status_amount_paid_created_at', 'status', 'amount_paid', 'created_at'),
+        # Payment matching by the reference quoted on the transfer
+        Index('ix_orders_transaction_reference', 'transaction_reference', unique=True),
+    )
+
 
 class Transaction(Base):
     __tablename__ = "transactions"
@@ -69,7 +215,7 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"))
     bank_reference = Column(String(100))
-    amount = Column(Float)
+    amount = Column(MoneyType)
     transaction_date = Column(DateTime)
     is_verified = Column(Boolean, default=False)
     verification_method = Column(String(50))  # receipt_scan, bank_api, manual
@@ -79,56 +225,115 @@ class Transaction(Base):
     # Relationships
     order = relationship("Order", back_populates="transactions")
 
+    __table_args__ = (
+        # A bank reference can only ever pay for one order
+        Index('ix_transactions_bank_reference', 'bank_reference', unique=True),
+        Index('ix_transactions_order_id', 'order_id'),
+        # Matching a bank alert/receipt to a recorded transfer by exact amount
+        Index('ix_transactions_amount_transaction_date', 'amount', 'transaction_date'),
+    )
+
 
 class ConversationState(Base):
     __tablename__ = "conversation_states"
 
     id = Column(Integer, primary_key=True, index=True)
-    phone_number = Column(String(20), index=True)
+    phone_number = Column(String(20), unique=True, index=True)  # one row per customer, target of upserts
     state = Column(String(100))  # greeting, product_inquiry, order_creation, payment_waiting, etc.
-    context_data = Column(Text)  # JSON string storing conversation context
-    last_updated = Column(DateTime, default=datetime.utcnow)
+    context_data = Column(Text)  # compact JSON (zlib+base64 when large) storing conversation context
+    last_updated = Column(DateTime, default=datetime.utcnow, index=True)  # retention prunes idle rows
+
+
+class DailySales(Base):
+    """Finished orders rolled up per day, network, product and final status
+
+    Maintained incrementally by the order repository as orders complete or
+    fail, so reports never have to aggregate the orders table.
+    """
+    __tablename__ = "daily_sales"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)  # date the order finished (orders.completed_at)
+    network = Column(String(20), nullable=False, default='')  # '' when the product has no network
+    product_id = Column(Integer, nullable=False, default=0)
+    status = Column(String(50), nullable=False)  # completed, failed
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(MoneyType, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Upsert target for the incremental updates, and range scans by day
+        Index('ix_daily_sales_day_network_product_status', 'day', 'network', 'product_id', 'status', unique=True),
+    )
+
+
+class ProcessedMessage(Base):
+    __tablename__ = "processed_messages"
+
+    # WhatsApp message id (wamid...) - the primary key makes the claim atomic across processes
+    message_id = Column(String(128), primary_key=True)
+    processed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class ReceiptFingerprint(Base):
+    """One row per distinct receipt image read, so repeats skip OCR and reuse can be spotted"""
+    __tablename__ = "receipt_fingerprints"
+
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), nullable=False)  # of the image bytes as downloaded
+    phash = Column(String(64), nullable=False)  # 256-bit perceptual hash, hex (layers/receipt_fingerprints.py)
+    sender = Column(String(20))
+    fields = Column(Text)  # JSON of what OCR read off it (amount, reference, date, bank)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Exact repeats: WHERE sha256 = ?
+        Index('ix_receipt_fingerprints_sha256', 'sha256', unique=True),
+    )
+
+
+def upsert_insert(table, bind):
+    """INSERT that supports on_conflict_do_update() for the engine's dialect (SQLite/PostgreSQL)"""
+    if bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def seed_catalog(db, data_plans=DEFAULT_DATA_PLANS):
+    """Insert one product per network/bundle into an empty catalog"""
+    products = [
+        Product(
+            name=f"{network} {size} Data Bundle",
+            description=f"{network} {size} data valid for {details['validity']}",
+            price=Money.from_naira(details['price']),
+            data_size=size,
+            validity_period=details['validity'],
+            network=network,
+            plan_code=f"{network}-{size}",
+            stock_quantity=100
+        )
+        for network, plans in data_plans.items()
+        for size, details in plans.items()
+    ]
+    db.add_all(products)
+    db.commit()
+    return len(products)
 
 
 def init_db():
     """Initialize database with sample data"""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
 
-    # Create sample products
+    # Create the data plan catalog
     db = SessionLocal()
     try:
-        # Check if products already exist
-        existing_products = db.query(Product).count()
+        # Check if catalog products already exist
+        existing_products = db.query(Product).filter(Product.network.isnot(None)).count()
         if existing_products == 0:
-            sample_products = [
-                Product(
-                    name="1GB Data Bundle",
-                    description="1GB data valid for 7 days",
-                    price=300.0,
-                    data_size="1GB",
-                    validity_period="7 days",
-                    stock_quantity=100
-                ),
-                Product(
-                    name="2GB Data Bundle",
-                    description="2GB data valid for 30 days",
-                    price=500.0,
-                    data_size="2GB",
-                    validity_period="30 days",
-                    stock_quantity=50
-                ),
-                Product(
-                    name="5GB Data Bundle",
-                    description="5GB data valid for 30 days",
-                    price=1000.0,
-                    data_size="5GB",
-                    validity_period="30 days",
-                    stock_quantity=25
-                )
-            ]
-            db.add_all(sample_products)
-            db.commit()
-            print("Sample products added to database.")
+            added = seed_catalog(db)
+            print(f"{added} catalog products added to database.")
         else:
             print("Products already exist in database.")
     except Exception as e:
@@ -0,0 +1,100 @@
+"""Sales reporting from the command line
+
+    python report.py summary [--start 2026-01-01] [--end 2026-02-01] [--network MTN]
+    python report.py export --format csv|jsonl [--start ...] [--end ...] [--status completed] [--output orders.csv]
+    python report.py rebuild [--start ...] [--end ...]
+
+Exports stream rows straight from a database cursor to the output, so they
+run in constant memory whatever the size of the orders table. rebuild leaves
+the rollups of months already moved to the order archive as they are.
+"""
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from config import config
+from models.database_models import SessionLocal
+from layers.reporting import EXPORT_FORMATS, default_range, rebuild_rollups, sales_summary, stream_orders
+from layers.retention import RetentionService
+from utils.money import Money
+
+
+def _date(value):
+    return date.fromisoformat(value)
+
+
+def summary(args):
+    start, end = default_range()
+    db = SessionLocal()
+    try:
+        rows = sales_summary(db, args.start or start, args.end or end, network=args.network, status=args.status)
+    finally:
+        db.close()
+
+    print(f"{'day':<12}{'network':<10}{'orders':>8}{'revenue':>16}")
+    for row in rows:
+        print(f"{row['day'].isoformat():<12}{row['network'] or '-':<10}{row['orders']:>8}{row['revenue'].format():>16}")
+    total = sum((row['revenue'] for row in rows), Money(0))
+    print(f"{'total':<22}{sum(row['orders'] for row in rows):>8}{total.format():>16}")
+
+
+def export(args):
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    db = SessionLocal()
+    try:
+        records = stream_orders(db, start=args.start, end=args.end, status=args.status)
+        count = EXPORT_FORMATS[args.format](records, out)
+    finally:
+        db.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ Exported {count} orders", file=sys.stderr)
+
+
+def rebuild(args):
+    # Months retention moved to the archive are no longer in the orders table; their rollups are kept
+    keep_before = RetentionService(archive_dir=config.ORDER_ARCHIVE_DIR or None).archived_until()
+    db = SessionLocal()
+    try:
+        rebuilt = rebuild_rollups(db, start=args.start, end=args.end, keep_before=keep_before)
+    finally:
+        db.close()
+    if keep_before is not None:
+        print(f"ℹ️  Orders before {keep_before.isoformat()} are archived; their rollups were kept", file=sys.stderr)
+    if rebuilt is None:
+        print("ℹ️  Nothing to rebuild in that range", file=sys.stderr)
+        return
+    start, end = rebuilt
+    print(f"✅ Daily sales rollups rebuilt from {start.isoformat() if start else 'the first order'} "
+          f"to {end.isoformat() if end else 'today'}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sales reports and order exports")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, handler, help_text in [
+        ('summary', summary, "daily totals per network from the rollups"),
+        ('export', export, "stream orders as CSV or JSON lines"),
+        ('rebuild', rebuild, "recompute the rollups from the orders table"),
+    ]:
+        command = commands.add_parser(name, help=help_text)
+        command.set_defaults(handler=handler)
+        command.add_argument('--start', type=_date, help="first day (YYYY-MM-DD)")
+        command.add_argument('--end', type=_date, help="day after the last one (YYYY-MM-DD)")
+
+    commands.choices['summary'].add_argument('--network')
+    commands.choices['summary'].add_argument('--status', default='completed')
+    commands.choices['export'].add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    commands.choices['export'].add_argument('--status')
+    commands.choices['export'].add_argument('--output', help="file to write (default: stdout)")
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 from models.database_models import init_db
-from config import config
+from config import config, load_environment
 
 
 def setup_logging():
@@ -57,6 +57,9 @@ def main():
     """Main application entry point"""
     print("🚀 Starting Automatic Data Seller Agent Setup...")
 
+    load_environment()
+    config.ensure_directories()
+
     # Setup logging
     setup_logging()
     logger = logging.getLogger(__name__)
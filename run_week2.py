@@ -7,8 +7,8 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 from models.database_models import init_db
-from config import config
-from app import app
+from config import config, load_environment
+import serve
 
 
 def setup_logging():
@@ -27,6 +27,9 @@ def main():
     """Main application entry point for Week 2"""
     print("🚀 Starting Week 2: WhatsApp Integration...")
 
+    load_environment()
+    config.ensure_directories()
+
     # Setup logging
     setup_logging()
     logger = logging.getLogger(__name__)
@@ -68,14 +71,9 @@ def main():
         print("   4. Test with real WhatsApp messages!")
         print("=" * 60)
 
-        # Start Flask server
-        print(f"\n🌐 Starting Flask server on {config.HOST}:{config.PORT}...")
-        app.run(
-            host=config.HOST,
-            port=config.PORT,
-            debug=config.DEBUG,
-            use_reloader=False
-        )
+        # Start the production server (gunicorn, or waitress where gunicorn is unavailable)
+        print(f"\n🌐 Starting server on {config.HOST}:{config.PORT}...")
+        serve.main([])
 
     except Exception as e:
         logger.error(f"Setup failed: {e}")
@@ -0,0 +1,187 @@
+"""Production entry point for the webhook server
+
+    python serve.py [--server auto|gunicorn|waitress] [--workers N] [--threads N] [--port N]
+
+gunicorn runs WEB_WORKERS pre-forked processes with WEB_THREADS request
+threads each; the app, catalog and compiled matchers are built once in the
+master and inherited by every worker. waitress (a single multi-threaded
+process) is used where gunicorn is unavailable, e.g. on Windows. With
+WEBHOOK_MODE=async the asyncio variant (asgi.py) runs under uvicorn instead.
+
+On SIGTERM new connections stop, in-flight requests get WEB_GRACEFUL_TIMEOUT
+seconds to finish, then queued webhooks and replies get WEB_DRAIN_TIMEOUT
+seconds to drain and buffered state is flushed before each process exits.
+"""
+import argparse
+import logging
+import signal
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from config import config, load_environment
+from app import create_app
+
+logger = logging.getLogger(__name__)
+
+SERVERS = ('gunicorn', 'waitress')
+ASYNC_SERVERS = ('uvicorn',)
+
+
+def setup_logging():
+    """Setup application logging"""
+    logging.basicConfig(
+        level=getattr(logging, config.LOG_LEVEL.upper(), logging.INFO),
+        format='%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(config.LOGS_DIR / 'data_seller_server.log'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+
+def pick_server(requested='auto', mode='threaded'):
+    """The server to run: the requested one, or gunicorn falling back to waitress (uvicorn for async)"""
+    if requested == 'auto':
+        candidates = ASYNC_SERVERS if mode == 'async' else SERVERS
+    else:
+        candidates = (requested,)
+    for name in candidates:
+        try:
+            __import__(name)
+            return name
+        except ImportError:
+            continue
+    raise RuntimeError(f"No server available (tried {', '.join(candidates)}); "
+                       f"pip install {'uvicorn' if mode == 'async' else 'gunicorn (Linux/macOS) or waitress'}")
+
+
+def build_app():
+    """Create the app and load shared read-only state before any fork"""
+    app = create_app()
+    app.extensions['data_seller'].preload()
+    return app
+
+
+def gunicorn_options(args):
+    """gunicorn settings plus the hooks that manage our background services around fork/exit"""
+    free_slots = set(range(args.workers))
+
+    def pre_fork(server, worker):
+        # Runs in the master: give each worker a stable slot (and so its own durable queue file)
+        worker.slot = min(free_slots)
+        free_slots.discard(worker.slot)
+
+    def child_exit(server, worker):
+        free_slots.add(worker.slot)
+
+    def post_fork(server, worker):
+        from models.database_models import get_engine
+        # Never reuse connections opened in the master
+        get_engine().dispose(close=False)
+
+    def post_worker_init(worker):
+        services = worker.wsgi.extensions['data_seller']
+        services.worker_slot = worker.slot
+        services.start()
+
+    def worker_exit(server, worker):
+        # Called in the worker once it has stopped accepting and finished in-flight requests
+        worker.wsgi.extensions['data_seller'].stop(timeout=config.WEB_DRAIN_TIMEOUT)
+
+    return {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': config.WEB_TIMEOUT,
+        # The master kills workers after this long, so it must cover the drain too
+        'graceful_timeout': config.WEB_GRACEFUL_TIMEOUT + config.WEB_DRAIN_TIMEOUT,
+        'accesslog': None,
+        'pre_fork': pre_fork,
+        'child_exit': child_exit,
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }
+
+
+def run_gunicorn(app, args):
+    from gunicorn.app.base import BaseApplication
+
+    class DataSellerServer(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    logger.info(f"🚀 gunicorn on {args.host}:{args.port} with {args.workers} workers x {args.threads} threads")
+    DataSellerServer(app, gunicorn_options(args)).run()
+
+
+def _exit_on_sigterm(signum, frame):
+    # waitress stops its loop on SystemExit and lets running requests finish
+    raise SystemExit(0)
+
+
+def run_waitress(app, args):
+    from waitress import create_server
+
+    services = app.extensions['data_seller']
+    services.start()
+    server = create_server(app, host=args.host, port=args.port, threads=args.threads)
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    logger.info(f"🚀 waitress on {args.host}:{args.port} with {args.threads} threads")
+    try:
+        server.run()
+    finally:
+        server.close()
+        services.stop(timeout=config.WEB_DRAIN_TIMEOUT)
+
+
+def run_uvicorn(args):
+    import uvicorn
+
+    logger.info(f"🚀 uvicorn (asyncio) on {args.host}:{args.port} with {args.workers} workers")
+    # Lifespan shutdown drains accepted webhooks and replies once open requests finish
+    uvicorn.run('asgi:application', host=args.host, port=args.port, workers=args.workers, lifespan='on',
+                timeout_graceful_shutdown=config.WEB_GRACEFUL_TIMEOUT, access_log=False,
+                log_level=config.LOG_LEVEL.lower())
+
+
+def main(argv=None):
+    load_environment()
+    config.ensure_directories()
+
+    parser = argparse.ArgumentParser(description="Run the webhook server")
+    parser.add_argument('--server', choices=('auto',) + SERVERS + ASYNC_SERVERS, default=config.WEB_SERVER)
+    parser.add_argument('--mode', choices=('threaded', 'async'), default=config.WEBHOOK_MODE)
+    parser.add_argument('--host', default=config.HOST)
+    parser.add_argument('--port', type=int, default=config.PORT)
+    parser.add_argument('--workers', type=int, default=config.WEB_WORKERS)
+    parser.add_argument('--threads', type=int, default=config.WEB_THREADS)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    server = pick_server(args.server, args.mode)
+    if server == 'uvicorn':
+        run_uvicorn(args)
+        return
+    app = build_app()
+    if server == 'gunicorn':
+        run_gunicorn(app, args)
+    else:
+        run_waitress(app, args)
+
+
+if __name__ == "__main__":
+    main()
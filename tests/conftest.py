@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Keep the test run away from the real storage/databases file
+_test_db_dir = tempfile.mkdtemp(prefix='data_seller_tests_')
+os.environ['DATABASE_URL'] = f"sqlite:///{_test_db_dir}/test.db"
+
+from config import config
+from tests.graph_api_stub import GraphAPIStub
+
+
+@pytest.fixture
+def db_session_factory(tmp_path):
+    """Fresh SQLite database with every table created and the catalog seeded"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from models.database_models import Base, seed_catalog
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = session_factory()
+    seed_catalog(db)
+    db.close()
+
+    yield session_factory
+    engine.dispose()
+
+
+@pytest.fixture
+def catalog(db_session_factory):
+    from layers.catalog_service import CatalogService
+    return CatalogService(session_factory=db_session_factory)
+
+
+@pytest.fixture
+def graph_api_stub(monkeypatch):
+    """Run a local Graph API stand-in and point the WhatsApp settings at it"""
+    with GraphAPIStub() as stub:
+        monkeypatch.setattr(config, 'WHATSAPP_API_URL', stub.url)
+        monkeypatch.setattr(config, 'WHATSAPP_TOKEN', 'test-token')
+        monkeypatch.setattr(config, 'WHATSAPP_PHONE_NUMBER_ID', '1234567890')
+        monkeypatch.setattr(config, 'WHATSAPP_RETRY_BACKOFF', 0.0)
+        yield stub
@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    # Room for hundreds of clients connecting at once (the default backlog is 5)
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class GraphAPIStub:
+    """Local stand-in for the WhatsApp Graph API used by tests and benchmarks
+
+    Speaks HTTP/1.1 with keep-alive so connection reuse behaves like the real
+    API. Status codes queued in `fail_next` are returned before normal replies.
+    Media ids put in `media` (id -> bytes) can be looked up and downloaded.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = []
+        self.fail_next = []
+        self.media = {}
+        self.connections = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', 0), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v17.0"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+
+                with stub._lock:
+                    stub.requests.append({'path': self.path, 'headers': dict(self.headers), 'json': body})
+                    status = stub.fail_next.pop(0) if stub.fail_next else 200
+                    stub.in_flight += 1
+                    stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub._lock:
+                    stub.in_flight -= 1
+
+                if status == 200:
+                    reply = {'messaging_product': 'whatsapp',
+                             'messages': [{'id': f"wamid.stub{len(stub.requests)}"}]}
+                else:
+                    reply = {'error': {'code': status, 'message': 'stubbed failure'}}
+
+                data = json.dumps(reply).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                # /v17.0/<media id> returns a download URL, /v17.0/media/<media id> the bytes
+                prefix, _, media_id = self.path.rpartition('/')
+                with stub._lock:
+                    stub.requests.append({'path': self.path, 'headers': dict(self.headers), 'json': {}})
+                    content = stub.media.get(media_id)
+
+                if content is None:
+                    status, content_type, data = 404, 'application/json', b'{"error": {"code": 404}}'
+                elif prefix.endswith('/media'):
+                    status, content_type, data = 200, 'image/jpeg', content
+                else:
+                    status, content_type = 200, 'application/json'
+                    data = json.dumps({'id': media_id, 'url': f"{stub.url}/media/{media_id}"}).encode()
+
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
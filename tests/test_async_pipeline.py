@@ -0,0 +1,154 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from asgi import WebhookApplication
+from config import config
+from layers.async_whatsapp_handler import AsyncOutboundSender, AsyncWebhookProcessor, AsyncWhatsAppHandler
+from tests.graph_api_stub import GraphAPIStub
+
+
+def _text(sender, message_id, body):
+    return {'from': sender, 'id': message_id, 'type': 'text', 'text': {'body': body}}
+
+
+def _payload(*messages):
+    return {'object': 'whatsapp_business_account', 'entry': [{'changes': [{'value': {'messages': list(messages)}}]}]}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with GraphAPIStub() as stub:
+        monkeypatch.setattr(config, 'WHATSAPP_API_URL', stub.url)
+        monkeypatch.setattr(config, 'WHATSAPP_TOKEN', 'test-token')
+        monkeypatch.setattr(config, 'WHATSAPP_PHONE_NUMBER_ID', '1234567890')
+        monkeypatch.setattr(config, 'OUTBOUND_COALESCE_WINDOW', 0.0)
+        yield stub
+
+
+def test_async_handler_replies_through_the_graph_api(stub):
+    async def scenario():
+        handler = AsyncWhatsAppHandler()
+        result = await handler.process_webhook(_payload(
+            _text('2348011111111', 'a1', 'hi'), _text('2348022222222', 'b1', 'hello'),
+            _text('2348011111111', 'a1', 'hi')))  # redelivered
+        assert await handler.close(timeout=5)
+        return result, handler.dispatcher.metrics()
+
+    result, metrics = asyncio.run(scenario())
+
+    assert result['message_count'] == 3
+    assert [r.get('duplicate', False) for r in result['results']] == [False, False, True]
+    assert sorted(request['json']['to'] for request in stub.requests) == ['2348011111111', '2348022222222']
+    assert stub.requests[0]['headers']['Authorization'] == 'Bearer test-token'
+    assert metrics['sent_total'] == 2
+
+
+def test_async_read_timeouts_are_not_retried(stub, monkeypatch):
+    monkeypatch.setattr(config, 'WHATSAPP_READ_TIMEOUT', 0.2)
+    monkeypatch.setattr(config, 'WHATSAPP_RETRY_BACKOFF', 0.0)
+    stub.latency = 0.5
+
+    async def scenario():
+        handler = AsyncWhatsAppHandler()
+        result = await handler.send_text_message('2348011111111', 'hello')
+        await handler.close(timeout=5)
+        return result
+
+    assert asyncio.run(scenario()) is None
+    assert len(stub.requests) == 1
+
+def test_async_sender_coalesces_and_keeps_recipient_order():
+    sent = []
+
+    async def send(to, text):
+        await asyncio.sleep(0.01)
+        sent.append((to, text))
+        return {'messages': [{'id': 'x'}]}
+
+    async def scenario():
+        sender = AsyncOutboundSender(send, coalesce_window=0.05, recipient_rate=1000, recipient_burst=1000)
+        sender.submit('234801', 'one')
+        sender.submit('234801', 'two')
+        await asyncio.sleep(0.1)
+        sender.submit('234801', 'three')
+        sender.submit('234802', 'other')
+        assert await sender.drain(timeout=5)
+        return sender.metrics()
+
+    metrics = asyncio.run(scenario())
+
+    assert [text for to, text in sent if to == '234801'] == ['one\n\ntwo', 'three']
+    assert metrics['coalesced_total'] == 1 and metrics['sent_total'] == 3
+
+
+def test_processor_rejects_past_capacity_and_drains():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handle(payload):
+            await release.wait()
+            return {'processed': True}
+
+        processor = AsyncWebhookProcessor(handle, max_in_flight=2)
+        accepted = [processor.enqueue({'entry': []}) for _ in range(3)]
+        release.set()
+        assert await processor.drain(timeout=5)
+        return accepted, processor.metrics()
+
+    accepted, metrics = asyncio.run(scenario())
+
+    assert accepted == [True, True, False]
+    assert metrics['processed_total'] == 2 and metrics['rejected_total'] == 1 and metrics['peak_in_flight'] == 2
+
+
+class FakeServices:
+    def __init__(self, capacity):
+        self.accepted = []
+        self.capacity = capacity
+        self.webhook_processor = self
+
+    def enqueue(self, payload):
+        if len(self.accepted) >= self.capacity:
+            return False
+        self.accepted.append(payload)
+        return True
+
+    def health(self):
+        return {'status': 'healthy', 'accepted': len(self.accepted)}
+
+
+def call(application, method, path, body=b'', query=b''):
+    """Drive the ASGI app for one request; returns (status, body)"""
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query}
+    asyncio.run(application(scope, receive, send))
+    return sent[0]['status'], sent[1]['body']
+
+
+def test_asgi_routes_ack_and_push_back_when_full(monkeypatch):
+    monkeypatch.setattr(config, 'VERIFY_TOKEN', 'secret')
+    services = FakeServices(capacity=1)
+    application = WebhookApplication(services)
+    body = json.dumps(_payload(_text('2348011111111', 'a1', 'hi'))).encode()
+
+    assert call(application, 'POST', '/webhook', body) == (200, b'OK')
+    assert call(application, 'POST', '/webhook', body) == (503, b'Busy')
+    assert call(application, 'POST', '/webhook', b'not json') == (200, b'OK')
+    assert call(application, 'GET', '/webhook',
+                query=b'hub.mode=subscribe&hub.verify_token=secret&hub.challenge=42') == (200, b'42')
+    assert call(application, 'GET', '/webhook', query=b'hub.mode=subscribe&hub.verify_token=bad')[0] == 403
+    assert json.loads(call(application, 'GET', '/health')[1]) == {'status': 'healthy', 'accepted': 1}
+    assert len(services.accepted) == 1
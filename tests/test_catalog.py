@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.basic_handler import BasicMessageHandler
+from layers.catalog_service import CatalogService
+from models.database_models import Product
+from utils.money import Money
+
+
+def test_pricing_reply_is_built_from_the_plan_catalog(catalog):
+    handler = BasicMessageHandler(catalog)
+
+    assert handler._get_pricing_info() == """💰 *QUICK PRICE LIST*
+
+*MTN:*
+1GB - ₦300 | 2GB - ₦500 | 5GB - ₦1000 | 10GB - ₦2000
+
+*GLO:*
+1GB - ₦280 | 2.5GB - ₦500 | 5GB - ₦950 | 10GB - ₦1900
+
+*AIRTEL:*
+1GB - ₦320 | 2GB - ₦550 | 5GB - ₦1100 | 10GB - ₦2100
+
+Type the network name (MTN, GLO, AIRTEL) for full details!"""
+
+
+def test_replies_are_cached_until_catalog_changes(catalog):
+    handler = BasicMessageHandler(catalog)
+
+    first = handler.catalog_renderer.current()
+    assert handler.catalog_renderer.current() is first
+
+    handler.update_plan('MTN', '2GB', 450)
+    updated = handler.catalog_renderer.current()
+    assert updated is not first
+    assert "2GB - ₦450" in handler._get_pricing_info()
+    assert "• *2GB* - ₦450 (30 days)" in handler._get_network_plans('MTN')
+
+
+def test_new_plan_sizes_are_parsed_after_update(catalog):
+    handler = BasicMessageHandler(catalog)
+
+    handler.update_plan('MTN', '20GB', 3500)
+    assert handler.extract_order_details("buy mtn 20gb for 08012345678")['size'] == '20GB'
+
+
+def test_lookup_serves_product_ids_from_memory(catalog, db_session_factory):
+    entry = catalog.lookup('GLO', '2.5GB')
+    assert entry.price == Money.from_naira(500)
+    assert entry.plan_code == 'GLO-2.5GB'
+
+    db = db_session_factory()
+    assert db.get(Product, entry.product_id).data_size == '2.5GB'
+    db.close()
+
+
+def test_refresh_only_reloads_when_products_change(catalog, db_session_factory):
+    version = catalog.version
+    assert not catalog.refresh()
+    assert catalog.version == version
+
+    db = db_session_factory()
+    product = db.query(Product).filter_by(network='AIRTEL', data_size='1GB').one()
+    product.price = Money.from_naira(350)
+    db.commit()
+    db.close()
+
+    assert catalog.refresh()
+    assert catalog.lookup('AIRTEL', '1GB').price == Money(35000)
+
+
+def test_empty_or_missing_table_falls_back_to_default_plans(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    catalog = CatalogService(session_factory=sessionmaker(bind=engine))
+
+    assert catalog.lookup('MTN', '1GB').price == Money.from_naira(300)
+    assert catalog.lookup('MTN', '1GB').product_id is None
@@ -13,7 +13,7 @@ try:
 
     # Show the products
     for product in products:
-        print(f"   - {product.name}: ₦{product.price} ({product.data_size})")
+        print(f"   - {product.name}: {product.price} ({product.data_size})")
 
     db.close()
     print("🎉 Database setup completed successfully!")
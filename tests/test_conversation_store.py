@@ -0,0 +1,106 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.basic_handler import BasicMessageHandler
+from layers.conversation_store import ConversationStore, serialize_context, deserialize_context
+from models.database_models import ConversationState
+
+
+def test_updates_are_coalesced_into_one_row_per_phone(db_session_factory):
+    store = ConversationStore(session_factory=db_session_factory)
+
+    for step in range(10):
+        store.update('2348011111111', state='order_creation', step=step)
+    store.update('2348022222222', state='greeting')
+
+    assert store.flush() == 2
+    assert store.flush() == 0
+
+    db = db_session_factory()
+    rows = {row.phone_number: row for row in db.query(ConversationState).all()}
+    db.close()
+    assert len(rows) == 2
+    assert deserialize_context(rows['2348011111111'].context_data) == {'step': 9}
+
+
+def test_repeat_flushes_upsert_the_same_row(db_session_factory):
+    store = ConversationStore(session_factory=db_session_factory)
+
+    store.update('2348011111111', state='greeting')
+    store.flush()
+    store.update('2348011111111', state='payment_waiting', amount=500)
+    store.flush()
+
+    db = db_session_factory()
+    rows = db.query(ConversationState).all()
+    db.close()
+    assert [(row.state, deserialize_context(row.context_data)) for row in rows] == [('payment_waiting', {'amount': 500})]
+
+
+def test_state_is_read_from_memory_after_first_load(db_session_factory):
+    first = ConversationStore(session_factory=db_session_factory)
+    first.update('2348011111111', state='product_inquiry', network='GLO')
+    first.flush()
+
+    second = ConversationStore(session_factory=db_session_factory)
+    assert second.get('2348011111111').context == {'network': 'GLO'}
+    assert second.get('2348011111111').state == 'product_inquiry'
+    assert second.metrics()['misses'] == 1
+    assert second.metrics()['hits'] == 1
+
+
+def test_evicted_sessions_keep_unflushed_changes(db_session_factory):
+    store = ConversationStore(session_factory=db_session_factory, max_sessions=1)
+
+    store.update('2348011111111', state='order_creation')
+    store.update('2348022222222', state='greeting')  # evicts the first session from memory
+
+    assert store.get('2348011111111').state == 'order_creation'
+    assert store.flush() == 2
+
+
+def test_concurrent_first_loads_share_one_session(db_session_factory, monkeypatch):
+    store = ConversationStore(session_factory=db_session_factory)
+    load = store._load
+    both_loaded = threading.Barrier(2)
+
+    def slow_load(phone_number):
+        session = load(phone_number)
+        both_loaded.wait(timeout=5)
+        return session
+
+    monkeypatch.setattr(store, '_load', slow_load)
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(store.update('2348011111111', step=1)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sessions[0] is sessions[1]
+    assert store.get('2348011111111') is sessions[0]
+
+
+def test_large_context_is_compressed():
+    context = {'history': ['buy mtn 2gb for 08012345678'] * 50}
+
+    data = serialize_context(context)
+    assert data.startswith('z:')
+    assert len(data) < len(str(context))
+    assert deserialize_context(data) == context
+    assert serialize_context({'network': 'MTN'}) == '{"network":"MTN"}'
+
+
+def test_bot_remembers_network_between_messages(catalog, db_session_factory):
+    store = ConversationStore(session_factory=db_session_factory)
+    handler = BasicMessageHandler(catalog, conversations=store)
+
+    handler.handle_message("airtel", "2348011111111")
+    details = handler.extract_order_details("2GB for 08012345678", "2348011111111")
+
+    assert details['network'] == 'AIRTEL'
+    assert store.get('2348011111111').state == 'network'
@@ -0,0 +1,93 @@
+import sys
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import event
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.customer_activity import CustomerActivity
+from models.database_models import Customer
+
+
+def customers(session_factory):
+    db = session_factory()
+    rows = {row.phone_number: row for row in db.query(Customer).all()}
+    db.close()
+    return rows
+
+
+def test_touches_are_batched_into_one_statement(db_session_factory):
+    activity = CustomerActivity(session_factory=db_session_factory)
+    statements = []
+    engine = db_session_factory.kw['bind']
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+
+    for _ in range(5):
+        for n in range(20):
+            activity.touch(f"080{n:08d}")
+    assert statements == []
+
+    assert activity.flush() == 20
+    event.remove(engine, 'before_cursor_execute', listener)
+
+    inserts = [sql for sql in statements if sql.startswith('INSERT')]
+    assert len(inserts) == 1 and 'ON CONFLICT' in inserts[0]
+    assert not any(sql.startswith('SELECT') for sql in statements)
+    assert len(customers(db_session_factory)) == 20
+
+
+def test_last_interaction_keeps_the_latest_touch(db_session_factory):
+    activity = CustomerActivity(session_factory=db_session_factory)
+    later = datetime(2026, 5, 1, 12, 0)
+
+    activity.touch('08011111111', when=later)
+    activity.touch('08011111111', when=later - timedelta(minutes=5))
+    activity.flush()
+
+    assert customers(db_session_factory)['08011111111'].last_interaction == later
+
+
+def test_an_older_flush_does_not_move_last_interaction_back(db_session_factory):
+    later = datetime(2026, 5, 1, 12, 0)
+    ahead = CustomerActivity(session_factory=db_session_factory)
+    behind = CustomerActivity(session_factory=db_session_factory)
+
+    ahead.touch('08011111111', when=later)
+    behind.touch('08011111111', when=later - timedelta(minutes=5))
+    ahead.flush()
+    behind.flush()
+
+    assert customers(db_session_factory)['08011111111'].last_interaction == later
+
+
+def test_purchase_increments_add_up_across_flushes_and_instances(db_session_factory):
+    workers = [CustomerActivity(session_factory=db_session_factory) for _ in range(4)]
+
+    def buy(activity):
+        for _ in range(25):
+            activity.record_purchase('08011111111')
+            activity.flush()
+
+    threads = [threading.Thread(target=buy, args=(activity,)) for activity in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    customer = customers(db_session_factory)['08011111111']
+    assert customer.total_purchases == 100
+    assert customer.is_active is True
+
+
+def test_customer_id_creates_once(db_session_factory):
+    activity = CustomerActivity(session_factory=db_session_factory)
+
+    first = activity.customer_id('08011111111')
+    activity.record_purchase('08011111111', count=2)
+    activity.flush()
+
+    assert activity.customer_id('08011111111') == first
+    assert customers(db_session_factory)['08011111111'].total_purchases == 2
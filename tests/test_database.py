@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import config
+from models.database_models import create_db_engine
+
+
+def test_sqlite_engine_uses_wal_profile(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+
+    with engine.connect() as conn:
+        pragma = lambda name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == config.SQLITE_BUSY_TIMEOUT_MS
+        assert pragma('cache_size') == -config.SQLITE_CACHE_SIZE_KB
+
+    assert engine.pool.size() == config.DB_POOL_SIZE
+    engine.dispose()
+
+
+def test_in_memory_sqlite_skips_file_pragmas():
+    engine = create_db_engine("sqlite://")
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == 'memory'
+
+
+def test_migrations_match_models(tmp_path):
+    from alembic import command
+    from alembic.autogenerate import compare_metadata
+    from alembic.config import Config
+    from alembic.migration import MigrationContext
+    from models.database_models import Base
+
+    root = Path(__file__).parent.parent
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    alembic_config = Config(str(root / 'alembic.ini'))
+    alembic_config.set_main_option('script_location', str(root / 'migrations'))
+    alembic_config.set_main_option('sqlalchemy.url', url)
+
+    command.upgrade(alembic_config, 'head')
+
+    engine = create_db_engine(url)
+    with engine.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+    engine.dispose()
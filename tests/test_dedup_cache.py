@@ -0,0 +1,54 @@
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.database_models import Base
+from utils.dedup_cache import MessageDeduplicator
+
+
+def test_second_sighting_is_duplicate():
+    dedup = MessageDeduplicator()
+
+    assert not dedup.is_duplicate('wamid.1')
+    assert dedup.is_duplicate('wamid.1')
+    assert dedup.metrics()['hits'] == 1
+    assert dedup.metrics()['misses'] == 1
+
+
+def test_entries_expire_after_ttl():
+    dedup = MessageDeduplicator(ttl=0.01)
+
+    assert not dedup.is_duplicate('wamid.1')
+    time.sleep(0.02)
+    assert not dedup.is_duplicate('wamid.1')
+
+
+def test_least_recently_used_entry_is_evicted():
+    dedup = MessageDeduplicator(max_entries=2)
+
+    dedup.is_duplicate('wamid.1')
+    dedup.is_duplicate('wamid.2')
+    dedup.is_duplicate('wamid.1')  # refresh 1, so 2 is now least recently used
+    dedup.is_duplicate('wamid.3')
+
+    assert dedup.metrics()['evictions'] == 1
+    assert dedup.is_duplicate('wamid.1')
+    assert not dedup.is_duplicate('wamid.2')
+
+
+def test_persistent_store_is_shared_between_instances(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dedup.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+
+    first = MessageDeduplicator(persistent=True, session_factory=session_factory)
+    second = MessageDeduplicator(persistent=True, session_factory=session_factory)
+
+    assert not first.is_duplicate('wamid.shared')
+    assert second.is_duplicate('wamid.shared')
+    assert second.metrics()['persistent_hits'] == 1
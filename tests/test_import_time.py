@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Milliseconds allowed for `import app` + create_app(); override on slow CI boxes
+BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', 600))
+
+# None of these may be pulled in before the first request needs them
+HEAVY_MODULES = ('sqlalchemy', 'cv2', 'numpy', 'PIL', 'pytesseract', 'selenium', 'requests')
+
+
+def import_profile():
+    """Run `python -X importtime` on the app factory; returns {module: cumulative µs} and startup ms"""
+    code = ("import time; started = time.perf_counter(); import app; app.create_app(); "
+            "print((time.perf_counter() - started) * 1000)")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules, float(result.stdout.strip().splitlines()[-1])
+
+
+def test_create_app_starts_within_budget():
+    modules, startup_ms = import_profile()
+
+    assert modules['app'] / 1000 < BUDGET_MS
+    assert startup_ms < BUDGET_MS
+
+
+def test_heavy_dependencies_are_not_imported_at_startup():
+    modules, _ = import_profile()
+
+    loaded = [name for name in modules if name.split('.')[0] in HEAVY_MODULES]
+    assert loaded == []
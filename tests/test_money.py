@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.general_utils import format_currency
+from utils.money import Money
+
+
+@pytest.mark.parametrize('value, kobo', [
+    (500, 50000),
+    (0.1, 10),
+    (1100.01, 110001),
+    ('1,500.50', 150050),
+    ('₦2,000', 200000),
+    ('NGN 300', 30000),
+    (2.005, 201),  # half-up to the nearest kobo
+])
+def test_from_naira(value, kobo):
+    assert Money.from_naira(value) == Money(kobo)
+
+
+@pytest.mark.parametrize('value', ['', 'abc', float('nan'), None])
+def test_rejects_non_amounts(value):
+    with pytest.raises(ValueError):
+        Money.from_naira(value)
+
+
+def test_kobo_must_be_an_integer():
+    with pytest.raises(TypeError):
+        Money(5.0)
+
+
+def test_arithmetic_is_exact():
+    prices = [Money.from_naira(0.1)] * 10
+
+    assert sum(prices) == Money.from_naira(1)
+    assert Money.from_naira(500) * 3 - Money(50) == Money(149950)
+    assert Money(100) < Money(101) and max(prices) == Money(10)
+    assert Money(100) != 100
+
+
+def test_display():
+    assert str(Money.from_naira(1000)) == '₦1000'
+    assert str(Money.from_naira('2.5')) == '₦2.50'
+    assert str(-Money(5)) == '-₦0.05'
+    assert Money.from_naira(2500.75).format() == format_currency(2500.75) == '₦2,500.75'
+
+
+def test_money_columns_store_kobo(db_session_factory):
+    from models.database_models import Product
+
+    db = db_session_factory()
+    product = db.query(Product).filter_by(network='GLO', data_size='2.5GB').one()
+    stored = db.connection().exec_driver_sql("SELECT price FROM products WHERE id = ?", (product.id,)).scalar()
+    db.close()
+
+    assert product.price == Money.from_naira(500)
+    assert stored == 50000
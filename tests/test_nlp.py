@@ -0,0 +1,115 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.basic_handler import BasicMessageHandler
+from layers.nlp_engine import IntentEngine
+
+
+def test_intents_follow_handler_priority():
+    engine = IntentEngine()
+
+    assert engine.classify("Hello there") == ('greeting', {})
+    assert engine.classify("how much for glo data") == ('network', {'network': 'GLO'})
+    assert engine.classify("show me your bundles") == ('catalog', {})
+    assert engine.classify("what are your prices?") == ('pricing', {})
+    assert engine.classify("I want to purchase") == ('purchase', {})
+    assert engine.classify("thanks a lot") == ('thanks', {})
+    assert engine.classify("???") == ('help', {})
+
+
+def test_short_keywords_do_not_fire_inside_other_words():
+    engine = IntentEngine()
+
+    assert engine.classify("which one should I ship this to")[0] == 'help'
+    assert engine.classify("Airtel")[1] == {'network': 'AIRTEL'}
+    assert engine.classify("buy mtn2gb")[1] == {'network': 'MTN'}
+
+
+def test_handler_replies_with_network_plans():
+    handler = BasicMessageHandler()
+
+    reply = handler.handle_message("I want to buy airtel 5gb for 08123456789", "+2348000000000")
+    assert "AIRTEL DATA PLANS" in reply
+
+
+def _parser():
+    from layers.nlp_engine import OrderParser
+    return OrderParser(BasicMessageHandler().data_plans)
+
+
+def test_order_details_are_extracted_in_one_pass():
+    handler = BasicMessageHandler()
+
+    assert handler.extract_order_details("buy mtn 2gb for 08012345678") == {
+        'network': 'MTN', 'size': '2GB', 'quantity': 1, 'phone_number': '08012345678'
+    }
+    assert handler.extract_order_details("Buy GLO 2.5GB x3 for +2348051234567") == {
+        'network': 'GLO', 'size': '2.5GB', 'quantity': 3, 'phone_number': '08051234567'
+    }
+
+
+def test_longer_sizes_win_over_their_prefixes():
+    parser = _parser()
+
+    assert parser.parse("glo 2.5GB")['size'] == '2.5GB'
+    assert parser.parse("mtn 10GB")['size'] == '10GB'
+    assert parser.parse("mtn 12GB")['size'] is None
+
+
+def test_phone_number_formats_are_normalized():
+    from utils.general_utils import extract_phone_number
+
+    for text in ["08012345678", "+2348012345678", "2348012345678", "8012345678"]:
+        assert extract_phone_number(f"recharge {text} now") == '08012345678'
+    assert extract_phone_number("ref 123456789012345") is None
+
+
+def test_generated_orders_round_trip():
+    """Property check: any well-formed order in any spelling parses back to its parts"""
+    import random
+
+    rng = random.Random(2024)
+    parser = _parser()
+    plans = BasicMessageHandler().data_plans
+    fillers = ["buy", "pls", "abeg send", "I want", "for", "to", "my number is", "", "asap", "o"]
+
+    for _ in range(2000):
+        network = rng.choice(list(plans))
+        size = rng.choice(list(plans[network]))
+        quantity = rng.randint(1, 5)
+        subscriber = f"{rng.choice('789')}{rng.choice('01')}{rng.randint(0, 99999999):08d}"
+        phone_text = rng.choice(['0', '+234', '234', '']) + subscriber
+
+        network_text = rng.choice([network, network.lower(), network.title()])
+        amount = size[:-2]
+        size_text = amount + rng.choice(['', ' ']) + rng.choice(['GB', 'gb', 'Gb', 'gig'])
+        parts = [network_text, size_text, phone_text]
+        if quantity > 1:
+            parts.append(rng.choice([f"x{quantity}", f"{quantity} units", f"{quantity}x"]))
+        rng.shuffle(parts)
+        words = []
+        for part in parts:
+            words.extend([rng.choice(fillers), part])
+
+        message = " ".join(words)
+        assert parser.parse(message) == {
+            'network': network, 'size': size, 'quantity': quantity, 'phone_number': '0' + subscriber
+        }, message
+
+
+def test_parser_survives_random_text():
+    import random
+    import string
+
+    rng = random.Random(7)
+    parser = _parser()
+    alphabet = string.ascii_letters + string.digits + " +.x₦!?\n"
+
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+        result = parser.parse(text)
+        assert result['quantity'] >= 1
+        assert result['phone_number'] is None or (len(result['phone_number']) == 11
+                                                  and result['phone_number'].startswith('0'))
@@ -0,0 +1,143 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.order_repository import OrderRepository
+from models.database_models import Order, Product
+from utils.money import Money
+
+
+def new_order(n, **fields):
+    return {'customer_id': 1, 'network': 'MTN', 'size': '2GB',
+            'phone_to_recharge': '08012345678', 'transaction_reference': f"REF{n:06d}", **fields}
+
+
+@pytest.fixture
+def repository(db_session_factory, catalog):
+    return OrderRepository(session_factory=db_session_factory, catalog=catalog)
+
+
+def statuses(session_factory):
+    db = session_factory()
+    rows = {order.id: order.status for order in db.query(Order).all()}
+    db.close()
+    return rows
+
+
+def test_bulk_insert_returns_ids_in_order(repository, db_session_factory):
+    ids = repository.create_orders([new_order(n) for n in range(1200)])
+
+    assert len(ids) == 1200 and ids == sorted(ids)
+    assert repository.get(ids[700]).transaction_reference == 'REF000700'
+    assert set(statuses(db_session_factory).values()) == {'pending'}
+
+
+def test_lifecycle_with_completed_at(repository):
+    order_id = repository.create_order(**new_order(1))
+
+    assert repository.mark_paid([order_id]) == [order_id]
+    assert repository.mark_processing([order_id]) == [order_id]
+    assert repository.get(order_id).completed_at is None
+    assert repository.mark_completed([order_id]) == [order_id]
+
+    order = repository.get(order_id)
+    assert order.status == 'completed' and order.completed_at is not None
+
+
+def test_guard_skips_orders_in_the_wrong_status(repository, db_session_factory):
+    ids = repository.create_orders([new_order(n) for n in range(4)])
+    repository.mark_paid(ids[:2])
+
+    # Only the two paid orders can start processing; completing straight from pending is refused
+    assert repository.mark_processing(ids) == ids[:2]
+    assert repository.mark_completed(ids[2:]) == []
+    # Terminal states never move again
+    assert repository.mark_failed(ids[2:]) == ids[2:]
+    assert repository.mark_paid(ids[2:]) == []
+
+    assert statuses(db_session_factory) == dict(zip(ids, ['processing', 'processing', 'failed', 'failed']))
+
+
+def test_racing_transitions_only_win_once(repository):
+    order_id = repository.create_order(**new_order(1))
+
+    assert repository.mark_paid([order_id]) == [order_id]
+    assert repository.mark_paid([order_id]) == []
+
+
+def test_expected_narrows_sources(repository):
+    ids = repository.create_orders([new_order(n) for n in range(2)])
+    repository.mark_paid(ids[:1])
+
+    assert repository.transition(ids, 'failed', expected='pending') == ids[1:]
+
+
+def test_unknown_status_is_rejected(repository):
+    with pytest.raises(ValueError):
+        repository.transition([1], 'shipped')
+
+
+def test_pending_before_and_reference_lookup(repository):
+    old = datetime.utcnow() - timedelta(hours=2)
+    ids = repository.create_orders([new_order(1, created_at=old), new_order(2)])
+
+    assert [order.id for order in repository.pending_before(datetime.utcnow() - timedelta(hours=1))] == ids[:1]
+    assert repository.find_by_reference('REF000002').id == ids[1]
+    assert repository.find_by_reference('missing') is None
+
+
+def test_orders_are_priced_from_the_catalog(repository, catalog):
+    catalog.upsert_plan('GLO', '3GB', '1100.01')
+    ids = repository.create_orders([new_order(1, network='AIRTEL', size='5GB'),
+                                    new_order(2, network='GLO', size='3GB'),
+                                    new_order(3, quantity=2)])
+
+    order = repository.get(ids[2])
+    assert order.product_id == catalog.lookup('MTN', '2GB').product_id
+    assert order.amount_paid == Money.from_naira(1000)  # 2 x 500
+    assert repository.get(ids[1]).amount_paid == Money(110001)
+
+
+def test_unknown_plan_is_rejected(repository, db_session_factory):
+    with pytest.raises(ValueError):
+        repository.create_orders([new_order(1), new_order(2, network='MTN', size='3GB')])
+
+    assert statuses(db_session_factory) == {}
+
+
+@pytest.mark.parametrize('quantity', [None, 0, -2, 1.5])
+def test_bad_quantity_is_rejected(repository, db_session_factory, quantity):
+    with pytest.raises(ValueError, match='Quantity'):
+        repository.create_orders([new_order(1), new_order(2, quantity=quantity)])
+
+    assert statuses(db_session_factory) == {}
+
+
+def test_plan_without_a_product_row_is_rejected(db_session_factory):
+    from layers.catalog_service import CatalogService
+
+    # No products table rows: the catalog serves its built-in plans, which have no product_id
+    db = db_session_factory()
+    db.query(Product).delete()
+    db.commit()
+    db.close()
+    repository = OrderRepository(session_factory=db_session_factory,
+                                 catalog=CatalogService(session_factory=db_session_factory))
+
+    with pytest.raises(ValueError, match='no product'):
+        repository.create_order(network='MTN', size='1GB', customer_id=1)
+    assert statuses(db_session_factory) == {}
+
+def test_amounts_are_matched_exactly_in_kobo(repository, catalog):
+    catalog.upsert_plan('GLO', '3GB', '1100.01')
+    ids = repository.create_orders([new_order(1, network='AIRTEL', size='5GB'),
+                                    new_order(2, network='GLO', size='3GB'),
+                                    new_order(3, network='AIRTEL', size='2GB')])
+
+    assert [order.id for order in repository.pending_with_amount('₦1,100')] == ids[:1]
+    repository.mark_paid(ids[:1])
+    assert repository.pending_with_amount(Money(110000)) == []
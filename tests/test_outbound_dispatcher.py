@@ -0,0 +1,99 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.outbound_dispatcher import OutboundDispatcher, TokenBucket, PRIORITY_HIGH, PRIORITY_LOW
+
+
+class RecordingSender:
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def __call__(self, to, message):
+        with self._lock:
+            self.sent.append((to, message))
+        return {'messages': [{'id': 'x'}]}
+
+
+def test_texts_within_window_are_coalesced():
+    sender = RecordingSender()
+    dispatcher = OutboundDispatcher(sender, workers=2, coalesce_window=0.1)
+
+    dispatcher.submit('234801', 'one')
+    dispatcher.submit('234801', 'two')
+    dispatcher.submit('234802', 'other')
+    assert dispatcher.drain(timeout=5)
+    dispatcher.stop()
+
+    assert sorted(sender.sent) == [('234801', 'one\n\ntwo'), ('234802', 'other')]
+    metrics = dispatcher.metrics()
+    assert metrics['coalesced_total'] == 1
+    assert metrics['sent_total'] == 2
+
+
+def test_recipient_order_is_preserved_across_sends():
+    sender = RecordingSender()
+    dispatcher = OutboundDispatcher(sender, workers=4, coalesce_window=0.0, recipient_rate=1000, recipient_burst=1000)
+
+    for i in range(20):
+        dispatcher.submit('234801', f'msg {i}')
+        time.sleep(0.002)
+    assert dispatcher.drain(timeout=5)
+    dispatcher.stop()
+
+    delivered = [part for _, body in sender.sent for part in body.split('\n\n')]
+    assert delivered == [f'msg {i}' for i in range(20)]
+
+
+def test_high_priority_messages_jump_the_queue():
+    sender = RecordingSender()
+    dispatcher = OutboundDispatcher(sender, workers=1, coalesce_window=0.05)
+
+    dispatcher.submit('234801', 'broadcast', priority=PRIORITY_LOW)
+    dispatcher.submit('234802', 'receipt confirmed', priority=PRIORITY_HIGH)
+    assert dispatcher.drain(timeout=5)
+    dispatcher.stop()
+
+    assert [to for to, _ in sender.sent] == ['234802', '234801']
+
+
+def test_per_recipient_limit_records_throttle_events():
+    sender = RecordingSender()
+    dispatcher = OutboundDispatcher(sender, workers=1, coalesce_window=0.0, recipient_rate=50, recipient_burst=1)
+
+    for i in range(3):
+        dispatcher.submit('234801', f'msg {i}')
+        assert dispatcher.drain(timeout=5)
+    dispatcher.stop()
+
+    assert len(sender.sent) == 3
+    assert dispatcher.metrics()['throttle_events'] >= 1
+
+
+def test_a_throttled_recipient_does_not_hold_a_sender():
+    sender = RecordingSender()
+    dispatcher = OutboundDispatcher(sender, workers=1, coalesce_window=0.0, recipient_rate=1, recipient_burst=1)
+
+    dispatcher.submit('234801', 'first')
+    time.sleep(0.05)
+    dispatcher.submit('234801', 'second')  # a second away for this recipient
+    time.sleep(0.05)
+    dispatcher.submit('234802', 'other')
+    time.sleep(0.2)
+
+    assert sender.sent == [('234801', 'first'), ('234802', 'other')]
+    assert dispatcher.drain(timeout=5)
+    dispatcher.stop()
+    assert sender.sent[-1] == ('234801', 'second')
+    assert dispatcher.metrics()['throttle_events'] == 1
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=100, capacity=1)
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() > 0
+    time.sleep(0.02)
+    assert bucket.try_acquire() == 0.0
@@ -0,0 +1,124 @@
+"""EXPLAIN QUERY PLAN audit of the hot order/payment queries on a large orders table
+
+Seeds QUERY_PLAN_ORDERS rows (default 1,000,000) once per module, runs ANALYZE
+so the planner sees realistic statistics, and fails if any hot query falls
+back to a full table scan.
+"""
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, desc, select, text
+
+from models.database_models import Base, Order, Transaction
+from utils.money import Money
+
+ORDER_COUNT = int(os.getenv('QUERY_PLAN_ORDERS', '1000000'))
+CUSTOMERS = 5000
+STATUSES = ('pending', 'paid', 'processing', 'completed', 'failed')
+PRICES_KOBO = (28000, 30000, 50000, 55000, 95000, 100000, 110000, 190000, 200000, 210000)
+
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory):
+    path = tmp_path_factory.mktemp('query_plans') / 'orders.db'
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    # Raw executemany with journaling off: seeding speed is not what is under test
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    start = datetime(2026, 1, 1)
+    conn.executemany(
+        "INSERT INTO orders (customer_id, product_id, quantity, amount_paid, phone_to_recharge, "
+        "status, transaction_reference, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((i % CUSTOMERS + 1, i % 12 + 1, 1, PRICES_KOBO[i % len(PRICES_KOBO)], '08012345678', STATUSES[i % len(STATUSES)],
+          f"REF{i:08d}", (start + timedelta(seconds=i)).isoformat(' '))
+         for i in range(ORDER_COUNT))
+    )
+    conn.executemany(
+        "INSERT INTO transactions (order_id, bank_reference, amount, is_verified) VALUES (?, ?, ?, 1)",
+        ((i + 1, f"BANK{i:08d}", PRICES_KOBO[i % len(PRICES_KOBO)]) for i in range(0, ORDER_COUNT, 10))
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+    yield engine
+    engine.dispose()
+
+
+def query_plan(engine, stmt):
+    compiled = stmt.compile(engine)
+    params = tuple(
+        value.isoformat(' ') if isinstance(value, datetime) else value.kobo if isinstance(value, Money) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def assert_uses_index(plan, index_name):
+    assert any(index_name in step for step in plan), plan
+    assert not any(step.startswith('SCAN') and 'USING' not in step for step in plan), plan
+    # ORDER BY is satisfied by the index instead of a sort pass
+    assert not any('TEMP B-TREE' in step for step in plan), plan
+
+
+HOT_QUERIES = {
+    'pending_sweep': (
+        select(Order.id)
+        .where(Order.status == 'pending', Order.created_at < datetime(2026, 1, 2))
+        .order_by(Order.created_at)
+        .limit(100),
+        'ix_orders_status_created_at'
+    ),
+    'customer_history': (
+        select(Order).where(Order.customer_id == 42).order_by(desc(Order.created_at)).limit(20),
+        'ix_orders_customer_id_created_at'
+    ),
+    'orders_since': (
+        select(Order.id).where(Order.created_at >= datetime(2026, 1, 12)),
+        'ix_orders_created_at'
+    ),
+    'transaction_reference': (
+        select(Order).where(Order.transaction_reference == 'REF00012345'),
+        'ix_orders_transaction_reference'
+    ),
+    'pending_with_amount': (
+        select(Order)
+        .where(Order.status == 'pending', Order.amount_paid == Money.from_naira('1,100.00'))
+        .order_by(Order.created_at)
+        .limit(20),
+        'ix_orders_status_amount_paid_created_at'
+    ),
+    'transaction_by_amount': (
+        select(Transaction.id).where(Transaction.amount == Money(55000)),
+        'ix_transactions_amount_transaction_date'
+    ),
+    'bank_reference': (
+        select(Transaction).where(Transaction.bank_reference == 'BANK00012340'),
+        'ix_transactions_bank_reference'
+    ),
+    'order_transactions': (
+        select(Transaction).where(Transaction.order_id == 12341),
+        'ix_transactions_order_id'
+    ),
+}
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_index(engine, name):
+    stmt, index_name = HOT_QUERIES[name]
+    assert_uses_index(query_plan(engine, stmt), index_name)
+
+
+def test_bank_reference_is_unique(engine):
+    with engine.connect() as conn:
+        with pytest.raises(Exception, match='UNIQUE'):
+            conn.execute(text(
+                "INSERT INTO transactions (order_id, bank_reference, amount) VALUES (1, 'BANK00000000', 50000)"
+            ))
@@ -0,0 +1,452 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.receipt_processor import BANK_NAMES, ReceiptProcessor, parse_receipt_text, receipt_reply, warm_up_ocr
+from utils import ocr_utils
+from utils.image_utils import decode_image, preprocess_image_for_ocr
+
+RECEIPT_TEXT = """GTBank
+Transfer Successful
+Amount: NGN 1,500.00
+Beneficiary: DATA SELLER ENT
+Session ID: 100004231018150501234567
+Date: 18/10/2026 15:05
+"""
+
+
+# Worker-side stand-ins for OCR (module level so the worker processes can import them)
+def read_text_bytes(image_data):
+    text = image_data.decode()
+    return {'text': text, 'fields': parse_receipt_text(text), 'pid': os.getpid()}
+
+
+def read_with_phash(image_data):
+    phash, text = image_data.decode().split('|', 1)
+    return {'text': text, 'fields': parse_receipt_text(text), 'phash': phash, 'pid': os.getpid()}
+
+
+def read_slowly(source):
+    time.sleep(float(source))
+    return {'fields': {}, 'pid': os.getpid()}
+
+
+class Collector:
+    def __init__(self):
+        self.outcomes = []
+        self.done = threading.Condition()
+
+    def __call__(self, sender, outcome):
+        with self.done:
+            self.outcomes.append(outcome)
+            self.done.notify_all()
+
+    def wait_for(self, count, timeout=20):
+        with self.done:
+            assert self.done.wait_for(lambda: len(self.outcomes) >= count, timeout)
+        return self.outcomes
+
+
+def test_parse_receipt_text_finds_payment_fields():
+    fields = parse_receipt_text(RECEIPT_TEXT)
+
+    assert fields == {'amount': '1500.00', 'reference': '100004231018150501234567',
+                      'date': '18/10/2026', 'bank': 'GTB'}
+    assert parse_receipt_text("OPay\n₦500 sent\nTransaction ID: 2510181505ABCD")['bank'] == 'OPAY'
+    assert parse_receipt_text("Session ID: 93325 15673912606 1313")['reference'] == '93325156739126061313'
+    assert parse_receipt_text("blurry") == {}
+
+
+def test_jobs_run_in_worker_processes_and_results_are_delivered():
+    collector = Collector()
+    processor = ReceiptProcessor(read=read_text_bytes, workers=2, deliver=collector)
+    processor.start()
+    try:
+        ids = [processor.submit('2348011111111', RECEIPT_TEXT.encode()) for _ in range(4)]
+        outcomes = collector.wait_for(4)
+    finally:
+        assert processor.stop(timeout=10)
+
+    assert sorted(outcome['job_id'] for outcome in outcomes) == ids
+    assert {outcome['status'] for outcome in outcomes} == {'done'}
+    assert os.getpid() not in {outcome['pid'] for outcome in outcomes}
+    assert outcomes[0]['fields']['reference'] == '100004231018150501234567'
+    assert processor.metrics()['completed_total'] == 4
+
+
+def test_full_queue_rejects_and_queued_jobs_can_be_cancelled():
+    processor = ReceiptProcessor(read=read_slowly, workers=1, queue_size=2)
+
+    # Not started, so nothing leaves the queue
+    first, second = processor.submit('a', '0'), processor.submit('b', '0')
+    assert processor.submit('c', '0') is None
+    assert processor.cancel(first)
+    assert not processor.cancel(first)
+
+    collector = Collector()
+    processor.deliver = collector
+    processor.start()
+    outcomes = collector.wait_for(1)
+    processor.stop()
+
+    assert [outcome['job_id'] for outcome in outcomes] == [second]
+    metrics = processor.metrics()
+    assert metrics['rejected_total'] == 1 and metrics['cancelled_total'] == 1
+
+
+def test_timed_out_and_cancelled_jobs_replace_their_worker():
+    collector = Collector()
+    processor = ReceiptProcessor(read=read_slowly, workers=1, timeout=0.5, deliver=collector)
+    processor.start()
+    try:
+        processor.submit('a', '30')
+        assert collector.wait_for(1)[0]['status'] == 'timeout'
+
+        running = processor.submit('b', '30')
+        while processor.metrics()['in_progress'] == 0:
+            time.sleep(0.01)
+        assert processor.cancel(running)
+
+        processor.submit('c', '0')
+        outcomes = collector.wait_for(2)
+    finally:
+        processor.stop(timeout=5)
+
+    # The cancelled job is never delivered; the next one runs on a fresh process
+    assert [outcome['status'] for outcome in outcomes] == ['timeout', 'done']
+    metrics = processor.metrics()
+    assert metrics['timeout_total'] == 1 and metrics['cancelled_total'] == 1
+    assert metrics['workers_replaced'] == 2
+
+
+def test_download_time_is_not_taken_from_the_ocr_timeout():
+    collector = Collector()
+    processor = ReceiptProcessor(read=read_slowly, workers=1, timeout=2.0, download_timeout=1.0, deliver=collector)
+    processor.start()
+    try:
+        processor.submit('a', '0')  # the worker process is up before the timed jobs
+        collector.wait_for(1)
+        # Download and OCR together take longer than `timeout`; OCR alone doesn't
+        processor.submit('b', lambda: time.sleep(0.8) or '1.5')
+        processor.submit('c', lambda: time.sleep(3) or '0')
+        outcomes = collector.wait_for(3)
+    finally:
+        processor.stop(timeout=5)
+
+    assert [outcome['status'] for outcome in outcomes] == ['done', 'done', 'failed']
+    assert 'download' in outcomes[2]['error']
+    assert processor.metrics()['workers_replaced'] == 0
+
+
+def test_job_fails_and_is_delivered_when_no_worker_can_start(monkeypatch):
+    import layers.receipt_processor
+
+    def cannot_start(*args):
+        raise OSError('Too many open files')
+
+    monkeypatch.setattr(layers.receipt_processor, '_Worker', cannot_start)
+    collector = Collector()
+    processor = ReceiptProcessor(read=read_slowly, workers=1, deliver=collector)
+    processor.start()
+    try:
+        processor.submit('a', '0')
+        outcome, = collector.wait_for(1)
+    finally:
+        processor.stop(timeout=5)
+
+    assert outcome['status'] == 'failed' and 'Too many open files' in outcome['error']
+    assert processor.metrics()['failed_total'] == 1
+
+
+def test_receipt_image_gets_a_follow_up_reply(graph_api_stub, monkeypatch, tmp_path):
+    from layers.whatsapp_handler import WhatsAppHandler
+    from config import config
+    import utils.image_utils
+
+    monkeypatch.setattr(config, 'OUTBOUND_DISPATCH_ENABLED', False)
+    monkeypatch.setattr(utils.image_utils, 'ensure_image_directory', lambda: tmp_path)
+    graph_api_stub.media['media-1'] = RECEIPT_TEXT.encode()
+
+    processor = ReceiptProcessor(read=read_text_bytes, workers=1, archive=utils.image_utils.save_receipt_image)
+    processor.start()
+    handler = WhatsAppHandler(receipts=processor)
+    replies = []
+    monkeypatch.setattr(handler, 'reply', lambda to, message: replies.append(message))
+
+    result = handler.process_webhook({'entry': [{'changes': [{'value': {'messages': [
+        {'from': '2348011111111', 'id': 'img1', 'type': 'image', 'image': {'id': 'media-1'}}
+    ]}}]}]})
+    assert processor.drain(timeout=20)
+    processor.stop()
+    handler.close()
+
+    assert result['results'][0]['receipt_job'] == 1
+    assert replies[0].startswith("🧾 Got your receipt")
+    assert replies[1] == receipt_reply({'status': 'done', 'fields': parse_receipt_text(RECEIPT_TEXT)})
+    assert "₦1,500.00 from GTB" in replies[1]
+    archived, = tmp_path.glob('receipt_2348011111111_*.jpg')
+    assert archived.read_bytes() == RECEIPT_TEXT.encode()
+
+
+def test_only_a_complete_read_moves_the_conversation_on(db_session_factory):
+    from types import SimpleNamespace
+    from layers.conversation_store import ConversationStore
+    from layers.whatsapp_handler import MessageResponder
+
+    conversations = ConversationStore(session_factory=db_session_factory)
+    responder = MessageResponder()
+    responder.bot_handler = SimpleNamespace(conversations=conversations)
+    replies = []
+    responder.reply = lambda to, message: replies.append(message)
+    outcome = {'job_id': 1, 'sender': '2348011111111', 'status': 'done', 'elapsed_ms': 5.0}
+
+    responder.deliver_receipt('2348011111111', {**outcome, 'fields': {'date': '18/10/2026', 'bank': 'GTB'}})
+    assert "couldn't read the amount" in replies[-1]
+    assert conversations.get('2348011111111').state is None
+
+    responder.deliver_receipt('2348011111111', {**outcome, 'fields': parse_receipt_text(RECEIPT_TEXT)})
+    assert 'Receipt received' in replies[-1]
+    assert conversations.get('2348011111111').state == 'payment_verification'
+
+
+class FakeBackend:
+    def __init__(self, tessdata=None, lang='eng'):
+        self.name = 'fake'
+
+
+def test_auto_backend_falls_back_when_tesserocr_is_unavailable(monkeypatch):
+    def unavailable(tessdata=None, lang='eng'):
+        raise ImportError('no libtesseract')
+
+    monkeypatch.setattr(ocr_utils, 'BACKENDS', {'tesserocr': unavailable, 'pytesseract': FakeBackend})
+    assert isinstance(ocr_utils.create_backend('auto'), FakeBackend)
+
+    monkeypatch.setattr(ocr_utils, 'BACKENDS', {'tesserocr': unavailable, 'pytesseract': unavailable})
+    with pytest.raises(RuntimeError, match='No OCR backend available'):
+        ocr_utils.create_backend('auto')
+
+
+def test_persistent_engine_reads_a_rendered_receipt():
+    from config import config
+    from benchmarks.synthetic_receipts import amount_value_box, corpus
+
+    try:
+        backend = ocr_utils.create_backend('tesserocr', config.TESSDATA_DIR or None)
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    data, fields = corpus(1)[0]
+
+    processor = ReceiptProcessor(workers=1, initializer=warm_up_ocr)
+    processor.start()
+    collector = Collector()
+    processor.submit('2348011111111', data, deliver=collector)
+    outcome = collector.wait_for(1)[0]
+    processor.stop()
+
+    left, top, right, bottom = amount_value_box(fields)
+    amount, _ = backend.read_amount(decode_image(data)[top:bottom, left:right])
+    backend.close()
+
+    assert outcome['ocr_backend'] == 'tesserocr'
+    assert outcome['fields']['reference'] == fields['reference']
+    assert outcome['fields']['amount'] == fields['amount']
+    assert amount.replace(',', '').endswith(fields['amount'])
+
+
+def test_receipt_bytes_decode_in_memory(tmp_path):
+    from benchmarks.synthetic_receipts import corpus
+
+    data, _ = corpus(1, size=(270, 480))[0]
+    path = tmp_path / 'receipt.jpg'
+    path.write_bytes(data)
+
+    image = decode_image(memoryview(data))
+    assert image.shape == (480, 270)
+    assert (preprocess_image_for_ocr(image) == preprocess_image_for_ocr(str(path))).all()
+    with pytest.raises(ValueError):
+        decode_image(b'not an image')
+
+
+def test_layout_templates_and_line_detection():
+    from benchmarks.synthetic_receipts import corpus
+    from layers.receipt_layout import BANK_TEMPLATES, detect_text_lines, downscale_to_dpi
+    from utils.bank_api_utils import BankVerifier
+
+    assert set(BANK_TEMPLATES) == set(BankVerifier().supported_banks) == set(BANK_NAMES)
+
+    gray = decode_image(corpus(1)[0][0])
+    image, scale = downscale_to_dpi(gray, 200)
+    assert image.shape == (gray.shape[0] // 2, 540) and scale == 0.5
+    assert downscale_to_dpi(image, 300)[0] is image  # never enlarged
+    # Bank header, title, amount, beneficiary, account, session id, date, narration, footer
+    assert len(detect_text_lines(image)) == 9
+
+
+def test_layout_reader_stops_once_fields_are_read():
+    from config import config
+    from benchmarks.synthetic_receipts import corpus
+    from layers.receipt_layout import LayoutReader
+
+    try:
+        backend = ocr_utils.create_backend('tesserocr', config.TESSDATA_DIR or None)
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    reader = LayoutReader(backend, dpi=200, min_confidence=90)
+    amount_reads = []
+    read_amount = backend.read_amount
+    backend.read_amount = lambda line, dpi=None: amount_reads.append(dpi) or read_amount(line, dpi)
+
+    for data, fields in corpus(4):
+        result = reader.read(decode_image(data))
+        assert result['fields'] == {key: fields[key] for key in ('amount', 'reference', 'date', 'bank')}
+        assert result['confidence']['amount'] >= 90
+        assert result['bank_template'] == fields['bank']
+        assert result['lines_read'] < result['lines_detected']
+        assert not result['full_page']
+        assert {'downscale', 'detect', 'ocr_lines'} <= set(result['timings_ms'])
+    # Amounts come from the digit/currency engine, confidently enough not to need a full-size look
+    assert amount_reads == [200] * 4
+    backend.close()
+
+
+def test_perceptual_hash_matches_resent_copies_and_index_finds_them():
+    import io
+    from PIL import Image
+    from benchmarks.synthetic_receipts import corpus
+    from layers.receipt_fingerprints import NearDuplicateIndex, exact_hash, perceptual_hash
+
+    receipts = corpus(6)
+    hashes = [perceptual_hash(decode_image(data)) for data, _ in receipts]
+
+    # Forwarded again: shrunk, recompressed and with the status bar cropped off
+    image = Image.open(io.BytesIO(receipts[0][0]))
+    resent = io.BytesIO()
+    image.crop((0, 20, image.width, image.height - 10)).resize((540, 955)).save(resent, 'JPEG', quality=60)
+    resent = resent.getvalue()
+    assert exact_hash(resent) != exact_hash(receipts[0][0])
+    assert (perceptual_hash(decode_image(resent)) ^ hashes[0]).bit_count() <= 6
+
+    index = NearDuplicateIndex(merge_every=4)
+    index.extend([0, 1], hashes[:2])
+    for key, phash in enumerate(hashes[2:], 2):
+        index.add(key, phash)  # one merge, one still pending
+    assert len(index) == 6
+    for key, phash in enumerate(hashes):
+        for bits in ((), (3,), (0, 70, 140, 250), (1, 2, 64, 65, 128, 129, 200)):
+            nearby = phash
+            for bit in bits:
+                nearby ^= 1 << bit
+            expected = sorted(((h ^ nearby).bit_count(), k) for k, h in enumerate(hashes)
+                              if (h ^ nearby).bit_count() <= 7)
+            assert index.query(nearby, 7) == expected
+            assert (len(bits), key) in expected
+
+
+def test_repeated_receipts_skip_ocr_and_reused_ones_are_flagged(db_session_factory):
+    from layers.receipt_fingerprints import ReceiptFingerprints
+
+    fingerprints = ReceiptFingerprints(session_factory=db_session_factory, max_distance=6)
+    processor = ReceiptProcessor(read=read_with_phash, workers=1, fingerprints=fingerprints)
+    processor.start()
+    collector = Collector()
+    original = f"{'ab' * 32}|{RECEIPT_TEXT}".encode()
+    lookalike = f"{'ab' * 31}ae|{RECEIPT_TEXT}".encode()  # 2 bits apart, same reference
+    other = f"{'ab' * 31}ae|{RECEIPT_TEXT.replace('1234567', '7654321')}".encode()
+
+    for sender, data in (('2348011111111', original), ('2348011111111', original),
+                         ('2348022222222', lookalike), ('2348033333333', other)):
+        processor.submit(sender, data, deliver=collector)
+        collector.wait_for(len(collector.outcomes) + 1)
+    first, resent, reused, unrelated = collector.outcomes
+    metrics = processor.metrics()
+    processor.stop()
+
+    assert 'duplicate_of' not in first and first['near_duplicates'] == []
+    # Exact repeat: answered from the stored result, never sent to a worker
+    assert 'pid' not in resent and resent['fields'] == first['fields']
+    assert resent['duplicate_of']['match'] == 'exact'
+    assert 'Receipt received' in receipt_reply(resent, pending=first['fields'])
+    # Another customer's re-encoded copy of the same receipt
+    assert reused['duplicate_of'] == {**reused['duplicate_of'], 'sender': '2348011111111', 'match': 'near',
+                                      'distance': 2}
+    assert 'already been submitted' in receipt_reply(reused)
+    # Looks alike (same template) but a different transfer: listed, not treated as a duplicate
+    assert 'duplicate_of' not in unrelated and len(unrelated['near_duplicates']) == 2
+    assert metrics['duplicate_total'] == 2 and metrics['fingerprints']['indexed'] == 3
+
+
+def own_receipt_setup(db_session_factory):
+    """A MessageResponder on a real conversation store, order table and fingerprinting ReceiptProcessor"""
+    from types import SimpleNamespace
+    from layers.catalog_service import CatalogService
+    from layers.conversation_store import ConversationStore
+    from layers.order_repository import OrderRepository
+    from layers.receipt_fingerprints import ReceiptFingerprints
+    from layers.whatsapp_handler import MessageResponder
+
+    conversations = ConversationStore(session_factory=db_session_factory)
+    responder = MessageResponder()
+    responder.bot_handler = SimpleNamespace(conversations=conversations)
+    responder.orders = OrderRepository(session_factory=db_session_factory,
+                                       catalog=CatalogService(session_factory=db_session_factory))
+    replies = []
+    responder.reply = lambda to, message: replies.append(message)
+    processor = ReceiptProcessor(read=read_with_phash, workers=1, deliver=responder.deliver_receipt,
+                                 fingerprints=ReceiptFingerprints(session_factory=db_session_factory))
+    processor.start()
+
+    def send(data):
+        processor.submit('2348011111111', data)
+        assert processor.drain(timeout=20)
+        return replies[-1]
+
+    return conversations, responder, processor, send
+
+
+def test_own_receipt_sent_again_for_a_new_order_is_flagged(db_session_factory):
+    conversations, responder, processor, send = own_receipt_setup(db_session_factory)
+    original = f"{'ab' * 32}|{RECEIPT_TEXT}".encode()
+    lookalike = f"{'ab' * 31}ae|{RECEIPT_TEXT}".encode()
+
+    try:
+        assert 'Receipt received' in send(original)
+        # Sent again while that payment is still being verified: a plain resend
+        assert 'Receipt received' in send(original)
+        assert conversations.get('2348011111111').state == 'payment_verification'
+
+        # The order was settled with that reference and a new one started: the old receipt was consumed
+        order_id = responder.orders.create_order(network='MTN', size='1GB', customer_id=1,
+                                                 transaction_reference=parse_receipt_text(RECEIPT_TEXT)['reference'])
+        responder.orders.mark_paid([order_id])
+        conversations.reset('2348011111111', state='purchase')
+        assert 'already been submitted' in send(original)
+        assert 'already been submitted' in send(lookalike)
+        assert conversations.get('2348011111111').state == 'purchase'
+    finally:
+        processor.stop()
+
+
+def test_chatting_between_resends_keeps_the_receipt_pending(db_session_factory):
+    from layers.basic_handler import BasicMessageHandler
+    from layers.catalog_service import CatalogService
+
+    conversations, responder, processor, send = own_receipt_setup(db_session_factory)
+    bot = BasicMessageHandler(catalog=CatalogService(session_factory=db_session_factory), conversations=conversations)
+    original = f"{'ab' * 32}|{RECEIPT_TEXT}".encode()
+
+    try:
+        assert 'Receipt received' in send(original)
+        bot.handle_message('thanks, did you get it?', '2348011111111')
+        bot.handle_message('hello', '2348011111111')
+        assert conversations.get('2348011111111').state == 'payment_verification'
+
+        assert 'Receipt received' in send(original)
+        assert conversations.get('2348011111111').context['receipt'] == parse_receipt_text(RECEIPT_TEXT)
+    finally:
+        processor.stop()
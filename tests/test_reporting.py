@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.order_repository import OrderRepository
+from layers.reporting import rebuild_rollups, sales_summary, stream_orders, write_csv, write_jsonl
+from models.database_models import DailySales
+from utils.money import Money
+
+
+@pytest.fixture
+def repository(db_session_factory, catalog):
+    return OrderRepository(session_factory=db_session_factory, catalog=catalog)
+
+
+def finish(repository, order_ids, status='completed'):
+    repository.mark_paid(order_ids)
+    repository.mark_processing(order_ids)
+    return repository.transition(order_ids, status)
+
+
+def new_orders(plans):
+    return [{'customer_id': None, 'network': network, 'size': size,
+             'phone_to_recharge': '08012345678', 'transaction_reference': f"REF{n}"}
+            for n, (network, size) in enumerate(plans)]
+
+
+def rollups(session_factory):
+    db = session_factory()
+    rows = sorted((row.network, row.status, row.order_count, row.revenue) for row in db.query(DailySales).all())
+    db.close()
+    return rows
+
+
+def test_rollups_follow_orders_as_they_finish(repository, db_session_factory):
+    ids = repository.create_orders(new_orders([('MTN', '1GB'), ('MTN', '1GB'), ('GLO', '1GB'), ('MTN', '2GB')]))
+
+    finish(repository, ids[:2])
+    assert rollups(db_session_factory) == [('MTN', 'completed', 2, Money.from_naira(600))]
+
+    finish(repository, ids[2:3])
+    finish(repository, ids[3:], status='failed')
+    # Moving an order again can't count it twice
+    finish(repository, ids[:2])
+
+    assert rollups(db_session_factory) == [
+        ('GLO', 'completed', 1, Money.from_naira(280)),
+        ('MTN', 'completed', 2, Money.from_naira(600)),
+        ('MTN', 'failed', 1, Money.from_naira(500)),
+    ]
+
+    today = datetime.utcnow().date()
+    db = db_session_factory()
+    summary = sales_summary(db, today, today + timedelta(days=1))
+    db.close()
+    assert [(row['network'], row['orders'], row['revenue']) for row in summary] == [
+        ('GLO', 1, Money(28000)), ('MTN', 2, Money(60000))
+    ]
+
+
+def test_rebuild_matches_incremental_rollups(repository, db_session_factory):
+    ids = repository.create_orders(new_orders([('AIRTEL', '5GB')] * 3))
+    finish(repository, ids[:2])
+    finish(repository, ids[2:], status='failed')
+    incremental = rollups(db_session_factory)
+
+    db = db_session_factory()
+    db.query(DailySales).delete()
+    db.commit()
+    rebuild_rollups(db)
+    db.close()
+
+    assert rollups(db_session_factory) == incremental
+
+
+def test_exports_stream_every_order(repository, catalog, db_session_factory):
+    catalog.upsert_plan('MTN', '1GB', '300.50')
+    repository.create_orders(new_orders([('MTN', '1GB')] * 25))
+    db = db_session_factory()
+
+    out = io.StringIO()
+    assert write_csv(stream_orders(db, batch_size=10), out) == 25
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert rows[0]['network'] == 'MTN' and rows[0]['amount'] == '300.50'
+
+    out = io.StringIO()
+    tomorrow = datetime.utcnow().date() + timedelta(days=1)
+    assert write_jsonl(stream_orders(db, end=tomorrow, status='pending'), out) == 25
+    assert json.loads(out.getvalue().splitlines()[-1])['data_size'] == '1GB'
+    assert write_jsonl(stream_orders(db, start=tomorrow), io.StringIO()) == 0
+    db.close()
@@ -0,0 +1,149 @@
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.catalog_service import CatalogService
+from layers.order_repository import OrderRepository
+from layers.reporting import rebuild_rollups, sales_summary
+from layers.retention import RetentionService
+from models.database_models import (Base, ConversationState, Order, ProcessedMessage, Transaction, create_db_engine,
+                                    seed_catalog)
+
+NOW = datetime(2026, 6, 15)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'hot.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+
+def add_orders(session_factory, count, status, finished_at, start=0):
+    db = session_factory()
+    for n in range(start, start + count):
+        order = Order(customer_id=1, product_id=1, amount_paid=500, phone_to_recharge='08012345678',
+                      status=status, transaction_reference=f"REF{n}",
+                      created_at=finished_at - timedelta(minutes=5), completed_at=finished_at)
+        db.add(order)
+        db.flush()
+        db.add(Transaction(order_id=order.id, bank_reference=f"BANK{n}", amount=500))
+    db.commit()
+    db.close()
+
+
+def count(session_factory, model):
+    db = session_factory()
+    total = db.query(model).count()
+    db.close()
+    return total
+
+
+def test_old_finished_orders_move_to_monthly_files(engine, session_factory, tmp_path):
+    add_orders(session_factory, 7, 'completed', datetime(2026, 1, 20))
+    add_orders(session_factory, 3, 'failed', datetime(2026, 2, 3), start=7)
+    add_orders(session_factory, 4, 'completed', NOW - timedelta(days=10), start=10)  # too recent
+    add_orders(session_factory, 2, 'processing', datetime(2026, 1, 5), start=14)     # still in flight
+
+    retention = RetentionService(engine=engine, order_age_days=90, batch_size=4, batch_pause=0,
+                                 archive_dir=tmp_path / 'archive')
+    assert retention.archive_orders(now=NOW) == 10
+
+    assert count(session_factory, Order) == 6
+    assert count(session_factory, Transaction) == 6
+    archived = {}
+    for month, expected in [('2026_01', 7), ('2026_02', 3)]:
+        conn = sqlite3.connect(tmp_path / 'archive' / f"orders_{month}.db")
+        archived[month] = conn.execute("SELECT COUNT(*), SUM(amount_paid) FROM orders").fetchone()
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (expected,)
+        conn.close()
+    assert archived == {'2026_01': (7, 7 * 50000), '2026_02': (3, 3 * 50000)}
+
+    metrics = retention.metrics()
+    assert metrics['orders_archived'] == 10 and metrics['transactions_archived'] == 10
+    assert metrics['batches'] >= 3 and metrics['lock_ms_max'] > 0
+
+
+def test_archiving_is_repeatable(engine, session_factory, tmp_path):
+    add_orders(session_factory, 3, 'completed', datetime(2026, 1, 20))
+    retention = RetentionService(engine=engine, batch_pause=0, archive_dir=tmp_path / 'archive')
+
+    assert retention.archive_orders(now=NOW) == 3
+    assert retention.archive_orders(now=NOW) == 0
+    # The repository still works on the hot database afterwards
+    db = session_factory()
+    seed_catalog(db)
+    db.close()
+    repository = OrderRepository(session_factory=session_factory, catalog=CatalogService(session_factory))
+    assert repository.create_order(customer_id=1, network='MTN', size='1GB', transaction_reference='NEW')
+
+
+def test_expired_conversations_are_deleted_in_batches(engine, session_factory):
+    db = session_factory()
+    db.add_all([ConversationState(phone_number=f"080{n:08d}", state='greeting',
+                                  last_updated=NOW - timedelta(days=40 if n < 25 else 1))
+                for n in range(30)])
+    db.commit()
+    db.close()
+
+    retention = RetentionService(engine=engine, conversation_age_days=30, batch_size=10, batch_pause=0)
+    assert retention.prune_conversations(now=NOW) == 25
+    assert count(session_factory, ConversationState) == 5
+    assert retention.metrics()['batches'] == 3
+
+
+def test_expired_dedup_claims_are_deleted_in_batches(engine, session_factory):
+    db = session_factory()
+    db.add_all([ProcessedMessage(message_id=f"wamid.{n}",
+                                 processed_at=NOW - timedelta(hours=30 if n < 25 else 1))
+                for n in range(30)])
+    db.commit()
+    db.close()
+
+    retention = RetentionService(engine=engine, processed_message_ttl=86400, batch_size=10, batch_pause=0)
+    assert retention.prune_processed_messages(now=NOW) == 25
+    assert count(session_factory, ProcessedMessage) == 5
+    assert retention.metrics()['processed_messages_deleted'] == 25
+    assert retention.metrics()['batches'] == 3
+
+def test_rebuild_after_archiving_keeps_archived_revenue(engine, session_factory, tmp_path):
+    add_orders(session_factory, 12, 'completed', datetime(2026, 1, 20))
+    add_orders(session_factory, 5, 'completed', datetime(2026, 6, 10), start=12)
+    db = session_factory()
+    rebuild_rollups(db)
+    totals = sales_summary(db, datetime(2026, 1, 1).date(), NOW.date())
+    db.close()
+
+    retention = RetentionService(engine=engine, batch_pause=0, archive_dir=tmp_path / 'archive')
+    assert retention.archived_until() is None
+    assert retention.archive_orders(now=NOW) == 12
+    assert retention.archived_until() == datetime(2026, 2, 1).date()
+
+    db = session_factory()
+    assert rebuild_rollups(db, keep_before=retention.archived_until()) == (datetime(2026, 2, 1).date(), None)
+    assert rebuild_rollups(db, end=datetime(2026, 2, 1).date(), keep_before=retention.archived_until()) is None
+    assert sales_summary(db, datetime(2026, 1, 1).date(), NOW.date()) == totals
+    db.close()
+    assert [row['orders'] for row in totals] == [12, 5]
+
+def test_incremental_vacuum_frees_pages(engine, session_factory, tmp_path):
+    add_orders(session_factory, 2000, 'completed', datetime(2026, 1, 20))
+    retention = RetentionService(engine=engine, batch_size=1000, batch_pause=0, archive_dir=tmp_path / 'archive')
+
+    result = retention.run_once(now=NOW)
+
+    assert result['orders_archived'] == 2000
+    assert result['pages_vacuumed'] > 0
+    assert retention.metrics()['runs'] == 1
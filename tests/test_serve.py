@@ -0,0 +1,92 @@
+import sys
+import threading
+import time
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import Services, create_app
+from config import config
+import serve
+
+
+class SlowHandler:
+    """Stands in for WhatsAppHandler: takes a moment per payload, records shutdown"""
+
+    def __init__(self):
+        self.seen = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def process_webhook(self, data):
+        time.sleep(0.01)
+        with self._lock:
+            self.seen.append(data['n'])
+        return {'processed': True}
+
+    def close(self, timeout=10):
+        self.closed = True
+        return True
+
+
+def test_stop_drains_queued_webhooks_before_closing_the_sender(monkeypatch):
+    monkeypatch.setattr(config, 'WEBHOOK_QUEUE_DB', '')
+    services = Services()
+    handler = services.__dict__['whatsapp_handler'] = SlowHandler()
+
+    for n in range(20):
+        assert services.webhook_queue.enqueue({'entry': [], 'n': n})
+
+    assert services.stop(timeout=5)
+    assert sorted(handler.seen) == list(range(20))
+    assert handler.closed
+    assert not services.webhook_queue.running
+
+
+def test_each_worker_slot_gets_its_own_durable_queue(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'WEBHOOK_QUEUE_DB', str(tmp_path / 'webhook_queue.db'))
+    services = Services()
+
+    assert services._durable_queue_path() == str(tmp_path / 'webhook_queue.db')
+    services.worker_slot = 2
+    assert services._durable_queue_path() == str(tmp_path / 'webhook_queue.2.db')
+
+
+def test_gunicorn_workers_reuse_freed_slots():
+    options = serve.gunicorn_options(Namespace(host='127.0.0.1', port=0, workers=2, threads=4))
+    workers = [Namespace(), Namespace()]
+    for worker in workers:
+        options['pre_fork'](None, worker)
+    assert [worker.slot for worker in workers] == [0, 1]
+
+    options['child_exit'](None, workers[0])
+    replacement = Namespace()
+    options['pre_fork'](None, replacement)
+    assert replacement.slot == 0
+
+    assert options['preload_app'] and options['worker_class'] == 'gthread'
+    assert options['graceful_timeout'] == config.WEB_GRACEFUL_TIMEOUT + config.WEB_DRAIN_TIMEOUT
+
+
+def test_missing_server_is_reported(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'gunicorn', None)
+    monkeypatch.setitem(sys.modules, 'waitress', None)
+
+    with pytest.raises(RuntimeError, match='No server available'):
+        serve.pick_server('auto')
+
+
+def test_preload_builds_shared_state_without_starting_threads():
+    app = create_app()
+    services = app.extensions['data_seller']
+    before = threading.active_count()
+
+    services.preload()
+
+    assert threading.active_count() == before
+    handler = services.bot_handler
+    assert handler.catalog_renderer.current().version == handler.catalog.version
+    services.stop()
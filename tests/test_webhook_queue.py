@@ -0,0 +1,90 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from layers.webhook_queue import WebhookQueue
+
+
+def test_queue_drains_through_handler():
+    seen = []
+    webhook_queue = WebhookQueue(seen.append, maxsize=10, workers=2)
+    webhook_queue.start()
+
+    for i in range(5):
+        assert webhook_queue.enqueue({'entry': [], 'n': i})
+
+    assert webhook_queue.drain(timeout=5)
+    webhook_queue.stop()
+
+    assert sorted(payload['n'] for payload in seen) == [0, 1, 2, 3, 4]
+    metrics = webhook_queue.metrics()
+    assert metrics['enqueued_total'] == 5
+    assert metrics['processed_total'] == 5
+    assert metrics['depth'] == 0
+
+
+def test_full_queue_rejects_payload():
+    release = threading.Event()
+    webhook_queue = WebhookQueue(lambda payload: release.wait(5), maxsize=1, workers=1)
+
+    # Workers not started, so the single slot stays occupied
+    assert webhook_queue.enqueue({'entry': []})
+    assert not webhook_queue.enqueue({'entry': []})
+    assert webhook_queue.metrics()['rejected_total'] == 1
+    release.set()
+
+
+def test_durable_queue_replays_after_restart(tmp_path):
+    db_path = tmp_path / 'webhook_queue.db'
+
+    first = WebhookQueue(lambda payload: None, maxsize=10, workers=1, durable_path=db_path)
+    assert first.enqueue({'entry': [], 'id': 'pending'})
+    first.stop()  # never started, payload stays in the durable store
+
+    seen = []
+    second = WebhookQueue(seen.append, maxsize=10, workers=1, durable_path=db_path)
+    second.start()
+    assert second.drain(timeout=5)
+    second.stop()
+
+    assert seen == [{'entry': [], 'id': 'pending'}]
+
+
+def test_stop_keeps_the_store_open_for_a_busy_worker(tmp_path):
+    db_path = tmp_path / 'webhook_queue.db'
+    started, release = threading.Event(), threading.Event()
+
+    def slow(payload):
+        started.set()
+        release.wait(5)
+
+    webhook_queue = WebhookQueue(slow, maxsize=10, workers=1, durable_path=db_path)
+    webhook_queue.start()
+    assert webhook_queue.enqueue({'entry': [], 'id': 'slow'})
+    assert started.wait(5)
+    thread = webhook_queue._threads[0]
+
+    assert not webhook_queue.stop(timeout=0.1)
+    release.set()
+    thread.join(timeout=5)
+
+    # The worker removed its row from the store before it was closed
+    assert webhook_queue.metrics()['processed_total'] == 1
+    assert not webhook_queue.metrics()['durable']
+    replay = WebhookQueue(lambda payload: None, durable_path=db_path)
+    assert replay._store.pending() == []
+    replay.stop()
+
+def test_webhook_route_acks_and_reports_metrics():
+    from app import app, webhook_queue
+
+    with app.test_client() as client:
+        response = client.post('/webhook', json={'object': 'whatsapp_business_account', 'entry': []})
+        assert response.status_code == 200
+
+        webhook_queue.drain(timeout=5)
+        health = client.get('/health').get_json()
+        assert health['webhook_queue']['enqueued_total'] >= 1
+        assert 'drain_rate_per_sec' in health['webhook_queue']
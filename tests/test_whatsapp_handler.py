@@ -0,0 +1,140 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import config
+from layers.whatsapp_handler import WhatsAppHandler
+
+
+@pytest.fixture(autouse=True)
+def inline_replies(monkeypatch):
+    """Send replies inline so tests can assert on them straight after processing"""
+    monkeypatch.setattr(config, 'OUTBOUND_DISPATCH_ENABLED', False)
+
+
+def _text(sender, message_id, body):
+    return {'from': sender, 'id': message_id, 'type': 'text', 'text': {'body': body}}
+
+
+def _batched_payload():
+    return {
+        'object': 'whatsapp_business_account',
+        'entry': [
+            {'changes': [{'value': {
+                'messages': [_text('2348011111111', 'a1', 'hi'), _text('2348022222222', 'b1', 'data')],
+                'statuses': [{'id': 'out1', 'recipient_id': '2348033333333', 'status': 'delivered'}]
+            }}]},
+            {'changes': [{'value': {
+                'messages': [_text('2348011111111', 'a2', 'mtn')]
+            }}]}
+        ]
+    }
+
+
+def test_every_message_and_status_in_batch_is_processed(monkeypatch):
+    handler = WhatsAppHandler()
+    sent = []
+    lock = threading.Lock()
+
+    def fake_send(to, message):
+        with lock:
+            sent.append(to)
+        return {'messages': [{'id': 'x'}]}
+
+    monkeypatch.setattr(handler, 'send_text_message', fake_send)
+    result = handler.process_webhook(_batched_payload())
+
+    assert result['processed']
+    assert result['message_count'] == 4
+    assert [r['message_type'] for r in result['results']] == ['text', 'text', 'status', 'text']
+    assert [r.get('content') for r in result['results'] if r['message_type'] == 'text'] == ['hi', 'data', 'mtn']
+    assert sorted(sent) == ['2348011111111', '2348011111111', '2348022222222']
+
+
+def test_messages_from_same_sender_keep_order(monkeypatch):
+    handler = WhatsAppHandler()
+    order = []
+    monkeypatch.setattr(handler, 'send_text_message', lambda to, message: order.append(message))
+
+    payload = {'entry': [{'changes': [{'value': {
+        'messages': [_text('2348011111111', f'm{i}', f'msg {i}') for i in range(5)]
+    }}]}]}
+    handler.process_webhook(payload)
+
+    assert [message.split("'")[1] for message in order] == [f'msg {i}' for i in range(5)]
+
+
+def test_payload_without_messages_is_not_processed():
+    result = WhatsAppHandler().process_webhook({'entry': [{'changes': [{'value': {}}]}]})
+    assert result == {'processed': False, 'results': []}
+
+
+def test_replies_reuse_one_pooled_connection(graph_api_stub):
+    handler = WhatsAppHandler()
+
+    for i in range(5):
+        assert handler.send_text_message('2348011111111', f'reply {i}') is not None
+
+    assert len(graph_api_stub.requests) == 5
+    assert graph_api_stub.requests[0]['path'] == '/v17.0/1234567890/messages'
+    assert graph_api_stub.requests[0]['headers']['Authorization'] == 'Bearer test-token'
+    assert graph_api_stub.connections == 1
+
+
+def test_rate_limited_and_server_errors_are_retried(graph_api_stub):
+    graph_api_stub.fail_next = [429, 503]
+    handler = WhatsAppHandler()
+
+    assert handler.send_text_message('2348011111111', 'hello') is not None
+    assert len(graph_api_stub.requests) == 3
+
+
+def test_read_timeouts_are_not_retried(graph_api_stub, monkeypatch):
+    # The message may already have been accepted; a retry could deliver it twice
+    monkeypatch.setattr(config, 'WHATSAPP_READ_TIMEOUT', 0.2)
+    graph_api_stub.latency = 0.5
+    handler = WhatsAppHandler()
+
+    assert handler.send_text_message('2348011111111', 'hello') is None
+    assert len(graph_api_stub.requests) == 1
+
+def test_mark_message_as_read_uses_pooled_client(graph_api_stub):
+    handler = WhatsAppHandler()
+
+    assert handler.mark_message_as_read('wamid.abc')
+    assert graph_api_stub.requests[0]['json']['status'] == 'read'
+
+
+def test_replies_go_through_dispatcher_when_enabled(monkeypatch):
+    monkeypatch.setattr(config, 'OUTBOUND_DISPATCH_ENABLED', True)
+    monkeypatch.setattr(config, 'OUTBOUND_COALESCE_WINDOW', 0.05)
+    handler = WhatsAppHandler()
+    sent = []
+    monkeypatch.setattr(handler, 'send_text_message', lambda to, message: sent.append((to, message)) or {})
+
+    payload = {'entry': [{'changes': [{'value': {
+        'messages': [_text('2348011111111', 'a1', 'first'), _text('2348011111111', 'a2', 'second')]
+    }}]}]}
+    handler.process_webhook(payload)
+
+    assert handler.dispatcher.drain(timeout=5)
+    handler.dispatcher.stop()
+    assert len(sent) == 1
+    assert 'first' in sent[0][1] and 'second' in sent[0][1]
+
+
+def test_redelivered_message_is_answered_once(monkeypatch):
+    handler = WhatsAppHandler()
+    sent = []
+    monkeypatch.setattr(handler, 'send_text_message', lambda to, message: sent.append(message))
+
+    payload = {'entry': [{'changes': [{'value': {'messages': [_text('2348011111111', 'dup1', 'hi')]}}]}]}
+    handler.process_webhook(payload)
+    result = handler.process_webhook(payload)
+
+    assert len(sent) == 1
+    assert result['results'][0]['duplicate']
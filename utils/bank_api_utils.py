@@ -1,6 +1,7 @@
 # utils/bank_api_utils.py
 import requests
 from config import config
+from utils.money import Money
 class BankVerifier:
     """Utility for bank transaction verification"""
 
@@ -15,7 +16,12 @@ class BankVerifier:
         }
 
     def verify_transaction(self, bank_name, amount, reference, date):
-        """Verify transaction with bank API"""
+        """Verify transaction with bank API
+
+        `amount` may be Money or a Naira value read off a receipt ("1,500.00");
+        it is passed to the bank check as Money so it compares exactly.
+        """
+        amount = Money.from_naira(amount)
         bank_name_upper = bank_name.upper()
 
         if bank_name_upper in self.supported_banks:
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+class MessageDeduplicator:
+    """Bounded TTL + LRU cache of WhatsApp message ids already handled
+
+    WhatsApp delivers webhooks at least once, so the same message id can
+    arrive several times. Lookups are O(1) dict operations; with
+    `persistent=True` first sightings are also claimed in the
+    `processed_messages` table so separate worker processes agree.
+    """
+
+    def __init__(self, ttl=86400, max_entries=100000, persistent=False, session_factory=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._session_factory = session_factory
+        self._entries = OrderedDict()  # message_id -> expiry (monotonic)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.persistent_hits = 0
+
+    def is_duplicate(self, message_id):
+        """Return True if `message_id` was seen before, otherwise record it and return False"""
+        now = time.monotonic()
+
+        with self._lock:
+            expires_at = self._entries.get(message_id)
+            if expires_at is not None:
+                if expires_at > now:
+                    self._entries.move_to_end(message_id)
+                    self.hits += 1
+                    return True
+                del self._entries[message_id]
+
+            self.misses += 1
+            self._remember(message_id, now)
+
+        if self.persistent and not self._claim(message_id):
+            with self._lock:
+                self.persistent_hits += 1
+            return True
+
+        return False
+
+    def _remember(self, message_id, now):
+        self._entries[message_id] = now + self.ttl
+
+        # Expired entries collect at the least-recently-used end
+        while self._entries:
+            oldest_id, oldest_expiry = next(iter(self._entries.items()))
+            if oldest_expiry > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _claim(self, message_id):
+        """Insert the id into processed_messages. False if another process got there first."""
+        from models.database_models import ProcessedMessage
+
+        if self._session_factory is None:
+            from models.database_models import SessionLocal
+            self._session_factory = SessionLocal
+
+        db = self._session_factory()
+        try:
+            db.add(ProcessedMessage(message_id=message_id))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        except Exception as e:
+            # Fail open: a missed dedup is better than dropping a customer's message
+            logger.error(f"❌ Dedup store error for {message_id}: {e}")
+            db.rollback()
+            return True
+        finally:
+            db.close()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'capacity': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'persistent_hits': self.persistent_hits
+            }
@@ -2,28 +2,31 @@
 import re
 from datetime import datetime, timedelta
 from models.database_models import SessionLocal
+from utils.money import Money
 
 
-def extract_phone_number(text):
-    """Extract phone number from text"""
-    # Nigerian phone number patterns
-    patterns = [
-        r'(\d{11})',  # 11-digit numbers
-        r'(\d{10})',  # 10-digit numbers
-        r'(\+234\d{10})',  # International format
-    ]
+# Nigerian mobile number: 080..., +234 80..., 234 80... or 80... (prefix dropped)
+NIGERIAN_MSISDN_PATTERN = r'(?<![\d+])(?:\+?234|0)?[789][01]\d{8}(?!\d)'
+_MSISDN_RE = re.compile(NIGERIAN_MSISDN_PATTERN)
+
 
-    for pattern in patterns:
-        matches = re.findall(pattern, text)
-        if matches:
-            return matches[0]
+def normalize_phone_number(phone):
+    """Normalize a Nigerian mobile number to the local 11-digit form (080...)"""
+    digits = phone.lstrip('+')
+    if digits.startswith('234'):
+        digits = digits[3:]
+    return digits if digits.startswith('0') else '0' + digits
 
-    return None
+
+def extract_phone_number(text):
+    """Extract phone number from text, normalized to the local 11-digit form"""
+    match = _MSISDN_RE.search(text)
+    return normalize_phone_number(match.group()) if match else None
 
 
 def format_currency(amount):
-    """Format amount as Nigerian Naira"""
-    return f"₦{amount:,.2f}"
+    """Format amount (Money or Naira) as Nigerian Naira"""
+    return Money.from_naira(amount).format()
 
 
 def is_recent_transaction(transaction_date, hours=24):
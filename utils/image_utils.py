@@ -1,11 +1,11 @@
-
 import os
-from PIL import Image, ImageEnhance
-import cv2
-import numpy as np
+from datetime import datetime
 from pathlib import Path
 from config import config
 
+# PIL and OpenCV are imported inside the functions that use them: they cost
+# hundreds of milliseconds and only receipt processing needs them
+
 
 def ensure_image_directory():
     """Ensure the image storage directory exists"""
@@ -17,8 +17,8 @@ def save_receipt_image(image_data, customer_phone):
     """Save receipt image with organized filename"""
     image_dir = ensure_image_directory()
 
-    # Create organized filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Create organized filename (microseconds: customers send several screenshots at once)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     filename = f"receipt_{customer_phone}_{timestamp}.jpg"
     file_path = image_dir / filename
 
@@ -28,38 +28,49 @@ def save_receipt_image(image_data, customer_phone):
     return str(file_path)
 
 
-def preprocess_image_for_ocr(image_path):
-    """Preprocess image to improve OCR accuracy"""
-    try:
-        # Read image
-        image = cv2.imread(image_path)
+def decode_image(image_data):
+    """Decode downloaded image bytes (JPEG, PNG, WebP) straight to a grayscale array, no file involved"""
+    import cv2
+    import numpy as np
 
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    image = cv2.imdecode(np.frombuffer(memoryview(image_data), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("Image data could not be decoded")
+    return image
 
-        # Apply noise reduction
-        denoised = cv2.medianBlur(gray, 3)
 
-        # Apply thresholding
-        _, thresholded = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+def preprocess_image_for_ocr(image):
+    """Preprocess image to improve OCR accuracy
 
-        # Convert back to PIL Image for consistency
-        pil_image = Image.fromarray(thresholded)
+    `image` is a grayscale array from decode_image() (a file path still
+    works); the binarized result is a new array of the same size.
+    """
+    import cv2
 
-        return pil_image
+    if isinstance(image, (str, os.PathLike)):
+        path = image
+        image = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError(f"Image {path} could not be read")
+
+    # Apply noise reduction
+    denoised = cv2.medianBlur(image, 3)
+
+    # Apply thresholding
+    _, thresholded = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    return thresholded
 
-    except Exception as e:
-        print(f"Error preprocessing image: {e}")
-        # Return original image if preprocessing fails
-        return Image.open(image_path)
 
+def extract_text_from_image(image):
+    """Extract text from image using OCR (encoded bytes, a grayscale array or a file path)"""
+    from utils.ocr_utils import get_backend
 
-def extract_text_from_image(image_path):
-    """Extract text from image using OCR"""
     try:
-        processed_image = preprocess_image_for_ocr(image_path)
-        text = pytesseract.image_to_string(processed_image)
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = decode_image(image)
+        text = get_backend().read_text(preprocess_image_for_ocr(image))
         return text.strip()
     except Exception as e:
         print(f"OCR Error: {e}")
-        return ""
\ No newline at end of file
+        return ""
@@ -0,0 +1,102 @@
+# utils/money.py
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import total_ordering
+
+_KOBO_PER_NAIRA = 100
+_TWO_PLACES = Decimal('0.01')
+
+
+@total_ordering
+class Money:
+    """An amount of Naira held as an integer number of kobo
+
+    Integer kobo compare exactly, so a bank amount can be matched with an
+    indexed `amount == ?` lookup instead of an epsilon range, and sums never
+    drift the way floats do. Build from Naira with `Money.from_naira()`.
+    """
+
+    __slots__ = ('kobo',)
+
+    def __init__(self, kobo=0):
+        if isinstance(kobo, bool) or not isinstance(kobo, int):
+            raise TypeError(f"Money needs an integer number of kobo, got {kobo!r}")
+        object.__setattr__(self, 'kobo', kobo)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Money is immutable")
+
+    @classmethod
+    def from_naira(cls, value):
+        """Parse 500, 500.5, '1,500.50', '₦1,500' or 'NGN 1500' into Money"""
+        if isinstance(value, Money):
+            return value
+        if isinstance(value, str):
+            value = value.replace('₦', '').replace('NGN', '').replace(',', '').strip()
+        elif isinstance(value, float):
+            value = repr(value)  # shortest round-trip form, so 0.1 stays 0.1
+        try:
+            naira = Decimal(value)
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValueError(f"Not a Naira amount: {value!r}")
+        if not naira.is_finite():
+            raise ValueError(f"Not a Naira amount: {value!r}")
+        return cls(int(naira.quantize(_TWO_PLACES, rounding=ROUND_HALF_UP) * _KOBO_PER_NAIRA))
+
+    @property
+    def naira(self):
+        return Decimal(self.kobo) / _KOBO_PER_NAIRA
+
+    def format(self):
+        """Receipt-style amount with separators and kobo, e.g. ₦1,500.00"""
+        return f"₦{self.naira:,.2f}"
+
+    def __str__(self):
+        # Chat replies show whole Naira without decimals: ₦500, ₦2.50 only when there are kobo
+        naira, kobo = divmod(abs(self.kobo), _KOBO_PER_NAIRA)
+        sign = '-' if self.kobo < 0 else ''
+        return f"{sign}₦{naira}" if not kobo else f"{sign}₦{naira}.{kobo:02d}"
+
+    def __repr__(self):
+        return f"Money(kobo={self.kobo})"
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self.kobo == other.kobo
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Money):
+            return self.kobo < other.kobo
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.kobo)
+
+    def __bool__(self):
+        return self.kobo != 0
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return Money(self.kobo + other.kobo)
+        return NotImplemented
+
+    def __radd__(self, other):
+        # sum() starts from 0
+        if other == 0:
+            return self
+        return NotImplemented
+
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            return Money(self.kobo - other.kobo)
+        return NotImplemented
+
+    def __mul__(self, quantity):
+        if isinstance(quantity, int) and not isinstance(quantity, bool):
+            return Money(self.kobo * quantity)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Money(-self.kobo)
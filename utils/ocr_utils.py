@@ -0,0 +1,171 @@
+# utils/ocr_utils.py
+import logging
+from pathlib import Path
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Receipts are a single column of left-aligned lines of varying size
+RECEIPT_PSM = 4
+# One detected text line (the receipt layout stage reads fields line by line)
+LINE_PSM = 7
+# An amount field is one line of digits and currency marks
+AMOUNT_PSM = 7
+AMOUNT_WHITELIST = '0123456789.,NG₦'
+
+
+def _as_pil(image):
+    if hasattr(image, 'mode'):
+        return image
+    from PIL import Image
+    return Image.fromarray(image)
+
+
+def _set_image(api, image, dpi=None):
+    """Hand tesseract a PIL image, or a NumPy array's pixels as they are (no PIL/PNG round trip)"""
+    pixels = None
+    if hasattr(image, 'mode'):
+        api.SetImage(image)
+    else:
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        pixels = image.tobytes()
+        api.SetImageBytes(pixels, width, height, channels, width * channels)
+    if dpi:
+        api.SetSourceResolution(int(dpi))
+    return pixels  # tesseract doesn't copy the buffer; keep it alive until the text is read
+
+
+class TesserocrBackend:
+    """libtesseract in-process through tesserocr
+
+    The language data is loaded once per engine and the engines are reused
+    for every image, so a receipt costs only the recognition itself. Not
+    thread-safe: one backend per process (see get_backend()).
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, tessdata=None, lang='eng'):
+        import tesserocr
+
+        options = {'path': tessdata} if tessdata else {}
+        self._text = tesserocr.PyTessBaseAPI(lang=lang, psm=RECEIPT_PSM, **options)
+        self._line = tesserocr.PyTessBaseAPI(lang=lang, psm=LINE_PSM, **options)
+        self._amount = tesserocr.PyTessBaseAPI(lang=lang, psm=AMOUNT_PSM, **options)
+        self._amount.SetVariable('tessedit_char_whitelist', AMOUNT_WHITELIST)
+
+    def read_text(self, image, dpi=None):
+        """All the text on a receipt (PIL image or NumPy array)"""
+        pixels = _set_image(self._text, image, dpi)  # noqa: F841
+        return self._text.GetUTF8Text()
+
+    def read_line(self, image, dpi=None):
+        """(text, mean confidence 0-100) for one cropped line of text"""
+        pixels = _set_image(self._line, image, dpi)  # noqa: F841
+        return self._line.GetUTF8Text().strip(), self._line.MeanTextConf()
+
+    def read_amount(self, image, dpi=None):
+        """(text, median symbol confidence 0-100) for one cropped amount line, restricted to digits and currency marks
+
+        A label such as "Amount:" has no whitelisted glyphs and comes back as
+        a few near-zero symbols, which sink the word and mean confidences of
+        an otherwise clean read; the median ignores them.
+        """
+        import tesserocr
+
+        pixels = _set_image(self._amount, image, dpi)  # noqa: F841
+        text = self._amount.GetUTF8Text().strip()
+        if not text:
+            return '', 0
+        symbols = sorted(symbol.Confidence(tesserocr.RIL.SYMBOL)
+                         for symbol in tesserocr.iterate_level(self._amount.GetIterator(), tesserocr.RIL.SYMBOL))
+        return text, int(symbols[len(symbols) // 2]) if symbols else 0
+
+    def close(self):
+        self._text.End()
+        self._line.End()
+        self._amount.End()
+
+
+class PytesseractBackend:
+    """The tesseract command line through pytesseract: a new process, and language data load, per image"""
+
+    name = 'pytesseract'
+
+    def __init__(self, tessdata=None, lang='eng'):
+        import pytesseract
+
+        if config.TESSERACT_PATH and Path(config.TESSERACT_PATH).exists():
+            pytesseract.pytesseract.tesseract_cmd = config.TESSERACT_PATH
+        pytesseract.get_tesseract_version()  # raises when the binary is missing
+        self._pytesseract = pytesseract
+        self.lang = lang
+        tessdata_option = f'--tessdata-dir "{tessdata}" ' if tessdata else ''
+        self._text_config = f"{tessdata_option}--psm {RECEIPT_PSM}"
+        self._line_config = f"{tessdata_option}--psm {LINE_PSM}"
+        self._amount_config = f"{tessdata_option}--psm {AMOUNT_PSM} -c tessedit_char_whitelist={AMOUNT_WHITELIST}"
+
+    def _config(self, config_string, dpi):
+        return f"{config_string} --dpi {int(dpi)}" if dpi else config_string
+
+    def read_text(self, image, dpi=None):
+        """All the text on a receipt (PIL image or NumPy array)"""
+        return self._pytesseract.image_to_string(_as_pil(image), lang=self.lang,
+                                                 config=self._config(self._text_config, dpi))
+
+    def _read_words(self, image, config_string, dpi):
+        data = self._pytesseract.image_to_data(_as_pil(image), lang=self.lang,
+                                               config=self._config(config_string, dpi),
+                                               output_type=self._pytesseract.Output.DICT)
+        words = [(word, float(conf)) for word, conf in zip(data['text'], data['conf'])
+                 if word.strip() and float(conf) >= 0]
+        if not words:
+            return '', 0
+        return ' '.join(word for word, _ in words), int(sum(conf for _, conf in words) / len(words))
+
+    def read_line(self, image, dpi=None):
+        """(text, mean confidence 0-100) for one cropped line of text"""
+        return self._read_words(image, self._line_config, dpi)
+
+    def read_amount(self, image, dpi=None):
+        """(text, mean confidence 0-100) for one cropped amount line, restricted to digits and currency marks"""
+        return self._read_words(image, self._amount_config, dpi)
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'tesserocr': TesserocrBackend,
+    'pytesseract': PytesseractBackend,
+}
+
+
+def create_backend(name='auto', tessdata=None, lang='eng'):
+    """A new OCR backend; 'auto' prefers tesserocr and falls back to pytesseract"""
+    names = list(BACKENDS) if name == 'auto' else [name]
+    errors = []
+    for candidate in names:
+        try:
+            backend = BACKENDS[candidate](tessdata, lang)
+        except Exception as e:
+            errors.append(f"{candidate}: {type(e).__name__}: {e}")
+            continue
+        if errors:
+            logger.warning(f"⚠️  OCR falling back to {candidate} ({'; '.join(errors)})")
+        logger.info(f"🔤 OCR backend ready: {candidate}")
+        return backend
+    raise RuntimeError(f"No OCR backend available ({'; '.join(errors)})")
+
+
+_backend = None
+
+
+def get_backend():
+    """This process's OCR backend, created on first use and kept for the life of the process"""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(config.OCR_BACKEND, config.TESSDATA_DIR or None, config.OCR_LANG)
+    return _backend
@@ -1,9 +1,4 @@
 # utils/selenium_utils.py
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 import time
 from config import config
 
@@ -17,6 +12,10 @@ class BrowserAutomation:
 
     def setup_driver(self):
         """Setup Chrome WebDriver"""
+        # Imported here so only the purchase flow pays for loading selenium
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
         chrome_options = Options()
         chrome_options.add_argument("--headless")  # Run in background
         chrome_options.add_argument("--no-sandbox")